@@ -57,12 +57,30 @@ JAZZMIN_SETTINGS = {
                 "icon": "fas fa-database",
                 "permissions": ["core.change_systemsetting"],
             },
+            {
+                "name": "Printer fleet",
+                "url": "printer_fleet",
+                "icon": "fas fa-print",
+                "permissions": ["core.change_systemsetting"],
+            },
+            {
+                "name": "Pre-print labels",
+                "url": "preprint",
+                "icon": "fas fa-tags",
+                "permissions": ["core.change_systemsetting"],
+            },
             {
                 "name": "Import members",
                 "url": "member_import",
                 "icon": "fas fa-file-import",
                 "permissions": ["core.change_systemsetting"],
             },
+            {
+                "name": "Import attendance",
+                "url": "attendance_import",
+                "icon": "fas fa-calendar-check",
+                "permissions": ["core.change_systemsetting"],
+            },
             {
                 "name": "Log out",
                 "url": "admin_quick_logout",
@@ -114,6 +132,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.middleware.RoleCacheMiddleware",
     "core.middleware.AdminSkinMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
@@ -170,3 +189,74 @@ LOGIN_URL = "/admin/login/"
 LOGIN_REDIRECT_URL = "/admin/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Managed kiosk printing runs on a small background worker pool so check-ins
+# never wait on the printer. Set PRINT_SPOOLER_WORKERS to 0 to print inline.
+PRINT_SPOOLER_WORKERS = 2
+PRINT_SPOOLER_MAX_ATTEMPTS = 3
+PRINT_SPOOLER_RETRY_DELAY_SECONDS = 2
+
+# Background Brother status polling for raw network printers. 0 disables the
+# monitor; the print path then reads the printer status page inline.
+PRINTER_MONITOR_INTERVAL_SECONDS = 15
+# Port of the Brother web status page; printer emulators serve it elsewhere.
+BROTHER_STATUS_PORT = 80
+
+# PrintNode API connection. Requests reuse a kept-alive connection per worker;
+# the base URL can point at a local stand-in for testing.
+PRINTNODE_API_BASE_URL = "https://api.printnode.com"
+PRINTNODE_CONNECT_TIMEOUT_SECONDS = 5
+PRINTNODE_READ_TIMEOUT_SECONDS = 15
+
+# CUPS IPP endpoint used for print queues whose profile sets "transport": "ipp".
+CUPS_IPP_URL = "ipp://localhost:631"
+
+# Per-target circuit breaker for PrintNode and raw network printers. Once
+# enough of the recent sends fail, prints fail fast until the cooldown passes
+# and a single probe succeeds.
+PRINT_BREAKER_WINDOW = 10
+PRINT_BREAKER_FAILURE_THRESHOLD = 3
+PRINT_BREAKER_ERROR_RATE = 0.5
+PRINT_BREAKER_COOLDOWN_SECONDS = 30
+
+# Processes used to render labels for admin pre-print runs. 0 or 1 renders
+# on the run's background thread instead of a process pool.
+PREPRINT_RENDER_PROCESSES = 2
+
+# Uploaded member CSVs wait here while a background job stages their rows; the
+# file is removed once every row is staged.
+MEMBER_IMPORT_DIR = BASE_DIR / "imports"
+
+# Previewed member CSV imports stay staged for this many hours before they must
+# be uploaded again.
+MEMBER_IMPORT_STAGE_HOURS = 24
+
+# Database backups copy this many SQLite pages per step and pause between
+# steps, so kiosk check-ins keep writing while a backup runs.
+DATABASE_BACKUP_PAGES_PER_STEP = 256
+DATABASE_BACKUP_STEP_SLEEP_SECONDS = 0.05
+# A write restarts a stepwise copy. After this many restarts, or this many
+# seconds, the backup copies the database again in one step, and writes wait
+# for that step to finish.
+DATABASE_BACKUP_MAX_RESTARTS = 20
+DATABASE_BACKUP_STEPWISE_MAX_SECONDS = 300
+
+# Automatic backups taken by the web server: nightly, on Sabbath mornings
+# before service, and after a service is closed. Only these scheduled backups
+# are pruned, keeping the newest one per day, ISO week and month for the
+# counts below.
+DATABASE_BACKUP_SCHEDULE_ENABLED = True
+DATABASE_BACKUP_NIGHTLY_TIME = "02:00"
+DATABASE_BACKUP_PRE_SERVICE_TIME = "08:00"
+DATABASE_BACKUP_KEEP_DAILY = 7
+DATABASE_BACKUP_KEEP_WEEKLY = 4
+DATABASE_BACKUP_KEEP_MONTHLY = 12
+
+# Continuous replication: committed SQLite WAL frames are shipped to this
+# directory (for example a USB drive) every few seconds, with a compacted
+# snapshot each DATABASE_REPLICA_SNAPSHOT_HOURS. Empty disables it; turning it
+# on switches the database to WAL mode.
+DATABASE_REPLICA_DIR = ""
+DATABASE_REPLICA_INTERVAL_SECONDS = 1
+DATABASE_REPLICA_SNAPSHOT_HOURS = 24
+DATABASE_REPLICA_RETENTION_DAYS = 7
@@ -1,9 +1,9 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path
 
 from core import views
+from core.media import serve_media
 from core.permissions import can_access_admin_site
 
 urlpatterns = [
@@ -17,7 +17,10 @@ urlpatterns = [
     path("admin/database-backup/download/<str:backup_name>/", views.database_backup_download, name="database_backup_download"),
     path("admin/member-import/", views.member_import_view, name="member_import"),
     path("admin/member-import/sample/", views.member_import_sample, name="member_import_sample"),
+    path("admin/attendance-import/", views.attendance_import_view, name="attendance_import"),
     path("admin/print-selected/", views.admin_print_selected, name="admin_print_selected"),
+    path("admin/printer-fleet/", views.printer_fleet_view, name="printer_fleet"),
+    path("admin/preprint/", views.preprint_view, name="preprint"),
     path("admin/", admin.site.urls),
     path("staff/dashboard/", views.staff_dashboard, name="staff_dashboard"),
     path("staff/people/", views.staff_people, name="staff_people"),
@@ -31,13 +34,15 @@ urlpatterns = [
     path("kiosk/printer-status/", views.kiosk_printer_status, name="kiosk_printer_status"),
     path("kiosk/printnode-status/", views.kiosk_printnode_status, name="kiosk_printnode_status"),
     path("kiosk/test-print/", views.kiosk_test_print, name="kiosk_test_print"),
+    path("kiosk/print-jobs/<int:job_id>/", views.kiosk_print_job_status, name="kiosk_print_job_status"),
     path("kiosk/search-groups/", views.kiosk_search_groups, name="kiosk_search_groups"),
     path("print/<int:attendance_id>/", views.print_tag, name="print_tag"),
     path("print-batch/", views.print_batch, name="print_batch"),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name="media"),
+]
 
 admin.site.has_permission = lambda request: can_access_admin_site(request.user)
 admin.site.site_header = f"Welcome System v{settings.CATS_VERSION}"
@@ -6,3 +6,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cats.settings")
 
 application = get_wsgi_application()
+
+from core.backup_schedule import ensure_backup_scheduler_started  # noqa: E402  (needs the app registry)
+from core.print_spooler import ensure_print_spooler_started  # noqa: E402
+from core.replication import ensure_replication_started  # noqa: E402
+
+ensure_replication_started()
+ensure_backup_scheduler_started()
+ensure_print_spooler_started()
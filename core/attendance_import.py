@@ -0,0 +1,264 @@
+"""Bulk import of historical attendance from CSV or NDJSON files.
+
+Each record names a service date (and optionally a service label and check-in
+time) and a person, identified the same way member imports match people: email,
+or first and last name with phone, or a first and last name that only one
+person has. People and services are indexed once per file, missing services
+are created, and attendance is inserted in large ``bulk_create`` batches with
+existing check-ins left untouched.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+import csv
+from functools import lru_cache
+from io import TextIOWrapper
+import json
+
+from django.db import transaction
+from django.utils import timezone
+
+from .member_import import FIELD_ALIASES, MemberIndex, fold_key
+from .models import Attendance, Person, Service
+
+
+CSV_FORMAT = "csv"
+NDJSON_FORMAT = "ndjson"
+FILE_FORMATS = (CSV_FORMAT, NDJSON_FORMAT)
+ATTENDANCE_CHUNK_SIZE = 5000
+MAX_REPORTED_PROBLEMS = 100
+
+ATTENDANCE_FIELD_ALIASES = {
+    "date": {"date", "service date", "attendance date"},
+    "service": {"service", "service label", "service name", "label"},
+    "time": {"time", "check in time", "check-in time", "checked in at"},
+    "first_name": FIELD_ALIASES["first_name"],
+    "last_name": FIELD_ALIASES["last_name"],
+    "email": FIELD_ALIASES["email"],
+    "phone": FIELD_ALIASES["phone"],
+    "notes": FIELD_ALIASES["notes"],
+}
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%m-%d-%Y")
+TIME_FORMATS = ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M:%S %p")
+
+
+class AttendanceImportError(Exception):
+    pass
+
+
+@dataclass
+class AttendanceImportResult:
+    rows: int = 0
+    inserted: int = 0
+    already_recorded: int = 0
+    services_created: int = 0
+    skipped: int = 0
+    problems: list[tuple[int, str]] = field(default_factory=list)
+
+    def add_problem(self, row_number: int, message: str) -> None:
+        self.skipped += 1
+        if len(self.problems) < MAX_REPORTED_PROBLEMS:
+            self.problems.append((row_number, message))
+
+    def as_metadata(self) -> dict:
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "already_recorded": self.already_recorded,
+            "services_created": self.services_created,
+            "skipped": self.skipped,
+        }
+
+
+def detect_file_format(file_name: str) -> str:
+    return NDJSON_FORMAT if (file_name or "").lower().endswith((".ndjson", ".jsonl", ".json")) else CSV_FORMAT
+
+
+def import_attendance_file(binary_file, *, file_format: str = CSV_FORMAT) -> AttendanceImportResult:
+    """Import attendance records from a file opened in binary mode, one transaction per chunk."""
+    if file_format not in FILE_FORMATS:
+        raise AttendanceImportError(f'Unsupported attendance file format "{file_format}".')
+    result = AttendanceImportResult()
+    people = MemberIndex(Person.objects.only("id", "first_name", "middle_initial", "last_name", "email", "phone").order_by("id"))
+    services = _service_index()
+    # History repeats the same few hundred dates, so each date and time is parsed once.
+    parsed_times = {}
+    chunk = []
+    for record in _iter_records(binary_file, file_format):
+        chunk.append(record)
+        if len(chunk) >= ATTENDANCE_CHUNK_SIZE:
+            _import_chunk(chunk, people, services, parsed_times, result)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, people, services, parsed_times, result)
+    if not result.rows:
+        raise AttendanceImportError("The file did not contain any attendance records.")
+    result.already_recorded = result.rows - result.skipped - result.inserted
+    return result
+
+
+def _import_chunk(records, people: MemberIndex, services: dict, parsed_times: dict, result: AttendanceImportResult) -> None:
+    new_services = []
+    matched = []
+    for row_number, data in records:
+        result.rows += 1
+        when_key = (data.get("_error") or data.get("date", ""), data.get("time", ""))
+        when = parsed_times.get(when_key)
+        if when is None:
+            try:
+                when = parsed_times[when_key] = _parse_when(data)
+            except ValueError as exc:
+                result.add_problem(row_number, str(exc))
+                continue
+        service_date, checked_in_at = when
+        person, problem = _match_person(people, data)
+        if person is None:
+            result.add_problem(row_number, problem)
+            continue
+        label = data.get("service", "")
+        service = services.get((service_date, fold_key(label))) or (None if label else services.get((service_date, None)))
+        if service is None:
+            service = Service(date=service_date, label=label or _service_label(service_date), status=Service.CLOSED)
+            services[(service_date, fold_key(service.label))] = service
+            services.setdefault((service_date, None), service)
+            new_services.append(service)
+        matched.append((person.pk, service, checked_in_at, data.get("notes", "")))
+    with transaction.atomic():
+        Service.objects.bulk_create(new_services)
+        # Keep the first record for a person and service; the rest count as already recorded.
+        attendances = {}
+        for person_id, service, checked_in_at, notes in matched:
+            attendances.setdefault(
+                (person_id, service.pk),
+                Attendance(person_id=person_id, service_id=service.pk, checked_in_at=checked_in_at, notes=notes),
+            )
+        # Count only this chunk's own keys, so kiosk check-ins made during the import are not included.
+        recorded_before = _count_recorded(attendances.keys())
+        Attendance.objects.bulk_create(attendances.values(), ignore_conflicts=True)
+        result.inserted += _count_recorded(attendances.keys()) - recorded_before
+    result.services_created += len(new_services)
+
+
+def _count_recorded(keys) -> int:
+    keys = set(keys)
+    if not keys:
+        return 0
+    existing = Attendance.objects.filter(
+        person_id__in={person_id for person_id, _service_id in keys},
+        service_id__in={service_id for _person_id, service_id in keys},
+    ).values_list("person_id", "service_id")
+    return sum(1 for key in existing.iterator() if key in keys)
+
+
+def _iter_records(binary_file, file_format: str):
+    text = TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    try:
+        if file_format == NDJSON_FORMAT:
+            yield from _iter_ndjson(text)
+        else:
+            yield from _iter_csv(text)
+    except UnicodeDecodeError as exc:
+        raise AttendanceImportError("The attendance file must be saved as UTF-8.") from exc
+    finally:
+        text.detach()
+
+
+def _iter_csv(text):
+    reader = csv.DictReader(text)
+    if not reader.fieldnames:
+        raise AttendanceImportError("The CSV file must include a header row.")
+    header_map = {header: _field_for(header) for header in reader.fieldnames if _field_for(header)}
+    fields = set(header_map.values())
+    if "date" not in fields or not ({"first_name", "last_name"} <= fields or "email" in fields):
+        raise AttendanceImportError('The CSV must include a "Date" column and "First Name" and "Last Name" or "Email" columns.')
+    for row_number, raw_row in enumerate(reader, start=2):
+        data = {field_name: (raw_row.get(header) or "").strip() for header, field_name in header_map.items()}
+        if any(data.values()):
+            yield row_number, data
+
+
+def _iter_ndjson(text):
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            yield line_number, {"_error": "Line is not valid JSON."}
+            continue
+        if not isinstance(record, dict):
+            yield line_number, {"_error": "Line must be a JSON object."}
+            continue
+        yield line_number, {
+            _field_for(key): str(value if value is not None else "").strip()
+            for key, value in record.items()
+            if _field_for(key)
+        }
+
+
+def _parse_when(data: dict) -> tuple[date, datetime]:
+    if data.get("_error"):
+        raise ValueError(data["_error"])
+    raw_date = data.get("date", "")
+    if not raw_date:
+        raise ValueError("Date is required.")
+    # Accept ISO timestamps such as 2019-04-13T10:05:00 as well as plain dates.
+    raw_date, _separator, embedded_time = raw_date.replace("T", " ").partition(" ")
+    service_date = _parse_first(raw_date, DATE_FORMATS, lambda parsed: parsed.date())
+    if service_date is None:
+        raise ValueError(f'Date "{data["date"]}" is not a recognised date.')
+    raw_time = data.get("time") or embedded_time
+    check_in_time = _parse_first(raw_time.strip(), TIME_FORMATS, lambda parsed: parsed.time()) if raw_time else time(0, 0)
+    if check_in_time is None:
+        raise ValueError(f'Time "{raw_time}" is not a recognised time.')
+    return service_date, timezone.make_aware(datetime.combine(service_date, check_in_time))
+
+
+def _match_person(people: MemberIndex, data: dict) -> tuple[Person | None, str]:
+    if not data.get("email") and not (data.get("first_name") and data.get("last_name")):
+        return None, "A first and last name or an email address is required."
+    person = people.find(data)
+    if person:
+        return person, ""
+    if data.get("email") and not data.get("last_name"):
+        return None, f'No person has the email "{data["email"]}".'
+    named = people.people_named(data)
+    if len(named) == 1:
+        return named[0], ""
+    name = f'{data.get("first_name", "")} {data.get("last_name", "")}'.strip()
+    if named:
+        return None, f"{len(named)} people are named {name}; add an email or phone to choose one."
+    return None, f"No person named {name} was found."
+
+
+def _service_index() -> dict:
+    # Keyed by (date, label) and by (date, None) for records without a label, which
+    # match the date's newest service the way kiosk check-in does.
+    services = {}
+    for service in Service.objects.order_by("id"):
+        services.setdefault((service.date, fold_key(service.label)), service)
+        services[(service.date, None)] = service
+    return services
+
+
+def _service_label(service_date: date) -> str:
+    # Same label kiosk check-in gives a new service.
+    return f"Sabbath Service {service_date.strftime('%m-%d-%Y')}"
+
+
+@lru_cache(maxsize=256)
+def _field_for(header) -> str | None:
+    normalized = " ".join(str(header or "").strip().lower().replace("_", " ").split())
+    for field_name, aliases in ATTENDANCE_FIELD_ALIASES.items():
+        if normalized in aliases or normalized == field_name.replace("_", " "):
+            return field_name
+    return None
+
+
+def _parse_first(value: str, formats, convert):
+    for pattern in formats:
+        try:
+            return convert(datetime.strptime(value, pattern))
+        except ValueError:
+            continue
+    return None
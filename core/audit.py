@@ -1,8 +1,9 @@
 from .models import AuditLog
 
 
-def log_event(action, *, user=None, service=None, person=None, attendance=None, message="", metadata=None):
-    AuditLog.objects.create(
+def audit_entry(action, *, user=None, service=None, person=None, attendance=None, message="", metadata=None) -> AuditLog:
+    """Build an unsaved audit row, for writing several at once with ``log_events``."""
+    return AuditLog(
         action=action,
         actor=user if getattr(user, "is_authenticated", False) else None,
         service=service,
@@ -11,3 +12,19 @@ def log_event(action, *, user=None, service=None, person=None, attendance=None,
         message=message,
         metadata=metadata or {},
     )
+
+
+def log_event(action, *, user=None, service=None, person=None, attendance=None, message="", metadata=None):
+    audit_entry(
+        action,
+        user=user,
+        service=service,
+        person=person,
+        attendance=attendance,
+        message=message,
+        metadata=metadata,
+    ).save()
+
+
+def log_events(entries) -> None:
+    AuditLog.objects.bulk_create(entries)
@@ -0,0 +1,183 @@
+"""Automatic database backups and their grandfather-father-son retention.
+
+The web server runs a small scheduler thread that starts a nightly backup, a
+backup on Sabbath mornings before service, and one after a service is closed.
+Each backup goes through ``start_database_backup``, the same stepwise
+background copy as the admin page, so check-ins keep writing. When to run next
+is worked out from the backup files themselves, so a restart never repeats or
+forgets a backup.
+"""
+
+from datetime import datetime, time, timedelta
+import logging
+import threading
+import time as time_module
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .audit import log_event
+from .backups import BackupError, DatabaseBackup, get_backup_progress, list_database_backups, start_database_backup
+from .models import AuditLog
+
+
+logger = logging.getLogger(__name__)
+
+LABEL_NIGHTLY = "nightly"
+LABEL_PRE_SERVICE = "pre-service"
+LABEL_POST_SERVICE = "post-service"
+SCHEDULED_LABELS = (LABEL_NIGHTLY, LABEL_PRE_SERVICE, LABEL_POST_SERVICE)
+SABBATH_WEEKDAY = 5  # Saturday
+RETRY_AFTER = timedelta(minutes=15)
+
+_scheduler_thread = None
+_scheduler_lock = threading.Lock()
+
+
+def ensure_backup_scheduler_started() -> None:
+    global _scheduler_thread
+    if not getattr(settings, "DATABASE_BACKUP_SCHEDULE_ENABLED", True):
+        return
+    with _scheduler_lock:
+        if _scheduler_thread and _scheduler_thread.is_alive():
+            return
+        _scheduler_thread = threading.Thread(target=_scheduler_loop, name="backup-scheduler", daemon=True)
+        _scheduler_thread.start()
+
+
+def due_backup_label(now=None) -> str | None:
+    """Return the label of the scheduled backup that should run now, if any."""
+    now = timezone.localtime(now)
+    latest = _latest_scheduled_backups()
+
+    def taken_since(label: str, moment) -> bool:
+        return label in latest and latest[label].created_at >= moment
+
+    last_close = (
+        AuditLog.objects.filter(action=AuditLog.ACTION_SERVICE_CLOSE).order_by("-created_at").values_list("created_at", flat=True).first()
+    )
+    if last_close and not taken_since(LABEL_POST_SERVICE, last_close):
+        return LABEL_POST_SERVICE
+    pre_service_at = _today_at(now, _setting_time("DATABASE_BACKUP_PRE_SERVICE_TIME", "08:00"))
+    if now.weekday() == SABBATH_WEEKDAY and now >= pre_service_at and not taken_since(LABEL_PRE_SERVICE, pre_service_at):
+        return LABEL_PRE_SERVICE
+    nightly_at = _today_at(now, _setting_time("DATABASE_BACKUP_NIGHTLY_TIME", "02:00"))
+    if now < nightly_at:
+        nightly_at -= timedelta(days=1)
+    if not taken_since(LABEL_NIGHTLY, nightly_at):
+        return LABEL_NIGHTLY
+    return None
+
+
+def run_scheduled_backups(now=None) -> str | None:
+    """Start the due backup, or prune once no backup is running. Returns the label started."""
+    progress = get_backup_progress()
+    if progress is not None and progress.is_running:
+        return None
+    label = due_backup_label(now)
+    if label is None:
+        prune_scheduled_backups()
+        return None
+    if progress is not None and progress.label == label and progress.status != progress.DONE:
+        # Do not retry a failed or cancelled backup on every tick.
+        if progress.finished_at and timezone.now() - progress.finished_at < RETRY_AFTER:
+            return None
+    try:
+        start_database_backup(label=label)
+    except BackupError:
+        # A manual backup started in the meantime; try again on the next tick.
+        return None
+    return label
+
+
+def backups_to_prune(backups: list[DatabaseBackup]) -> list[DatabaseBackup]:
+    """Apply grandfather-father-son retention to scheduled backups; other backups are never pruned."""
+    scheduled = sorted(
+        (backup for backup in backups if _scheduled_label(backup.name)),
+        key=lambda backup: backup.created_at,
+        reverse=True,
+    )
+    # The newest backup of each kind is always kept; the schedule is worked out from it.
+    keep = set(_newest_by_label(scheduled).values())
+    for count, period in (
+        (_setting_int("DATABASE_BACKUP_KEEP_DAILY", 7), lambda moment: moment.date()),
+        (_setting_int("DATABASE_BACKUP_KEEP_WEEKLY", 4), lambda moment: moment.isocalendar()[:2]),
+        (_setting_int("DATABASE_BACKUP_KEEP_MONTHLY", 12), lambda moment: (moment.year, moment.month)),
+    ):
+        # Keep the newest backup in each of the most recent `count` days, weeks, or months.
+        periods = set()
+        for backup in scheduled:
+            period_key = period(timezone.localtime(backup.created_at))
+            if period_key in periods:
+                continue
+            if len(periods) >= count:
+                break
+            periods.add(period_key)
+            keep.add(backup)
+    return [backup for backup in scheduled if backup not in keep]
+
+
+def prune_scheduled_backups() -> list[str]:
+    pruned = []
+    for backup in backups_to_prune(list_database_backups()):
+        backup.path.unlink(missing_ok=True)
+        pruned.append(backup.name)
+    if pruned:
+        log_event(
+            AuditLog.ACTION_DATABASE_BACKUP,
+            message=f"Pruned {len(pruned)} scheduled backup(s) by retention policy.",
+            metadata={"pruned": pruned},
+        )
+    return pruned
+
+
+def _scheduler_loop() -> None:
+    while True:
+        close_old_connections()
+        try:
+            run_scheduled_backups()
+        except Exception:
+            logger.exception("Scheduled database backup check failed.")
+        finally:
+            connection.close()
+        time_module.sleep(_setting_int("DATABASE_BACKUP_SCHEDULE_INTERVAL_SECONDS", 60, minimum=5))
+
+
+def _latest_scheduled_backups() -> dict[str, DatabaseBackup]:
+    return _newest_by_label(list_database_backups())
+
+
+def _newest_by_label(backups) -> dict[str, DatabaseBackup]:
+    # Backups are listed newest first.
+    latest = {}
+    for backup in backups:
+        label = _scheduled_label(backup.name)
+        if label and label not in latest:
+            latest[label] = backup
+    return latest
+
+
+def _scheduled_label(name: str) -> str | None:
+    for label in SCHEDULED_LABELS:
+        if name.startswith(f"welcome-system-{label}-"):
+            return label
+    return None
+
+
+def _today_at(now, at: time):
+    return timezone.make_aware(datetime.combine(now.date(), at), now.tzinfo)
+
+
+def _setting_time(name: str, default: str) -> time:
+    try:
+        return datetime.strptime(str(getattr(settings, name, default)), "%H:%M").time()
+    except ValueError:
+        return datetime.strptime(default, "%H:%M").time()
+
+
+def _setting_int(name: str, default: int, *, minimum: int = 0) -> int:
+    try:
+        return max(int(getattr(settings, name, default)), minimum)
+    except (TypeError, ValueError):
+        return default
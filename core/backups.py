@@ -1,25 +1,106 @@
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+import gzip
+import json
+import logging
 from pathlib import Path
+import shutil
 import sqlite3
+import struct
+import tempfile
+import threading
+import time
 
 from django.conf import settings
-from django.db import connections
+from django.db import close_old_connections, connection, connections
 from django.utils import timezone
 
+from .audit import log_event
+from .models import AuditLog
+
+
+logger = logging.getLogger(__name__)
 
 BACKUP_SUFFIX = ".sqlite3"
+COMPRESSED_SUFFIX = ".sqlite3.gz"
+PARTIAL_SUFFIX = ".partial"
+GZIP_MAGIC = b"\x1f\x8b"
+GZIP_LEVEL = 6
+COPY_CHUNK_BYTES = 1024 * 1024
+SQLITE_HEADER = b"SQLite format 3\x00"
+VERIFICATION_CACHE_NAME = ".verification.json"
+VERIFY_PENDING = "pending"
+VERIFY_OK = "verified"
+VERIFY_FAILED = "failed"
+
+_current_backup = None
+_backup_lock = threading.Lock()
+_verifier_thread = None
+_verification_lock = threading.Lock()
 
 
 class BackupError(Exception):
     """Raised when a database backup or restore cannot be completed."""
 
 
+class BackupCancelled(BackupError):
+    """Raised when a running backup is cancelled from the admin page."""
+
+
+class _StepwiseCopyAbandoned(Exception):
+    """Raised from the copy progress callback when writes keep restarting a stepwise copy."""
+
+
+@dataclass
+class BackupProgress:
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    label: str
+    status: str = RUNNING
+    backup_name: str = ""
+    pages_total: int = 0
+    pages_remaining: int = 0
+    started_at: object = None
+    finished_at: object = None
+    error: str = ""
+    cancel_requested: bool = False
+    restarts: int = 0
+    # Set when restarts made the copy fall back to one step that holds the read lock.
+    single_step: bool = False
+
+    @property
+    def is_running(self) -> bool:
+        return self.status == self.RUNNING
+
+    @property
+    def percent(self) -> int:
+        if self.status == self.DONE:
+            return 100
+        if not self.pages_total:
+            return 0
+        return int(100 * (self.pages_total - self.pages_remaining) / self.pages_total)
+
+
 @dataclass(frozen=True)
 class DatabaseBackup:
     name: str
     path: Path
     size_bytes: int
     created_at: object
+    logical_size_bytes: int = 0
+    verification_status: str = VERIFY_PENDING
+    verification_detail: str = ""
+
+    @property
+    def compressed(self) -> bool:
+        return self.name.endswith(COMPRESSED_SUFFIX)
+
+    @property
+    def download_name(self) -> str:
+        return self.name.removesuffix(".gz")
 
 
 def get_database_path() -> Path:
@@ -42,7 +123,16 @@ def get_backup_dir() -> Path:
     return backup_dir
 
 
-def create_database_backup(*, label: str = "manual") -> DatabaseBackup:
+def create_database_backup(
+    *, label: str = "manual", progress: BackupProgress | None = None, stepwise: bool = True
+) -> DatabaseBackup:
+    """Copy the live database a few pages at a time, so other connections keep writing between steps.
+
+    With ``stepwise=False`` the copy is taken in one step, holding the read lock
+    throughout, so writes cannot restart it. A stepwise copy that writes restart more
+    than ``DATABASE_BACKUP_MAX_RESTARTS`` times, or that runs longer than
+    ``DATABASE_BACKUP_STEPWISE_MAX_SECONDS``, falls back to that single step.
+    """
     source_name = get_database_name()
     if not _is_sqlite_uri(source_name) and not Path(source_name).exists():
         raise BackupError(f"Database file not found: {source_name}")
@@ -50,28 +140,100 @@ def create_database_backup(*, label: str = "manual") -> DatabaseBackup:
     timestamp = timezone.localtime().strftime("%Y%m%d-%H%M%S")
     safe_label = "".join(char for char in label.lower() if char.isalnum() or char in {"-", "_"}).strip("-_")
     safe_label = safe_label or "manual"
-    backup_path = get_backup_dir() / f"welcome-system-{safe_label}-{timestamp}{BACKUP_SUFFIX}"
+    backup_path = get_backup_dir() / f"welcome-system-{safe_label}-{timestamp}{COMPRESSED_SUFFIX}"
+    # Copy to a name the backup list ignores until the copy is complete and validated.
+    partial_path = backup_path.with_name(f"welcome-system-{safe_label}-{timestamp}{BACKUP_SUFFIX}{PARTIAL_SUFFIX}")
+    if progress is not None:
+        progress.backup_name = backup_path.name
+
+    stepping = stepwise
+    restarts = 0
+    copied_before = -1
+    deadline = time.monotonic() + _stepwise_max_seconds()
+
+    def report(_status, remaining, total):
+        nonlocal restarts, copied_before
+        if stepping:
+            # A restarted copy begins again at the first page, so fewer pages are done than after the last step.
+            copied = total - remaining
+            if copied <= copied_before:
+                restarts += 1
+            copied_before = copied
+        if progress is not None:
+            with _backup_lock:
+                progress.pages_total = total
+                progress.pages_remaining = remaining
+                progress.restarts = restarts
+                cancelled = progress.cancel_requested
+            if cancelled:
+                raise BackupCancelled("Backup cancelled.")
+        if stepping and remaining and (restarts > _max_restarts() or time.monotonic() > deadline):
+            raise _StepwiseCopyAbandoned()
 
-    connections.close_all()
-    source = sqlite3.connect(source_name, uri=_is_sqlite_uri(source_name))
     try:
-        destination = sqlite3.connect(backup_path)
+        source = sqlite3.connect(source_name, uri=_is_sqlite_uri(source_name))
         try:
-            source.backup(destination)
+            destination = sqlite3.connect(partial_path)
+            try:
+                # Each step holds a read lock only while it copies its pages. A write from
+                # another connection restarts the copy at the next step, so a backup taken
+                # during check-in finishes once writes pause, without blocking them.
+                if stepwise:
+                    try:
+                        source.backup(destination, pages=_pages_per_step(), progress=report, sleep=_step_sleep_seconds())
+                    except _StepwiseCopyAbandoned:
+                        logger.warning("Database backup restarted %s times; copying it in one step instead.", restarts)
+                        stepping = False
+                        if progress is not None:
+                            with _backup_lock:
+                                progress.single_step = True
+                if not stepping:
+                    # One step copies every page inside a single read transaction, so writes wait
+                    # for it instead of restarting it.
+                    source.backup(destination, progress=report)
+            finally:
+                destination.close()
         finally:
-            destination.close()
+            source.close()
+        validate_sqlite_database(partial_path)
+        _compress_file(partial_path, backup_path)
     finally:
-        source.close()
-
-    validate_sqlite_database(backup_path)
+        partial_path.unlink(missing_ok=True)
     return _backup_from_path(backup_path)
 
 
+def start_database_backup(*, label: str = "manual", user=None) -> BackupProgress:
+    """Run a backup on a background thread. Only one backup runs at a time."""
+    global _current_backup
+    with _backup_lock:
+        if _current_backup is not None and _current_backup.is_running:
+            raise BackupError("A backup is already running.")
+        progress = BackupProgress(label=label, started_at=timezone.now())
+        _current_backup = progress
+    threading.Thread(target=_run_in_thread, args=(progress, user), name="database-backup", daemon=True).start()
+    return replace(progress)
+
+
+def get_backup_progress() -> BackupProgress | None:
+    """Return a snapshot of the running or most recent background backup."""
+    with _backup_lock:
+        return replace(_current_backup) if _current_backup is not None else None
+
+
+def cancel_database_backup() -> bool:
+    with _backup_lock:
+        if _current_backup is None or not _current_backup.is_running:
+            return False
+        _current_backup.cancel_requested = True
+        return True
+
+
 def list_database_backups() -> list[DatabaseBackup]:
     backup_dir = get_backup_dir()
+    cache = _load_verification_cache(backup_dir)
     backups = [
-        _backup_from_path(path)
-        for path in backup_dir.glob(f"*{BACKUP_SUFFIX}")
+        _backup_from_path(path, cache)
+        for path in backup_dir.iterdir()
         if path.is_file() and _is_safe_backup_name(path.name)
     ]
     return sorted(backups, key=lambda backup: backup.created_at, reverse=True)
@@ -86,71 +248,301 @@ def get_backup_path(name: str) -> Path:
     return path
 
 
+def get_database_backup(name: str) -> DatabaseBackup:
+    path = get_backup_path(name)
+    return _backup_from_path(path, _load_verification_cache(path.parent))
+
+
 def save_uploaded_backup(uploaded_file) -> DatabaseBackup:
+    """Validate an uploaded plain or gzip-compressed SQLite backup and store it compressed."""
     timestamp = timezone.localtime().strftime("%Y%m%d-%H%M%S")
-    candidate_path = get_backup_dir() / f"welcome-system-uploaded-{timestamp}{BACKUP_SUFFIX}"
-    with candidate_path.open("wb") as output:
-        for chunk in uploaded_file.chunks():
-            output.write(chunk)
+    backup_path = get_backup_dir() / f"welcome-system-uploaded-{timestamp}{COMPRESSED_SUFFIX}"
+    candidate_path = backup_path.with_name(f"welcome-system-uploaded-{timestamp}.upload{PARTIAL_SUFFIX}")
     try:
+        with candidate_path.open("wb") as output:
+            for chunk in uploaded_file.chunks():
+                output.write(chunk)
         validate_sqlite_database(candidate_path)
-    except BackupError:
+        if _is_gzip_file(candidate_path):
+            candidate_path.replace(backup_path)
+        else:
+            _compress_file(candidate_path, backup_path)
+    finally:
         candidate_path.unlink(missing_ok=True)
-        raise
-    return _backup_from_path(candidate_path)
+    return _backup_from_path(backup_path)
+
+
+def store_database_file(path: Path, *, label: str) -> DatabaseBackup:
+    """Validate a plain SQLite database file and keep a compressed copy of it as a backup."""
+    validate_sqlite_database(path)
+    timestamp = timezone.localtime().strftime("%Y%m%d-%H%M%S")
+    backup_path = get_backup_dir() / f"welcome-system-{label}-{timestamp}{COMPRESSED_SUFFIX}"
+    _compress_file(path, backup_path)
+    return _backup_from_path(backup_path)
+
+
+def iter_backup_chunks(path: Path):
+    """Yield a backup's plain SQLite bytes, decompressing on the fly."""
+    with gzip.open(path, "rb") if _is_gzip_file(path) else path.open("rb") as backup_file:
+        yield from iter(lambda: backup_file.read(COPY_CHUNK_BYTES), b"")
 
 
 def restore_database_backup(backup_name: str) -> DatabaseBackup:
-    backup_path = get_backup_path(backup_name)
+    backup = get_database_backup(backup_name)
+    if backup.verification_status == VERIFY_FAILED:
+        raise BackupError(f"This backup failed its full integrity check: {backup.verification_detail}")
+    backup_path = backup.path
     validate_sqlite_database(backup_path)
-    create_database_backup(label="pre-restore")
+    progress = get_backup_progress()
+    if progress is not None and progress.is_running:
+        raise BackupError("Wait for the running backup to finish before restoring.")
+    # Every connection is about to close anyway, so copy in one step that writes cannot restart.
+    create_database_backup(label="pre-restore", stepwise=False)
     database_name = get_database_name()
 
-    connections.close_all()
-    source = sqlite3.connect(f"file:{backup_path}?mode=ro", uri=True)
-    try:
-        destination = sqlite3.connect(database_name, uri=_is_sqlite_uri(database_name))
+    with _uncompressed_copy(backup_path) as plain_path:
+        connections.close_all()
+        source = sqlite3.connect(f"file:{plain_path}?mode=ro", uri=True)
         try:
-            source.backup(destination)
+            destination = sqlite3.connect(database_name, uri=_is_sqlite_uri(database_name))
+            try:
+                source.backup(destination)
+            finally:
+                destination.close()
         finally:
-            destination.close()
-    finally:
-        source.close()
-        connections.close_all()
+            source.close()
+            connections.close_all()
     return _backup_from_path(backup_path)
 
 
 def validate_sqlite_database(path: Path) -> None:
+    """Check the header, the schema and SQLite's quick_check; the full integrity check runs in the background."""
     if not path.exists() or not path.is_file():
         raise BackupError("Backup file not found.")
-    try:
-        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    with _uncompressed_copy(path) as plain_path:
+        with plain_path.open("rb") as handle:
+            if handle.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+                raise BackupError("The selected file is not a valid SQLite database.")
         try:
-            result = connection.execute("PRAGMA integrity_check").fetchone()
-        finally:
-            connection.close()
-    except sqlite3.DatabaseError as exc:
-        raise BackupError("The selected file is not a valid SQLite database.") from exc
+            connection = sqlite3.connect(f"file:{plain_path}?mode=ro", uri=True)
+            try:
+                # Reading the schema parses every table definition.
+                connection.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                result = connection.execute("PRAGMA quick_check").fetchone()
+            finally:
+                connection.close()
+        except sqlite3.DatabaseError as exc:
+            raise BackupError("The selected file is not a valid SQLite database.") from exc
     if not result or result[0] != "ok":
-        raise BackupError("SQLite integrity check failed for the selected backup.")
+        raise BackupError("SQLite quick check failed for the selected backup.")
+
+
+def verify_database_backup(path: Path) -> tuple[str, str]:
+    """Run the full integrity check on a backup. Returns a verification status and detail."""
+    try:
+        with _uncompressed_copy(path) as plain_path:
+            connection = sqlite3.connect(f"file:{plain_path}?mode=ro", uri=True)
+            try:
+                problems = [row[0] for row in connection.execute("PRAGMA integrity_check(10)")]
+            finally:
+                connection.close()
+    except (BackupError, sqlite3.DatabaseError) as exc:
+        return VERIFY_FAILED, str(exc)
+    if problems == ["ok"]:
+        return VERIFY_OK, ""
+    return VERIFY_FAILED, "; ".join(problems)[:500]
+
+
+def verify_pending_backups(backup_dir: Path | None = None) -> int:
+    """Fully check every backup without a cached result for its current size and modification time."""
+    backup_dir = backup_dir or get_backup_dir()
+    verified = 0
+    for path in sorted(backup_dir.iterdir()):
+        if not path.is_file() or not _is_safe_backup_name(path.name):
+            continue
+        if _cached_verification(_load_verification_cache(backup_dir), path) is not None:
+            continue
+        status, detail = verify_database_backup(path)
+        with _verification_lock:
+            cache = _load_verification_cache(backup_dir)
+            cache = {name: entry for name, entry in cache.items() if (backup_dir / name).exists()}
+            stat = path.stat()
+            cache[path.name] = {
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "status": status,
+                "detail": detail,
+                "checked_at": timezone.now().isoformat(),
+            }
+            _save_verification_cache(backup_dir, cache)
+        verified += 1
+    return verified
+
+
+def start_backup_verification() -> bool:
+    """Verify pending backups on a background thread. Returns False if verification is already running."""
+    global _verifier_thread
+    backup_dir = get_backup_dir()
+    with _verification_lock:
+        if _verifier_thread is not None and _verifier_thread.is_alive():
+            return False
+        _verifier_thread = threading.Thread(target=_verify_in_thread, args=(backup_dir,), name="backup-verifier", daemon=True)
+        _verifier_thread.start()
+    return True
+
+
+def _verify_in_thread(backup_dir: Path) -> None:
+    try:
+        verify_pending_backups(backup_dir)
+    except Exception:
+        logger.exception("Backup verification failed.")
+
+
+def _load_verification_cache(backup_dir: Path) -> dict:
+    try:
+        cache = json.loads((backup_dir / VERIFICATION_CACHE_NAME).read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_verification_cache(backup_dir: Path, cache: dict) -> None:
+    partial_path = backup_dir / (VERIFICATION_CACHE_NAME + PARTIAL_SUFFIX)
+    partial_path.write_text(json.dumps(cache, indent=2, sort_keys=True))
+    partial_path.replace(backup_dir / VERIFICATION_CACHE_NAME)
+
+
+def _cached_verification(cache: dict, path: Path, stat=None) -> dict | None:
+    # A result only counts for the exact file it was computed on.
+    entry = cache.get(path.name)
+    stat = stat or path.stat()
+    if not isinstance(entry, dict) or entry.get("size") != stat.st_size or entry.get("mtime_ns") != stat.st_mtime_ns:
+        return None
+    return entry
+
+
+@contextmanager
+def _uncompressed_copy(path: Path):
+    # SQLite can only open plain files, so compressed backups are expanded to a
+    # temporary file next to the backups for the duration of the block.
+    if not _is_gzip_file(path):
+        yield path
+        return
+    handle, temp_name = tempfile.mkstemp(dir=path.parent, prefix=".restore-", suffix=PARTIAL_SUFFIX)
+    temp_path = Path(temp_name)
+    try:
+        try:
+            with gzip.open(path, "rb") as source, open(handle, "wb") as output:
+                shutil.copyfileobj(source, output, COPY_CHUNK_BYTES)
+        except (OSError, EOFError) as exc:
+            raise BackupError("The selected file is not a valid compressed SQLite backup.") from exc
+        yield temp_path
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def _compress_file(source_path: Path, target_path: Path) -> None:
+    partial_path = target_path.with_name(target_path.name + PARTIAL_SUFFIX)
+    try:
+        with source_path.open("rb") as source, gzip.open(partial_path, "wb", compresslevel=GZIP_LEVEL) as output:
+            shutil.copyfileobj(source, output, COPY_CHUNK_BYTES)
+        partial_path.replace(target_path)
+    finally:
+        partial_path.unlink(missing_ok=True)
+
 
+def _is_gzip_file(path: Path) -> bool:
+    with path.open("rb") as handle:
+        return handle.read(2) == GZIP_MAGIC
 
-def _backup_from_path(path: Path) -> DatabaseBackup:
+
+def _run_in_thread(progress: BackupProgress, user) -> None:
+    close_old_connections()
+    status, error = BackupProgress.DONE, ""
+    try:
+        backup = create_database_backup(label=progress.label, progress=progress)
+        log_event(
+            AuditLog.ACTION_DATABASE_BACKUP,
+            user=user,
+            message="Database backup created.",
+            metadata={"backup_name": backup.name, "size_bytes": backup.size_bytes, "label": progress.label},
+        )
+        start_backup_verification()
+    except BackupCancelled:
+        status = BackupProgress.CANCELLED
+    except BackupError as exc:
+        status, error = BackupProgress.FAILED, str(exc)
+    except Exception as exc:
+        logger.exception("Database backup failed.")
+        status, error = BackupProgress.FAILED, f"Unexpected backup error: {exc}"
+    finally:
+        if status != BackupProgress.DONE:
+            _log_unfinished_backup(progress, user, status, error)
+        with _backup_lock:
+            progress.status = status
+            progress.error = error
+            progress.finished_at = timezone.now()
+        connection.close()
+
+
+def _log_unfinished_backup(progress: BackupProgress, user, status: str, error: str) -> None:
+    try:
+        log_event(
+            AuditLog.ACTION_DATABASE_BACKUP,
+            user=user,
+            message=("Database backup cancelled." if status == BackupProgress.CANCELLED else f"Database backup failed: {error}")[:255],
+            metadata={"label": progress.label, "status": status},
+        )
+    except Exception:
+        logger.exception("Could not record the unfinished database backup.")
+
+
+def _pages_per_step() -> int:
+    return max(int(getattr(settings, "DATABASE_BACKUP_PAGES_PER_STEP", 256)), 1)
+
+
+def _step_sleep_seconds() -> float:
+    return max(float(getattr(settings, "DATABASE_BACKUP_STEP_SLEEP_SECONDS", 0.05)), 0.0)
+
+
+def _max_restarts() -> int:
+    return max(int(getattr(settings, "DATABASE_BACKUP_MAX_RESTARTS", 20)), 0)
+
+
+def _stepwise_max_seconds() -> float:
+    return max(float(getattr(settings, "DATABASE_BACKUP_STEPWISE_MAX_SECONDS", 300)), 0.0)
+
+
+def _backup_from_path(path: Path, verification_cache: dict | None = None) -> DatabaseBackup:
     stat = path.stat()
+    verification = _cached_verification(verification_cache or {}, path, stat) or {}
     return DatabaseBackup(
         name=path.name,
         path=path,
         size_bytes=stat.st_size,
         created_at=timezone.datetime.fromtimestamp(stat.st_mtime, tz=timezone.get_current_timezone()),
+        logical_size_bytes=_logical_size(path, stat.st_size),
+        verification_status=verification.get("status", VERIFY_PENDING),
+        verification_detail=verification.get("detail", ""),
     )
 
 
+def _logical_size(path: Path, size_bytes: int) -> int:
+    if not path.name.endswith(COMPRESSED_SUFFIX) or size_bytes < 18:
+        return size_bytes
+    # The gzip trailer stores the uncompressed size modulo 4 GiB, far above any
+    # database this app keeps, so listing backups never decompresses them.
+    with path.open("rb") as handle:
+        handle.seek(-4, 2)
+        return struct.unpack("<I", handle.read(4))[0]
+
+
 def _is_safe_backup_name(name: str) -> bool:
     return (
         bool(name)
         and "/" not in name
         and "\\" not in name
-        and name.endswith(BACKUP_SUFFIX)
+        and name.endswith((BACKUP_SUFFIX, COMPRESSED_SUFFIX))
         and all(char.isalnum() or char in {"-", "_", "."} for char in name)
     )
 
@@ -0,0 +1,273 @@
+"""Minimal IPP/1.1 client for sending label PDFs to CUPS or a printer's own IPP endpoint.
+
+Only the operations the print path needs are implemented: Print-Job and
+Get-Job-Attributes. Messages are encoded per RFC 8010 and posted over a kept-alive
+HTTP connection per worker thread, the same way the PrintNode client reuses its
+connection.
+"""
+
+from dataclasses import dataclass, field
+import http.client
+import itertools
+import struct
+import threading
+from urllib.parse import urlsplit
+
+from .printnode_client import STALE_CONNECTION_ERRORS
+
+
+IPP_VERSION = (2, 0)
+IPP_DEFAULT_PORT = 631
+IPP_CONTENT_TYPE = "application/ipp"
+
+OPERATION_PRINT_JOB = 0x0002
+OPERATION_GET_JOB_ATTRIBUTES = 0x0009
+
+OPERATION_ATTRIBUTES_TAG = 0x01
+JOB_ATTRIBUTES_TAG = 0x02
+END_OF_ATTRIBUTES_TAG = 0x03
+PRINTER_ATTRIBUTES_TAG = 0x04
+UNSUPPORTED_ATTRIBUTES_TAG = 0x05
+
+INTEGER = 0x21
+BOOLEAN = 0x22
+ENUM = 0x23
+TEXT = 0x41
+NAME = 0x42
+KEYWORD = 0x44
+URI = 0x45
+CHARSET = 0x47
+NATURAL_LANGUAGE = 0x48
+MIME_MEDIA_TYPE = 0x49
+STRING_TAGS = {TEXT, NAME, KEYWORD, URI, 0x46, CHARSET, NATURAL_LANGUAGE, MIME_MEDIA_TYPE}
+
+JOB_STATES = {
+    3: "pending",
+    4: "pending-held",
+    5: "processing",
+    6: "processing-stopped",
+    7: "canceled",
+    8: "aborted",
+    9: "completed",
+}
+FINISHED_JOB_STATES = {"canceled", "aborted", "completed"}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class IppError(Exception):
+    """The endpoint answered, but not with a successful IPP response."""
+
+
+@dataclass
+class IppMessage:
+    code: int
+    request_id: int
+    groups: list = field(default_factory=list)
+    data: bytes = b""
+    version: tuple = IPP_VERSION
+
+    @property
+    def ok(self) -> bool:
+        return self.code < 0x0100
+
+    def attribute(self, name: str, group_tag: int | None = None):
+        for tag, attributes in self.groups:
+            if (group_tag is None or tag == group_tag) and name in attributes:
+                return attributes[name][0]
+        return None
+
+
+@dataclass(frozen=True)
+class IppJob:
+    job_id: int
+    job_uri: str
+    state: str
+
+
+def encode_message(message: IppMessage) -> bytes:
+    """Encode ``message``; group attributes are ``{name: [(value_tag, value), ...]}``."""
+    out = bytearray(bytes(message.version) + struct.pack(">hi", message.code, message.request_id))
+    for group_tag, attributes in message.groups:
+        out.append(group_tag)
+        for name, values in attributes.items():
+            for index, (value_tag, value) in enumerate(values):
+                encoded_name = name.encode("utf-8") if index == 0 else b""
+                encoded_value = _encode_value(value_tag, value)
+                out += struct.pack(">bh", value_tag, len(encoded_name)) + encoded_name
+                out += struct.pack(">h", len(encoded_value)) + encoded_value
+    out.append(END_OF_ATTRIBUTES_TAG)
+    return bytes(out) + message.data
+
+
+def decode_message(body: bytes) -> IppMessage:
+    """Decode an IPP request or response; attribute values are returned without their tags."""
+    try:
+        major, minor, code, request_id = struct.unpack_from(">bbhi", body, 0)
+        position = 8
+        groups = []
+        attributes = None
+        name = ""
+        while True:
+            tag = body[position]
+            position += 1
+            if tag == END_OF_ATTRIBUTES_TAG:
+                break
+            if tag < 0x10:
+                attributes = {}
+                groups.append((tag, attributes))
+                continue
+            if attributes is None:
+                raise IppError("IPP attribute appeared before any attribute group.")
+            (name_length,) = struct.unpack_from(">h", body, position)
+            position += 2
+            if name_length:
+                name = body[position : position + name_length].decode("utf-8")
+                position += name_length
+            (value_length,) = struct.unpack_from(">h", body, position)
+            position += 2
+            raw_value = body[position : position + value_length]
+            if len(raw_value) != value_length:
+                raise IppError("IPP message ended inside an attribute value.")
+            position += value_length
+            attributes.setdefault(name, []).append(_decode_value(tag, raw_value))
+    except (IndexError, struct.error, UnicodeDecodeError) as exc:
+        raise IppError("IPP message is truncated or malformed.") from exc
+    return IppMessage(code=code, request_id=request_id, groups=groups, data=body[position:], version=(major, minor))
+
+
+class IppClient:
+    """IPP client for one host that keeps one HTTP connection open per worker thread."""
+
+    def __init__(self, scheme: str, host: str, port: int, *, timeout: float):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+        self._request_ids = itertools.count(1)
+
+    def print_job(self, printer_uri: str, document: bytes, *, job_name: str, user_name: str, document_format: str = "application/pdf") -> IppJob:
+        attributes = {
+            **_operation_attributes(printer_uri, user_name),
+            "job-name": [(NAME, job_name)],
+            "document-format": [(MIME_MEDIA_TYPE, document_format)],
+        }
+        response = self._call(printer_uri, OPERATION_PRINT_JOB, attributes, data=document)
+        job_id = response.attribute("job-id", JOB_ATTRIBUTES_TAG)
+        if not isinstance(job_id, int):
+            raise IppError("IPP printer accepted the job but did not return a job id.")
+        return IppJob(
+            job_id=job_id,
+            job_uri=response.attribute("job-uri", JOB_ATTRIBUTES_TAG) or "",
+            state=JOB_STATES.get(response.attribute("job-state", JOB_ATTRIBUTES_TAG), "unknown"),
+        )
+
+    def get_job_state(self, printer_uri: str, job_id: int, *, user_name: str) -> str:
+        attributes = {
+            **_operation_attributes(printer_uri, user_name),
+            "job-id": [(INTEGER, int(job_id))],
+            "requested-attributes": [(KEYWORD, "job-state")],
+        }
+        response = self._call(printer_uri, OPERATION_GET_JOB_ATTRIBUTES, attributes)
+        return JOB_STATES.get(response.attribute("job-state", JOB_ATTRIBUTES_TAG), "unknown")
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            connection.close()
+
+    def _call(self, printer_uri: str, operation: int, attributes: dict, *, data: bytes = b"") -> IppMessage:
+        request = IppMessage(code=operation, request_id=next(self._request_ids), groups=[(OPERATION_ATTRIBUTES_TAG, attributes)], data=data)
+        response = decode_message(self._post(urlsplit(printer_uri).path or "/", encode_message(request)))
+        if not response.ok:
+            detail = response.attribute("status-message", OPERATION_ATTRIBUTES_TAG) or f"status 0x{response.code:04x}"
+            raise IppError(f"IPP printer rejected the request: {detail}")
+        return response
+
+    def _post(self, path: str, body: bytes) -> bytes:
+        connection, reused = self._connection()
+        try:
+            return self._send(connection, path, body)
+        except STALE_CONNECTION_ERRORS:
+            self.close()
+            if not reused:
+                raise
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+        connection, _reused = self._connection()
+        try:
+            return self._send(connection, path, body)
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and connection.sock is not None:
+            return connection, True
+        connection_class = http.client.HTTPSConnection if self.scheme == "ipps" else http.client.HTTPConnection
+        connection = connection_class(self.host, self.port, timeout=self.timeout)
+        connection.connect()
+        self._local.connection = connection
+        return connection, False
+
+    def _send(self, connection, path: str, body: bytes) -> bytes:
+        connection.request("POST", path, body=body, headers={"Content-Type": IPP_CONTENT_TYPE, "Accept": IPP_CONTENT_TYPE})
+        response = connection.getresponse()
+        response_body = response.read()
+        if response.will_close:
+            self.close()
+        if response.status != 200:
+            raise IppError(f"IPP endpoint returned HTTP {response.status} {response.reason}.")
+        return response_body
+
+
+def get_ipp_client(printer_uri: str, *, timeout: float) -> IppClient:
+    scheme, host, port = parse_ipp_uri(printer_uri)
+    key = (scheme, host, port, float(timeout))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = IppClient(scheme, host, port, timeout=float(timeout))
+        return client
+
+
+def parse_ipp_uri(printer_uri: str) -> tuple[str, str, int]:
+    parts = urlsplit(printer_uri)
+    if parts.scheme not in {"ipp", "ipps"} or not parts.hostname:
+        raise ValueError(f'"{printer_uri}" is not a valid ipp:// or ipps:// printer URI.')
+    return parts.scheme, parts.hostname, parts.port or IPP_DEFAULT_PORT
+
+
+def _operation_attributes(printer_uri: str, user_name: str) -> dict:
+    # RFC 8011 requires charset and language first, then the target printer.
+    return {
+        "attributes-charset": [(CHARSET, "utf-8")],
+        "attributes-natural-language": [(NATURAL_LANGUAGE, "en")],
+        "printer-uri": [(URI, printer_uri)],
+        "requesting-user-name": [(NAME, user_name)],
+    }
+
+
+def _encode_value(value_tag: int, value) -> bytes:
+    if value_tag in {INTEGER, ENUM}:
+        return struct.pack(">i", int(value))
+    if value_tag == BOOLEAN:
+        return bytes([1 if value else 0])
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
+
+
+def _decode_value(value_tag: int, raw_value: bytes):
+    if value_tag in {INTEGER, ENUM} and len(raw_value) == 4:
+        return struct.unpack(">i", raw_value)[0]
+    if value_tag == BOOLEAN and len(raw_value) == 1:
+        return bool(raw_value[0])
+    if value_tag in STRING_TAGS:
+        return raw_value.decode("utf-8")
+    return raw_value
@@ -0,0 +1,176 @@
+from dataclasses import asdict, dataclass
+import json
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import printnode
+
+
+BATCH_SIZES = {"single": 1, "family": 5, "event": 500}
+MEDIA_MODES = ("62", "62red")
+NAME_LENGTHS = {
+    "short": ("Ada", "Lee"),
+    "long": ("Maximilianus-Alexander", "Featherstonehaugh-Worthington"),
+}
+STAGES = ("label_image", "normalize_colors", "raster", "pdf", "write_pdf")
+
+
+@dataclass(frozen=True)
+class BenchmarkScenario:
+    stage: str
+    batch: str
+    media: str
+    name_length: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.stage}/{self.batch}/{self.media}/{self.name_length}"
+
+    @property
+    def batch_size(self) -> int:
+        return BATCH_SIZES[self.batch]
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    name: str
+    stage: str
+    batch: str
+    batch_size: int
+    media: str
+    name_length: str
+    repeats: int
+    median_ms: float
+    p95_ms: float
+    peak_memory_kb: int
+
+
+def build_scenarios(*, stages=STAGES, batches=tuple(BATCH_SIZES), media_modes=MEDIA_MODES, name_lengths=tuple(NAME_LENGTHS)):
+    scenarios = []
+    for stage in stages:
+        for batch in batches:
+            for media in media_modes:
+                # Only black/red media goes through colour normalisation; PDF output ignores media.
+                if stage == "normalize_colors" and media != "62red":
+                    continue
+                if stage in {"pdf", "write_pdf"} and media != MEDIA_MODES[0]:
+                    continue
+                for name_length in name_lengths:
+                    scenarios.append(BenchmarkScenario(stage, batch, media, name_length))
+    return scenarios
+
+
+def run_scenario(scenario: BenchmarkScenario, *, repeats: int) -> BenchmarkResult:
+    operation = _prepare(scenario)
+    operation()  # Warm font and module caches so the first sample is not an outlier.
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        operation()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return BenchmarkResult(
+        name=scenario.name,
+        stage=scenario.stage,
+        batch=scenario.batch,
+        batch_size=scenario.batch_size,
+        media=scenario.media,
+        name_length=scenario.name_length,
+        repeats=repeats,
+        median_ms=round(statistics.median(samples), 3),
+        p95_ms=round(_percentile(samples, 95), 3),
+        peak_memory_kb=int(peak / 1024),
+    )
+
+
+def run_benchmarks(scenarios, *, repeats: int, event_repeats: int | None = None, progress=None) -> dict:
+    results = []
+    for scenario in scenarios:
+        scenario_repeats = event_repeats if event_repeats and scenario.batch == "event" else repeats
+        result = run_scenario(scenario, repeats=scenario_repeats)
+        results.append(result)
+        if progress:
+            progress(result)
+    return {
+        "version": getattr(settings, "CATS_VERSION", ""),
+        "created_at": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [asdict(result) for result in results],
+    }
+
+
+def compare_benchmarks(current: dict, baseline: dict, *, threshold: float) -> list[dict]:
+    """Return the scenarios whose median time grew by more than ``threshold`` (e.g. 1.2 = 20%)."""
+    baseline_by_name = {result["name"]: result for result in baseline.get("results", [])}
+    regressions = []
+    for result in current.get("results", []):
+        previous = baseline_by_name.get(result["name"])
+        if not previous or not previous.get("median_ms"):
+            continue
+        ratio = result["median_ms"] / previous["median_ms"]
+        if ratio > threshold:
+            regressions.append(
+                {
+                    "name": result["name"],
+                    "baseline_ms": previous["median_ms"],
+                    "median_ms": result["median_ms"],
+                    "ratio": round(ratio, 2),
+                }
+            )
+    return regressions
+
+
+def load_benchmark_file(path) -> dict:
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _prepare(scenario: BenchmarkScenario):
+    first_name, last_name = NAME_LENGTHS[scenario.name_length]
+    rows = [(first_name, last_name)] * scenario.batch_size
+    profile = {"name": "benchmark", "brother_label_media": scenario.media}
+
+    if scenario.stage == "label_image":
+        return lambda: printnode._build_label_images_from_rows(rows, profile=profile)
+    if scenario.stage == "normalize_colors":
+        images = printnode._build_label_images_from_rows(rows, profile=profile)
+        return lambda: [printnode._normalize_brother_label_colors(image) for image in images]
+    if scenario.stage == "raster":
+        return lambda: printnode._build_label_raw_from_rows(rows, profile=profile)
+    if scenario.stage == "pdf":
+        return lambda: printnode._build_label_pdf_from_rows(rows, profile=profile)
+    if scenario.stage == "write_pdf":
+        objects = _capture_pdf_objects(rows, profile)
+        return lambda: printnode._write_pdf(objects)
+    raise ValueError(f'Unknown benchmark stage "{scenario.stage}".')
+
+
+def _capture_pdf_objects(rows, profile) -> list[str]:
+    captured = []
+    write_pdf = printnode._write_pdf
+    printnode._write_pdf = lambda objects: captured.append(objects) or b""
+    try:
+        printnode._build_label_pdf_from_rows(rows, profile=profile)
+    finally:
+        printnode._write_pdf = write_pdf
+    return captured[0]
+
+
+def _percentile(samples, percent: int) -> float:
+    ordered = sorted(samples)
+    rank = max(math.ceil(len(ordered) * percent / 100), 1)
+    return ordered[rank - 1]
@@ -0,0 +1,21 @@
+"""Process-pool entry points for label rendering.
+
+This module is imported by freshly spawned worker processes before Django is
+configured, so it must not import models at module level.
+"""
+
+
+def init_worker() -> None:
+    import django
+
+    django.setup()
+
+
+def render_label_chunk(rows, profile: dict, output: str):
+    from .printnode import _build_label_images_from_rows, _build_label_pdf_from_rows, _build_label_raw_from_rows
+
+    if output == "raw":
+        return _build_label_raw_from_rows(rows, profile=profile)
+    if output == "pdf":
+        return _build_label_pdf_from_rows(rows, profile=profile)
+    return _build_label_images_from_rows(rows, profile=profile)
@@ -0,0 +1,88 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.label_benchmarks import (
+    BATCH_SIZES,
+    MEDIA_MODES,
+    NAME_LENGTHS,
+    STAGES,
+    build_scenarios,
+    compare_benchmarks,
+    load_benchmark_file,
+    run_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark nametag rendering (label images, colour normalisation, raster, PDF) and write the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Write JSON results to this file instead of stdout.")
+        parser.add_argument("--repeats", type=int, default=7, help="Timed runs per scenario (default 7).")
+        parser.add_argument("--event-repeats", type=int, default=3, help="Timed runs for 500-label scenarios (default 3).")
+        parser.add_argument("--stage", action="append", choices=STAGES, help="Only run these stages.")
+        parser.add_argument("--batch", action="append", choices=list(BATCH_SIZES), help="Only run these batch sizes.")
+        parser.add_argument("--media", action="append", choices=MEDIA_MODES, help="Only run these media modes.")
+        parser.add_argument("--names", action="append", choices=list(NAME_LENGTHS), help="Only run these name lengths.")
+        parser.add_argument("--quick", action="store_true", help="Skip the 500-label event scenarios.")
+        parser.add_argument("--compare", help="Baseline JSON file to compare median times against.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=1.2,
+            help="Fail when a median is more than this many times the baseline (default 1.2).",
+        )
+
+    def handle(self, *args, **options):
+        if options["repeats"] < 1 or options["event_repeats"] < 1:
+            raise CommandError("Repeats must be at least 1.")
+        batches = options["batch"] or [batch for batch in BATCH_SIZES if not (options["quick"] and batch == "event")]
+        scenarios = build_scenarios(
+            stages=options["stage"] or STAGES,
+            batches=batches,
+            media_modes=options["media"] or MEDIA_MODES,
+            name_lengths=options["names"] or tuple(NAME_LENGTHS),
+        )
+        if not scenarios:
+            raise CommandError("No benchmark scenarios match the selected filters.")
+
+        baseline = None
+        if options["compare"]:
+            try:
+                baseline = load_benchmark_file(options["compare"])
+            except (OSError, json.JSONDecodeError) as exc:
+                raise CommandError(f"Could not read baseline file: {exc}") from exc
+
+        def progress(result):
+            self.stderr.write(
+                f"{result.name:<40} median {result.median_ms:>9.2f} ms  p95 {result.p95_ms:>9.2f} ms  "
+                f"peak {result.peak_memory_kb:>7} KB"
+            )
+
+        report = run_benchmarks(
+            scenarios,
+            repeats=options["repeats"],
+            event_repeats=options["event_repeats"],
+            progress=progress,
+        )
+        payload = json.dumps(report, indent=2)
+        if options["output"]:
+            Path(options["output"]).write_text(payload + "\n", encoding="utf-8")
+            self.stderr.write(self.style.SUCCESS(f"Wrote {len(report['results'])} results to {options['output']}."))
+        else:
+            self.stdout.write(payload)
+
+        if baseline is not None:
+            regressions = compare_benchmarks(report, baseline, threshold=options["threshold"])
+            for regression in regressions:
+                self.stderr.write(
+                    self.style.ERROR(
+                        f"Regression: {regression['name']} {regression['baseline_ms']} ms -> "
+                        f"{regression['median_ms']} ms (x{regression['ratio']})"
+                    )
+                )
+            if regressions:
+                raise CommandError(f"{len(regressions)} benchmark scenario(s) regressed beyond x{options['threshold']}.")
+            self.stderr.write(self.style.SUCCESS("No benchmark regressions against the baseline."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Person
+from core.photos import PhotoThumbnailError, generate_photo_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Make the avatar and profile thumbnails for person photos that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild thumbnails that already exist.")
+
+    def handle(self, *args, **options):
+        written = failed = 0
+        people = Person.objects.exclude(photo="").exclude(photo__isnull=True).only("id", "photo").order_by("id")
+        for person in people.iterator():
+            try:
+                written += len(generate_photo_thumbnails(person.photo, force=options["force"]))
+            except PhotoThumbnailError as exc:
+                failed += 1
+                self.stderr.write(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} thumbnail(s); {failed} photo(s) could not be read."))
@@ -0,0 +1,49 @@
+from datetime import datetime
+from pathlib import Path
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.backups import BackupError, get_backup_dir, store_database_file, validate_sqlite_database
+from core.replication import ReplicationError, restore_replica
+
+
+class Command(BaseCommand):
+    help = "Rebuild the database from the continuous replica as of a point in time and save it as a backup."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--at", help='Local time to restore to, as "YYYY-MM-DD HH:MM[:SS]" (default: latest).')
+        parser.add_argument("--replica-dir", default="", help="Replica directory (default: DATABASE_REPLICA_DIR).")
+        parser.add_argument("--output", help="Write the plain SQLite file here instead of adding it to the backups.")
+
+    def handle(self, *args, **options):
+        replica_dir = options["replica_dir"] or getattr(settings, "DATABASE_REPLICA_DIR", "")
+        if not replica_dir:
+            raise CommandError("Set DATABASE_REPLICA_DIR or pass --replica-dir.")
+        at = None
+        if options["at"]:
+            try:
+                at = datetime.fromisoformat(options["at"])
+            except ValueError as exc:
+                raise CommandError(f'Could not read the time "{options["at"]}".') from exc
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+
+        try:
+            if options["output"]:
+                restored_at = restore_replica(replica_dir, Path(options["output"]), at=at)
+                validate_sqlite_database(Path(options["output"]))
+                destination = options["output"]
+            else:
+                with tempfile.TemporaryDirectory(dir=get_backup_dir()) as scratch_dir:
+                    scratch = Path(scratch_dir) / "replica.sqlite3"
+                    restored_at = restore_replica(replica_dir, scratch, at=at)
+                    backup = store_database_file(scratch, label="replica")
+                destination = f"backup {backup.name}; restore it from the Database Backup page"
+        except (ReplicationError, BackupError) as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the database as of {timezone.localtime(restored_at):%Y-%m-%d %H:%M:%S} into {destination}.")
+        )
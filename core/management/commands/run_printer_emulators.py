@@ -0,0 +1,99 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.printer_emulators import MEDIA_TYPES, BrotherPrinterEmulator, PrintNodeEmulator
+
+
+class Command(BaseCommand):
+    help = "Run local Brother QL and PrintNode emulators for end-to-end print load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--printers", type=int, default=1, help="Brother printers to emulate on 127.0.0.1, 127.0.0.2, ... (default 1).")
+        parser.add_argument("--raw-port", type=int, default=9100, help="Raw job port on each emulated printer (default 9100).")
+        parser.add_argument("--status-port", type=int, default=8080, help="Status page port on each emulated printer (default 8080).")
+        parser.add_argument("--media", choices=sorted(MEDIA_TYPES), default="62red", help="Loaded media reported by the status page.")
+        parser.add_argument("--printnode-port", type=int, default=8765, help="PrintNode API port; 0 disables it (default 8765).")
+        parser.add_argument("--printnode-api-key", default="", help="Only accept this PrintNode API key (default: accept any).")
+        parser.add_argument("--latency-ms", type=int, default=0, help="Delay added to every emulated request.")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests to fail, from 0 to 1.")
+        parser.add_argument("--empty-media", action="append", default=[], metavar="HOST", help="Start this emulated printer with empty media.")
+        parser.add_argument("--busy", action="append", default=[], metavar="HOST", help="Start this emulated printer busy.")
+        parser.add_argument("--report-interval", type=int, default=10, help="Seconds between throughput reports; 0 disables them.")
+        parser.add_argument("--seed", type=int, help="Random seed for repeatable failure injection.")
+
+    def handle(self, *args, **options):
+        if not 0 <= options["failure_rate"] <= 1:
+            raise CommandError("Failure rate must be between 0 and 1.")
+        if not 1 <= options["printers"] <= 254:
+            raise CommandError("Printers must be between 1 and 254.")
+
+        printers = []
+        printnode = None
+        try:
+            for index in range(1, options["printers"] + 1):
+                host = f"127.0.0.{index}"
+                printer = BrotherPrinterEmulator(
+                    host,
+                    raw_port=options["raw_port"],
+                    status_port=options["status_port"],
+                    media=options["media"],
+                    latency_ms=options["latency_ms"],
+                    failure_rate=options["failure_rate"],
+                    seed=options["seed"],
+                )
+                printer.set_state(
+                    device_status="Busy" if host in options["busy"] else None,
+                    media_status="Empty" if host in options["empty_media"] else None,
+                )
+                printers.append(printer.start())
+            if options["printnode_port"]:
+                printnode = PrintNodeEmulator(
+                    port=options["printnode_port"],
+                    api_key=options["printnode_api_key"],
+                    latency_ms=options["latency_ms"],
+                    failure_rate=options["failure_rate"],
+                    seed=options["seed"],
+                ).start()
+        except OSError as exc:
+            for printer in printers:
+                printer.stop()
+            raise CommandError(f"Could not start emulators: {exc}") from exc
+
+        printer_map = {f"kiosk{index}": f"{printer.host}:{printer.raw_port}" for index, printer in enumerate(printers, start=1)}
+        self.stdout.write("Emulators running. Point the app at them with:")
+        self.stdout.write(f"  BROTHER_STATUS_PORT = {options['status_port']}")
+        if printnode:
+            self.stdout.write(f'  PRINTNODE_API_BASE_URL = "{printnode.base_url}"')
+        self.stdout.write(f"  server_printer_map = {json.dumps(printer_map)}")
+        self.stdout.write(
+            f"Inject states with: curl -d media_status=Empty http://{printers[0].host}:{options['status_port']}/emulator/state"
+        )
+
+        started = time.monotonic()
+        try:
+            while True:
+                time.sleep(options["report_interval"] or 3600)
+                if options["report_interval"]:
+                    self._report(printers, printnode, time.monotonic() - started)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._report(printers, printnode, time.monotonic() - started)
+            for printer in printers:
+                printer.stop()
+            if printnode:
+                printnode.stop()
+
+    def _report(self, printers, printnode, elapsed):
+        emulators = [(printer.host, printer) for printer in printers]
+        if printnode:
+            emulators.append(("printnode", printnode))
+        for name, emulator in emulators:
+            stats = emulator.stats.as_dict()
+            rate = stats["labels"] / elapsed if elapsed else 0
+            self.stdout.write(
+                f"{name:<12} jobs {stats['jobs']:>6}  labels {stats['labels']:>7} ({rate:6.1f}/s)  "
+                f"failed {stats['failed']:>5}  rejected {stats['rejected']:>5}"
+            )
@@ -0,0 +1,145 @@
+"""Serving uploaded media (person photos and kiosk logos) with HTTP caching.
+
+Django's ``static()`` helper only serves ``MEDIA_ROOT`` while ``DEBUG`` is on,
+so this view serves it in every mode. Responses carry ``ETag`` and
+``Last-Modified`` so browsers revalidate with a 304, and URLs built by
+``versioned_media_url`` end in ``?v=<version>``. While that version still
+matches the file, the response is cached as immutable for a year. Whole files
+are handed to the WSGI server's file wrapper, so Waitress streams them from
+the open file without copying them through Python. Single byte ranges get a
+206 response.
+"""
+
+import mimetypes
+import os
+from pathlib import Path
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+# Kiosk logos appear on the login screen, so they are served without a session.
+PUBLIC_MEDIA_PREFIXES = ("branding/",)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+RANGE_CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def media_version(stat_result: os.stat_result) -> str:
+    return f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+
+
+def versioned_media_url(name: str, storage=None) -> str:
+    """URL of a stored file ending in ``?v=<version>``, or "" if the file does not exist."""
+    storage = storage or default_storage
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        return storage.url(name) if storage.exists(name) else ""
+    try:
+        version = media_version(os.stat(path))
+    except OSError:
+        return ""
+    return f"{storage.url(name)}?v={version}"
+
+
+def serve_media(request, path: str):
+    if request.method not in {"GET", "HEAD"}:
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+    public = path.startswith(PUBLIC_MEDIA_PREFIXES)
+    if not public and not request.user.is_authenticated:
+        raise PermissionDenied
+    try:
+        full_path = Path(safe_join(settings.MEDIA_ROOT, path))
+        file_stat = full_path.stat()
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("Media file not found.")
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404("Media file not found.")
+
+    size = file_stat.st_size
+    version = media_version(file_stat)
+    etag = f'"{version}"'
+    scope = "public" if public else "private"
+    if request.GET.get("v") == version:
+        cache_control = f"{scope}, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        cache_control = f"{scope}, no-cache"
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(file_stat.st_mtime),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    conditional = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(file_stat.st_mtime),
+        response=HttpResponse(headers=headers),
+    )
+    if conditional.status_code in {304, 412}:
+        return conditional
+
+    content_type = mimetypes.guess_type(full_path.name)[0] or "application/octet-stream"
+    byte_range = None
+    if request.headers.get("If-Range", etag) == etag:
+        byte_range = _requested_range(request.headers.get("Range", ""), size)
+    if byte_range and byte_range[0] >= size:
+        return HttpResponse(status=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            () if request.method == "HEAD" else _read_range(full_path, start, length),
+            status=206,
+            content_type=content_type,
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"},
+        )
+        response["Content-Length"] = str(length)
+        return response
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response["Content-Length"] = str(size)
+        return response
+    response = FileResponse(full_path.open("rb"), content_type=content_type, headers=headers)
+    response["Content-Length"] = str(size)
+    return response
+
+
+def _requested_range(header: str, size: int) -> tuple[int, int] | None:
+    """The single byte range asked for, or None to send the whole file.
+
+    Multiple ranges and malformed headers are ignored, as RFC 9110 allows.
+    An unsatisfiable range comes back with a start at or past ``size``.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or not (match[1] or match[2]):
+        return None
+    if not match[1]:
+        suffix_length = int(match[2])
+        if not suffix_length:
+            return size, size
+        return max(size - suffix_length, 0), size - 1
+    start = int(match[1])
+    if match[2] and int(match[2]) < start:
+        return None
+    end = min(int(match[2]), size - 1) if match[2] else size - 1
+    return start, end
+
+
+def _read_range(path: Path, start: int, length: int):
+    with path.open("rb") as handle:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
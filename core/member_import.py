@@ -1,14 +1,38 @@
 from dataclasses import dataclass, field
 import csv
-from io import StringIO
+from io import TextIOWrapper
+import string
 
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
 
 from .models import Family, Person
 
 
-MAX_IMPORT_ROWS = 1000
+IMPORT_CHUNK_SIZE = 500
+UPDATE_FIELDS = [
+    "member_type",
+    "family",
+    "first_name",
+    "middle_initial",
+    "last_name",
+    "street_address",
+    "city",
+    "state_province",
+    "postal_code",
+    "country",
+    "phone",
+    "email",
+    "notes",
+    "birth_month",
+    "birth_day",
+    "is_active",
+]
+# SQLite's LOWER() and iexact only fold ASCII letters; index keys fold the same way.
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
 
 FIELD_ALIASES = {
     "first_name": {"first", "first name", "firstname", "given name"},
@@ -58,37 +82,100 @@ class MemberImportResult:
         return any(row.errors for row in self.rows)
 
 
-def parse_member_csv(uploaded_file) -> list[MemberImportRow]:
-    try:
-        raw = uploaded_file.read()
-    except AttributeError as exc:
-        raise MemberImportError("Upload a CSV file.") from exc
+class MemberIndex:
+    """Existing people that import rows could match, loaded in one query."""
+
+    def __init__(self, people=()):
+        self._by_email = {}
+        self._by_name = {}
+        for person in people:
+            self.add(person)
+
+    @classmethod
+    def for_rows(cls, rows: list[MemberImportRow]) -> "MemberIndex":
+        emails = {fold_key(row.data.get("email")) for row in rows if row.data.get("email")}
+        last_names = {fold_key(row.data.get("last_name")) for row in rows if row.data.get("last_name")}
+        if not emails and not last_names:
+            return cls()
+        people = (
+            Person.objects.annotate(email_key=Lower("email"), last_name_key=Lower("last_name"))
+            .filter(Q(email_key__in=emails) | Q(last_name_key__in=last_names))
+            .order_by("id")
+        )
+        return cls(people)
+
+    def add(self, person: Person) -> None:
+        if person.email:
+            self._by_email.setdefault(fold_key(person.email), person)
+        self._by_name.setdefault((fold_key(person.first_name), fold_key(person.last_name)), []).append(person)
+
+    def find(self, data: dict) -> Person | None:
+        """Match by email, then by first and last name with the last four phone digits."""
+        email = data.get("email", "")
+        if email and fold_key(email) in self._by_email:
+            return self._by_email[fold_key(email)]
+
+        phone = data.get("phone", "")
+        if phone:
+            needle = fold_key(phone[-4:] if len(phone) >= 4 else phone)
+            for person in self._by_name.get(self._name_key(data), []):
+                if needle in fold_key(person.phone):
+                    return person
+        return None
+
+    def has_name(self, data: dict) -> bool:
+        return self._name_key(data) in self._by_name
+
+    def people_named(self, data: dict) -> list[Person]:
+        return list({person.pk: person for person in self._by_name.get(self._name_key(data), [])}.values())
 
+    def _name_key(self, data: dict) -> tuple[str, str]:
+        return fold_key(data.get("first_name")), fold_key(data.get("last_name"))
+
+
+def iter_member_csv_chunks(binary_file, *, chunk_size: int = IMPORT_CHUNK_SIZE, skip_rows: int = 0):
+    """Stream validated rows from a CSV opened in binary mode, ``chunk_size`` rows at a time.
+
+    ``skip_rows`` member rows are read past without validation, so a stopped
+    staging run can continue after its last saved chunk.
+    """
+    text = TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
     try:
-        text = raw.decode("utf-8-sig")
+        reader = csv.DictReader(text)
+        header_map = _read_header_map(reader)
+        seen = 0
+        chunk = []
+        for index, raw_row in enumerate(reader, start=2):
+            if not any((value or "").strip() for value in raw_row.values()):
+                continue
+            seen += 1
+            if seen <= skip_rows:
+                continue
+            chunk.append(_clean_row(index, raw_row, header_map))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        if not seen:
+            raise MemberImportError("The CSV file did not contain any member rows.")
     except UnicodeDecodeError as exc:
         raise MemberImportError("The CSV file must be saved as UTF-8.") from exc
+    finally:
+        text.detach()
 
-    reader = csv.DictReader(StringIO(text))
-    if not reader.fieldnames:
-        raise MemberImportError("The CSV file must include a header row.")
 
-    header_map = _build_header_map(reader.fieldnames)
-    missing_headers = [field for field in ("first_name", "last_name") if field not in header_map.values()]
-    if missing_headers:
-        raise MemberImportError('The CSV must include "First Name" and "Last Name" columns.')
-
-    rows = []
-    for index, raw_row in enumerate(reader, start=2):
-        if len(rows) >= MAX_IMPORT_ROWS:
-            raise MemberImportError(f"Import is limited to {MAX_IMPORT_ROWS} rows at a time.")
-        if not any((value or "").strip() for value in raw_row.values()):
+def match_existing_people(rows: list[MemberImportRow]) -> None:
+    """Attach existing-person matches and duplicate-name warnings to valid rows."""
+    index = MemberIndex.for_rows([row for row in rows if row.is_valid])
+    for row in rows:
+        if not row.is_valid:
             continue
-        rows.append(_clean_row(index, raw_row, header_map))
-
-    if not rows:
-        raise MemberImportError("The CSV file did not contain any member rows.")
-    return rows
+        row.existing_person = index.find(row.data)
+        if row.existing_person:
+            row.warnings.append(f"Existing person matched: {row.existing_person}.")
+        elif index.has_name(row.data):
+            row.warnings.append("Same first and last name already exists; check for duplicates.")
 
 
 def import_member_rows(rows: list[MemberImportRow], *, update_existing: bool = False) -> MemberImportResult:
@@ -96,41 +183,42 @@ def import_member_rows(rows: list[MemberImportRow], *, update_existing: bool = F
     if result.has_errors:
         raise MemberImportError("Fix validation errors before importing.")
 
-    for row in rows:
-        existing = row.existing_person or find_existing_person(row.data)
-        if existing:
-            if not update_existing:
-                result.skipped += 1
+    with transaction.atomic():
+        index = MemberIndex.for_rows(rows)
+        families = _get_families(row.data.get("family", "") for row in rows)
+        to_create = []
+        to_update = {}
+        for row in rows:
+            # Rows created earlier in this file are in the index too, so a repeated row
+            # matches them the same way it would match a saved person.
+            existing = index.find(row.data)
+            if existing:
+                if not update_existing:
+                    result.skipped += 1
+                    continue
+                _update_person(existing, row.data, families)
+                index.add(existing)
+                if existing.pk:
+                    to_update[existing.pk] = existing
+                result.updated += 1
                 continue
-            _update_person(existing, row.data)
-            result.updated += 1
-            continue
-        _create_person(row.data)
-        result.created += 1
+            person = _create_person(row.data, families)
+            index.add(person)
+            to_create.append(person)
+            result.created += 1
+        Person.objects.bulk_create(to_create)
+        Person.objects.bulk_update(to_update.values(), UPDATE_FIELDS)
     return result
 
 
-def find_existing_person(data: dict) -> Person | None:
-    email = data.get("email", "")
-    if email:
-        match = Person.objects.filter(email__iexact=email).order_by("id").first()
-        if match:
-            return match
-
-    phone = data.get("phone", "")
-    if phone:
-        match = (
-            Person.objects.filter(
-                first_name__iexact=data.get("first_name", ""),
-                last_name__iexact=data.get("last_name", ""),
-                phone__icontains=phone[-4:] if len(phone) >= 4 else phone,
-            )
-            .order_by("id")
-            .first()
-        )
-        if match:
-            return match
-    return None
+def _read_header_map(reader) -> dict[str, str]:
+    if not reader.fieldnames:
+        raise MemberImportError("The CSV file must include a header row.")
+    header_map = _build_header_map(reader.fieldnames)
+    missing_headers = [field for field in ("first_name", "last_name") if field not in header_map.values()]
+    if missing_headers:
+        raise MemberImportError('The CSV must include "First Name" and "Last Name" columns.')
+    return header_map
 
 
 def _build_header_map(headers) -> dict[str, str]:
@@ -191,30 +279,22 @@ def _clean_row(row_number: int, raw_row: dict, header_map: dict) -> MemberImport
             data["is_active"] = parsed_active
     else:
         data["is_active"] = True
-
-    if not row.errors:
-        row.existing_person = find_existing_person(data)
-        if row.existing_person:
-            row.warnings.append(f"Existing person matched: {row.existing_person}.")
-        elif Person.objects.filter(first_name__iexact=data["first_name"], last_name__iexact=data["last_name"]).exists():
-            row.warnings.append("Same first and last name already exists; check for duplicates.")
     return row
 
 
-def _create_person(data: dict) -> Person:
+def _create_person(data: dict, families: dict) -> Person:
     person_data = _person_fields(data)
     person_data["member_type"] = Person.MEMBER
-    person_data["family"] = _get_family(data.get("family", ""))
-    return Person.objects.create(**person_data)
+    person_data["family"] = families.get(_family_name(data.get("family", "")))
+    return Person(**person_data)
 
 
-def _update_person(person: Person, data: dict) -> Person:
+def _update_person(person: Person, data: dict, families: dict) -> Person:
     person.member_type = Person.MEMBER
-    person.family = _get_family(data.get("family", "")) or person.family
+    person.family = families.get(_family_name(data.get("family", ""))) or person.family
     for field_name, value in _person_fields(data).items():
         if value not in ("", None) or field_name == "is_active":
             setattr(person, field_name, value)
-    person.save()
     return person
 
 
@@ -239,12 +319,29 @@ def _person_fields(data: dict) -> dict:
     return fields
 
 
-def _get_family(family_name: str) -> Family | None:
-    family_name = (family_name or "").strip()
-    if not family_name:
-        return None
-    family, _created = Family.objects.get_or_create(name=family_name)
-    return family
+def _get_families(family_names) -> dict[str, Family]:
+    """Return families by saved name, creating the missing ones in one insert."""
+    names = {_family_name(name) for name in family_names} - {""}
+    if not names:
+        return {}
+    families = {}
+    for family in Family.objects.filter(name__in=names).order_by("id"):
+        families.setdefault(family.name, family)
+    missing = [Family(name=name) for name in sorted(names - families.keys())]
+    for family in Family.objects.bulk_create(missing):
+        families[family.name] = family
+    return families
+
+
+def _family_name(value: str) -> str:
+    # Match on the name Family.save() would store, so "Example Family" finds "Example".
+    family = Family(name=(value or "").strip())
+    family.clean()
+    return family.name
+
+
+def fold_key(value) -> str:
+    return (value or "").translate(_ASCII_LOWER)
 
 
 def _normalize_header(value: str) -> str:
@@ -0,0 +1,277 @@
+from datetime import timedelta
+import logging
+from pathlib import Path
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .audit import log_event
+from .member_import import (
+    IMPORT_CHUNK_SIZE,
+    MemberImportError,
+    MemberImportRow,
+    import_member_rows,
+    iter_member_csv_chunks,
+    match_existing_people,
+)
+from .models import AuditLog, MemberImportJob, StagedMemberImportRow
+
+
+logger = logging.getLogger(__name__)
+
+_active_jobs = set()
+_active_jobs_lock = threading.Lock()
+
+
+def get_member_import_dir() -> Path:
+    import_dir = Path(getattr(settings, "MEMBER_IMPORT_DIR", settings.BASE_DIR / "imports"))
+    import_dir.mkdir(parents=True, exist_ok=True)
+    return import_dir
+
+
+def stage_member_import(
+    uploaded_file,
+    *,
+    update_existing: bool = False,
+    import_when_staged: bool = False,
+    skip_invalid_rows: bool = False,
+    user=None,
+) -> MemberImportJob:
+    """Save an upload and record a job that stages its rows in the background, rejecting files without the required columns.
+
+    With ``import_when_staged`` the job goes on to import the rows as soon as they are staged, unless
+    some rows have errors and ``skip_invalid_rows`` is not set; then it stops at the preview.
+    """
+    if not hasattr(uploaded_file, "chunks"):
+        raise MemberImportError("Upload a CSV file.")
+    purge_expired_member_imports()
+    path = get_member_import_dir() / f"member-import-{uuid.uuid4().hex}.csv"
+    with path.open("wb") as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+    try:
+        with path.open("rb") as source:
+            next(iter_member_csv_chunks(source, chunk_size=1), None)
+    except MemberImportError:
+        path.unlink(missing_ok=True)
+        raise
+    return MemberImportJob.objects.create(
+        original_name=(getattr(uploaded_file, "name", "") or "")[:255],
+        file_name=path.name,
+        file_size=path.stat().st_size,
+        update_existing=update_existing,
+        import_when_staged=import_when_staged,
+        skip_invalid_rows=skip_invalid_rows,
+        requested_by=user if getattr(user, "is_authenticated", False) else None,
+        expires_at=timezone.now() + timedelta(hours=_stage_hours()),
+    )
+
+
+def commit_member_import(
+    job: MemberImportJob,
+    *,
+    update_existing: bool = False,
+    skip_invalid_rows: bool = False,
+) -> MemberImportJob:
+    """Queue a staged import for the background importer. Rows with errors are only skipped when asked to."""
+    if job.status == MemberImportJob.STAGING:
+        raise MemberImportError("This preview is still being checked. Import it once every row is staged.")
+    if job.status != MemberImportJob.STAGED:
+        raise MemberImportError(f"Member import {job.id} has already been imported.")
+    if job.expires_at and job.expires_at <= timezone.now():
+        raise MemberImportError("This preview has expired. Upload the CSV again.")
+    if job.error_count and not skip_invalid_rows:
+        raise MemberImportError(
+            f"{job.error_count} rows have errors. Fix them in the CSV and upload it again, or choose to skip them."
+        )
+    claimed = MemberImportJob.objects.filter(id=job.id, status=MemberImportJob.STAGED).update(
+        status=MemberImportJob.QUEUED,
+        update_existing=update_existing,
+        skip_invalid_rows=skip_invalid_rows,
+        expires_at=None,
+        updated_at=timezone.now(),
+    )
+    if not claimed:
+        raise MemberImportError(f"Member import {job.id} has already been imported.")
+    job.refresh_from_db()
+    return job
+
+
+def purge_expired_member_imports() -> int:
+    # Only jobs that were never committed have an expiry.
+    expired = MemberImportJob.objects.filter(expires_at__lte=timezone.now())
+    for file_name in expired.exclude(file_name="").values_list("file_name", flat=True):
+        (get_member_import_dir() / file_name).unlink(missing_ok=True)
+    deleted, _counts = expired.delete()
+    return deleted
+
+
+def start_member_import_job(job_id: int) -> bool:
+    """Run (or resume) an import job on a background thread. Returns False if it is already running here."""
+    with _active_jobs_lock:
+        if job_id in _active_jobs:
+            return False
+        _active_jobs.add(job_id)
+    threading.Thread(target=_run_in_thread, args=(job_id,), name=f"member-import-{job_id}", daemon=True).start()
+    return True
+
+
+def is_member_import_job_active(job_id: int) -> bool:
+    with _active_jobs_lock:
+        return job_id in _active_jobs
+
+
+def run_member_import_job(job_id: int) -> None:
+    """Stage the rest of a job's upload, then apply its remaining staged rows, one chunk per transaction."""
+    job = MemberImportJob.objects.select_related("requested_by").filter(id=job_id).first()
+    if job is None:
+        return
+    if job.file_name and (not _stage_upload(job) or job.status != MemberImportJob.QUEUED):
+        return
+    claimed = (
+        MemberImportJob.objects.filter(id=job_id)
+        .exclude(status__in=[MemberImportJob.STAGING, MemberImportJob.STAGED, MemberImportJob.DONE])
+        .update(status=MemberImportJob.RUNNING, error="", updated_at=timezone.now())
+    )
+    if not claimed:
+        return
+    job.refresh_from_db()
+    try:
+        while job.rows_processed < job.total_rows:
+            staged = list(job.staged_rows.order_by("row_number")[job.rows_processed : job.rows_processed + IMPORT_CHUNK_SIZE])
+            if not staged:
+                break
+            _apply_chunk(job, staged)
+    except MemberImportError as exc:
+        _finish_job(job, status=MemberImportJob.FAILED, error=str(exc))
+        return
+    except Exception as exc:
+        logger.exception("Member import %s crashed.", job.id)
+        _finish_job(job, status=MemberImportJob.FAILED, error=f"Unexpected import error: {exc}")
+        return
+    _finish_job(job, status=MemberImportJob.DONE)
+
+
+def _stage_upload(job: MemberImportJob) -> bool:
+    """Parse, validate and match the rest of a job's upload into staged rows. Returns False if it stopped."""
+    MemberImportJob.objects.filter(id=job.id).update(status=MemberImportJob.STAGING, error="", updated_at=timezone.now())
+    job.refresh_from_db()
+    path = get_member_import_dir() / job.file_name
+    try:
+        with path.open("rb") as source:
+            for rows in iter_member_csv_chunks(source, chunk_size=IMPORT_CHUNK_SIZE, skip_rows=job.total_rows):
+                _stage_chunk(job, rows, position=source.tell())
+    except MemberImportError as exc:
+        _finish_job(job, status=MemberImportJob.FAILED, error=str(exc))
+        return False
+    except OSError as exc:
+        _finish_job(job, status=MemberImportJob.FAILED, error=f"Could not read the uploaded file: {exc}")
+        return False
+    except Exception as exc:
+        logger.exception("Member import %s could not be staged.", job.id)
+        _finish_job(job, status=MemberImportJob.FAILED, error=f"Unexpected staging error: {exc}")
+        return False
+    # The rows now live in the database, so the upload is no longer needed.
+    path.unlink(missing_ok=True)
+    ready = {"status": MemberImportJob.STAGED}
+    # An import with rows in error waits at the preview unless skipping them was agreed up front.
+    if job.import_when_staged and (job.skip_invalid_rows or not job.error_count):
+        ready = {"status": MemberImportJob.QUEUED, "expires_at": None}
+    MemberImportJob.objects.filter(id=job.id).update(
+        **ready,
+        file_name="",
+        bytes_processed=job.file_size,
+        updated_at=timezone.now(),
+    )
+    job.refresh_from_db()
+    return True
+
+
+def _stage_chunk(job: MemberImportJob, rows: list[MemberImportRow], *, position: int) -> None:
+    # The staged rows and the job cursor commit together, so a resumed job never
+    # stages a chunk twice.
+    match_existing_people(rows)
+    with transaction.atomic():
+        StagedMemberImportRow.objects.bulk_create(
+            StagedMemberImportRow(
+                job=job,
+                row_number=row.row_number,
+                data=row.data,
+                errors=row.errors,
+                warnings=row.warnings,
+                is_valid=row.is_valid,
+                existing_person=row.existing_person,
+            )
+            for row in rows
+        )
+        MemberImportJob.objects.filter(id=job.id).update(
+            total_rows=job.total_rows + len(rows),
+            error_count=job.error_count + sum(1 for row in rows if row.errors),
+            bytes_processed=min(position, job.file_size),
+            updated_at=timezone.now(),
+        )
+    job.refresh_from_db()
+
+
+def _apply_chunk(job: MemberImportJob, staged) -> None:
+    # The people and the job cursor commit together, so a resumed job never
+    # applies a chunk twice.
+    rows = [
+        MemberImportRow(row_number=row.row_number, data=row.data, errors=list(row.errors), warnings=list(row.warnings))
+        for row in staged
+        if row.is_valid
+    ]
+    with transaction.atomic():
+        result = import_member_rows(rows, update_existing=job.update_existing) if rows else None
+        MemberImportJob.objects.filter(id=job.id).update(
+            rows_processed=job.rows_processed + len(staged),
+            created_count=job.created_count + (result.created if result else 0),
+            updated_count=job.updated_count + (result.updated if result else 0),
+            skipped_count=job.skipped_count + (result.skipped if result else 0),
+            updated_at=timezone.now(),
+        )
+    job.refresh_from_db()
+
+
+def _finish_job(job: MemberImportJob, *, status: str, error: str = "") -> None:
+    job.status = status
+    job.error = error
+    job.finished_at = timezone.now() if status == MemberImportJob.DONE else None
+    job.save(update_fields=["status", "error", "finished_at", "updated_at"])
+    if status == MemberImportJob.DONE:
+        # Imported rows now live on Person records; only the rejected rows stay for review.
+        job.staged_rows.filter(is_valid=True).delete()
+    log_event(
+        AuditLog.ACTION_MEMBER_IMPORT,
+        user=job.requested_by,
+        message=("Member CSV import completed." if status == MemberImportJob.DONE else f"Member CSV import stopped: {error}")[:255],
+        metadata={
+            "member_import_job_id": job.id,
+            "created": job.created_count,
+            "updated": job.updated_count,
+            "skipped": job.skipped_count,
+            "errors": job.error_count,
+            "invalid_rows_skipped": job.error_count if job.skip_invalid_rows else 0,
+            "rows": job.rows_processed,
+            "update_existing": job.update_existing,
+        },
+    )
+
+
+def _stage_hours() -> int:
+    return max(int(getattr(settings, "MEMBER_IMPORT_STAGE_HOURS", 24)), 1)
+
+
+def _run_in_thread(job_id: int) -> None:
+    close_old_connections()
+    try:
+        run_member_import_job(job_id)
+    except Exception:
+        logger.exception("Member import %s could not be processed.", job_id)
+    finally:
+        with _active_jobs_lock:
+            _active_jobs.discard(job_id)
+        connection.close()
@@ -1,7 +1,11 @@
 from django.conf import settings
+from django.contrib.auth.middleware import get_user
 from django.db.utils import OperationalError, ProgrammingError
+from django.utils.functional import SimpleLazyObject
 from jazzmin.settings import THEMES
 
+from .permissions import load_session_roles, save_session_roles
+
 from .settings_store import get_setting
 
 
@@ -24,3 +28,22 @@ class AdminSkinMiddleware:
             settings.JAZZMIN_UI_TWEAKS = ui_tweaks
 
         return self.get_response(request)
+
+
+class RoleCacheMiddleware:
+    """Carry a signed-in user's resolved roles across requests in their session."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if hasattr(request, "user"):
+            request.user = SimpleLazyObject(lambda: load_session_roles(request, get_user(request)))
+        response = self.get_response(request)
+        # login() and logout() replace request.user; otherwise only a user that was loaded counts.
+        user = request.__dict__.get("user")
+        if isinstance(user, SimpleLazyObject):
+            user = getattr(request, "_cached_user", None)
+        if user is not None:
+            save_session_roles(request, user)
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_profile_photo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrintJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('printnode', 'PrintNode'), ('server', 'Server Printer')], max_length=20)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('printing', 'Printing'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('kiosk_id', models.CharField(blank=True, max_length=100)),
+                ('attendance_ids', models.JSONField(blank=True, default=list)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('backend_job_id', models.CharField(blank=True, max_length=120)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('service', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.service')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='core_printj_status_f2c4b1_idx')],
+            },
+        ),
+    ]
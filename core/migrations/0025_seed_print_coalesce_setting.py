@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+SETTINGS = {
+    "print_coalesce_window_ms": {
+        "value": "0",
+        "description": "Milliseconds to wait for more check-ins from the same kiosk before sending one combined PrintNode or server label job. 0 turns coalescing off.",
+    },
+}
+
+
+def seed_print_coalesce_setting(apps, schema_editor):
+    SystemSetting = apps.get_model("core", "SystemSetting")
+    for key, defaults in SETTINGS.items():
+        setting, created = SystemSetting.objects.get_or_create(key=key, defaults=defaults)
+        if not created and not (setting.description or "").strip():
+            setting.description = defaults["description"]
+            setting.save(update_fields=["description"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0024_printjob"),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_print_coalesce_setting, migrations.RunPython.noop),
+    ]
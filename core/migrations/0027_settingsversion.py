@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:08
+
+from django.db import migrations, models
+
+
+def seed_settings_version(apps, schema_editor):
+    SettingsVersion = apps.get_model("core", "SettingsVersion")
+    SettingsVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_preprintrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettingsVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_settings_version, migrations.RunPython.noop),
+    ]
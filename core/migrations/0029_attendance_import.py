@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_memberimportjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendance',
+            name='checked_in_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='auditlog',
+            name='action',
+            field=models.CharField(choices=[('checkin', 'Check-in'), ('undo_checkin', 'Undo Check-in'), ('print_nametag', 'Print Nametag'), ('printnode_success', 'PrintNode Success'), ('printnode_failure', 'PrintNode Failure'), ('server_print_success', 'Server Print Success'), ('server_print_failure', 'Server Print Failure'), ('database_backup', 'Database Backup'), ('database_restore', 'Database Restore'), ('member_import', 'Member Import'), ('attendance_import', 'Attendance Import'), ('service_close', 'Service Close'), ('service_reopen', 'Service Reopen'), ('setting_change', 'Setting Change')], max_length=40),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_attendance_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='printjob',
+            name='backend_state',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_printjob_backend_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memberimportjob',
+            name='skip_invalid_rows',
+            field=models.BooleanField(default=False),
+        ),
+    ]
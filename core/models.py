@@ -3,8 +3,10 @@ import re
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 from .countries import COUNTRIES
+from .photos import photo_variant_url
 
 class Family(models.Model):
     name = models.CharField(max_length=200)
@@ -92,6 +94,14 @@ class Person(models.Model):
         last_initial = (self.last_name or "").strip()[:1]
         return f"{first_initial}{last_initial}".upper() or "?"
 
+    @property
+    def avatar_url(self) -> str:
+        return photo_variant_url(self.photo, "avatar")
+
+    @property
+    def profile_photo_url(self) -> str:
+        return photo_variant_url(self.photo, "profile")
+
 
 class Tag(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -115,6 +125,16 @@ class SystemSetting(models.Model):
         return self.key
 
 
+class SettingsVersion(models.Model):
+    """Single-row stamp bumped whenever system settings change, so cached consumers know to reload."""
+
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"Settings version {self.version}"
+
+
 class Service(models.Model):
     OPEN = "open"
     CLOSED = "closed"
@@ -140,7 +160,8 @@ class Service(models.Model):
 class Attendance(models.Model):
     person = models.ForeignKey(Person, on_delete=models.CASCADE)
     service = models.ForeignKey(Service, on_delete=models.CASCADE)
-    checked_in_at = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add so imported history keeps its original times.
+    checked_in_at = models.DateTimeField(default=timezone.now, editable=False)
     notes = models.TextField(blank=True)
 
     class Meta:
@@ -156,6 +177,173 @@ class Attendance(models.Model):
         return f"{self.person} @ {self.service}"
 
 
+class PrintJob(models.Model):
+    PRINTNODE = "printnode"
+    SERVER = "server"
+    MODE_CHOICES = [
+        (PRINTNODE, "PrintNode"),
+        (SERVER, "Server Printer"),
+    ]
+
+    QUEUED = "queued"
+    PRINTING = "printing"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (PRINTING, "Printing"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    kiosk_id = models.CharField(max_length=100, blank=True)
+    attendance_ids = models.JSONField(default=list, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    backend_job_id = models.CharField(max_length=120, blank=True)
+    # IPP job state reported by the printer after it accepted the job; blank for other backends.
+    backend_state = models.CharField(max_length=20, blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    service = models.ForeignKey(Service, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.get_mode_display()} job {self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in {self.DONE, self.FAILED}
+
+
+class PrePrintRun(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    profile_name = models.CharField(max_length=100)
+    selection = models.CharField(max_length=255, blank=True)
+    person_ids = models.JSONField(default=list, blank=True)
+    printed_count = models.PositiveIntegerField(default=0)
+    chunk_size = models.PositiveSmallIntegerField(default=25)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    service = models.ForeignKey(Service, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        return f"Pre-print run {self.pk} ({self.get_status_display()})"
+
+    @property
+    def total(self) -> int:
+        return len(self.person_ids or [])
+
+    @property
+    def progress_percent(self) -> int:
+        if not self.total:
+            return 100
+        return int(self.printed_count * 100 / self.total)
+
+
+class MemberImportJob(models.Model):
+    STAGING = "staging"
+    STAGED = "staged"
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (STAGING, "Checking"),
+        (STAGED, "Staged"),
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STAGING)
+    original_name = models.CharField(max_length=255, blank=True)
+    # The saved upload in MEMBER_IMPORT_DIR; cleared once every row is staged.
+    file_name = models.CharField(max_length=255, blank=True)
+    file_size = models.PositiveBigIntegerField(default=0)
+    bytes_processed = models.PositiveBigIntegerField(default=0)
+    update_existing = models.BooleanField(default=False)
+    import_when_staged = models.BooleanField(default=False)
+    # Rows with errors are only left out when whoever started the import agreed to it.
+    skip_invalid_rows = models.BooleanField(default=False)
+    total_rows = models.PositiveIntegerField(default=0)
+    rows_processed = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        return f"Member import {self.pk} ({self.get_status_display()})"
+
+    @property
+    def progress_percent(self) -> int:
+        if self.status == self.DONE:
+            return 100
+        if self.file_name:
+            return min(int(self.bytes_processed * 100 / self.file_size), 99) if self.file_size else 0
+        if not self.total_rows:
+            return 100
+        return int(self.rows_processed * 100 / self.total_rows)
+
+
+class StagedMemberImportRow(models.Model):
+    """A parsed and validated CSV row waiting for its import job to be committed."""
+
+    job = models.ForeignKey(MemberImportJob, on_delete=models.CASCADE, related_name="staged_rows")
+    row_number = models.PositiveIntegerField()
+    data = models.JSONField(default=dict)
+    errors = models.JSONField(default=list, blank=True)
+    warnings = models.JSONField(default=list, blank=True)
+    is_valid = models.BooleanField(default=True)
+    existing_person = models.ForeignKey(Person, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+
+    class Meta:
+        ordering = ["row_number"]
+        indexes = [
+            models.Index(fields=["job", "row_number"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"Row {self.row_number} of member import {self.job_id}"
+
+
 class AuditLog(models.Model):
     ACTION_CHECKIN = "checkin"
     ACTION_UNDO_CHECKIN = "undo_checkin"
@@ -167,6 +355,7 @@ class AuditLog(models.Model):
     ACTION_DATABASE_BACKUP = "database_backup"
     ACTION_DATABASE_RESTORE = "database_restore"
     ACTION_MEMBER_IMPORT = "member_import"
+    ACTION_ATTENDANCE_IMPORT = "attendance_import"
     ACTION_SERVICE_CLOSE = "service_close"
     ACTION_SERVICE_REOPEN = "service_reopen"
     ACTION_SETTING_CHANGE = "setting_change"
@@ -182,6 +371,7 @@ class AuditLog(models.Model):
         (ACTION_DATABASE_BACKUP, "Database Backup"),
         (ACTION_DATABASE_RESTORE, "Database Restore"),
         (ACTION_MEMBER_IMPORT, "Member Import"),
+        (ACTION_ATTENDANCE_IMPORT, "Attendance Import"),
         (ACTION_SERVICE_CLOSE, "Service Close"),
         (ACTION_SERVICE_REOPEN, "Service Reopen"),
         (ACTION_SETTING_CHANGE, "Setting Change"),
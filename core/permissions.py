@@ -1,7 +1,24 @@
+import threading
+import uuid
+
+
 ROLE_GREETER = "Greeter"
 ROLE_ADMIN = "Admin"
 ROLE_PASTOR = "Pastor"
 
+ROLE_SESSION_KEY = "_cats_roles"
+_ROLES_ATTR = "_cats_role_names"
+_ROLES_STAMP_ATTR = "_cats_role_stamp"
+
+# Roles saved in a session are reused while their stamp still matches. The stamp
+# changes when the user's group membership changes, when any group is renamed or
+# deleted, and when the server restarts. The app runs as one Waitress process,
+# so keeping the counters in memory reaches every request.
+_PROCESS_TOKEN = uuid.uuid4().hex
+_generation_lock = threading.Lock()
+_global_generation = 0
+_user_generations: dict[int, int] = {}
+
 
 def _is_active_authenticated(user) -> bool:
     return bool(user and user.is_authenticated and user.is_active)
@@ -15,8 +32,57 @@ def _has_group(user, *group_names: str) -> bool:
     target_names = {name.strip().lower() for name in group_names if (name or "").strip()}
     if not target_names:
         return False
-    user_group_names = {name.strip().lower() for name in user.groups.values_list("name", flat=True)}
-    return bool(user_group_names & target_names)
+    return bool(role_names(user) & target_names)
+
+
+def role_names(user) -> frozenset[str]:
+    """Lower-cased group names of a user, queried at most once per user object."""
+    roles = getattr(user, _ROLES_ATTR, None)
+    if roles is None:
+        stamp = role_cache_stamp(user.pk)
+        roles = frozenset(name.strip().lower() for name in user.groups.values_list("name", flat=True))
+        setattr(user, _ROLES_ATTR, roles)
+        setattr(user, _ROLES_STAMP_ATTR, stamp)
+    return roles
+
+
+def role_cache_stamp(user_id) -> str:
+    return f"{_PROCESS_TOKEN}:{_global_generation}:{_user_generations.get(user_id, 0)}"
+
+
+def invalidate_roles(user_ids=None) -> None:
+    """Expire cached roles of the given users, or of everyone when no ids are given."""
+    global _global_generation
+    with _generation_lock:
+        if user_ids is None:
+            _global_generation += 1
+            return
+        for user_id in user_ids:
+            _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+
+
+def forget_roles(user) -> None:
+    for attr in (_ROLES_ATTR, _ROLES_STAMP_ATTR):
+        user.__dict__.pop(attr, None)
+
+
+def load_session_roles(request, user):
+    """Give the request's user the roles saved in its session, if they are still current."""
+    if user.is_authenticated and getattr(user, _ROLES_ATTR, None) is None:
+        saved = request.session.get(ROLE_SESSION_KEY) or {}
+        if saved.get("user_id") == user.pk and saved.get("stamp") == role_cache_stamp(user.pk):
+            setattr(user, _ROLES_ATTR, frozenset(saved.get("roles", ())))
+            setattr(user, _ROLES_STAMP_ATTR, saved["stamp"])
+    return user
+
+
+def save_session_roles(request, user) -> None:
+    roles = getattr(user, _ROLES_ATTR, None)
+    if roles is None or not user.is_authenticated:
+        return
+    saved = {"user_id": user.pk, "stamp": getattr(user, _ROLES_STAMP_ATTR, ""), "roles": sorted(roles)}
+    if request.session.get(ROLE_SESSION_KEY) != saved:
+        request.session[ROLE_SESSION_KEY] = saved
 
 
 def can_access_kiosk(user) -> bool:
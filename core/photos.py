@@ -0,0 +1,84 @@
+"""Fixed-size WebP thumbnails of person photos.
+
+Uploads keep their original file; each size variant is saved next to it as
+``<file name>.<size>.webp`` (for example ``ada.jpg.avatar.webp``), rotated upright from the EXIF orientation. Avatars and
+previews use ``photo_variant_url``, which falls back to the original until a
+variant exists (for example before ``generate_photo_thumbnails`` has run on
+older photos). The URLs carry a file version so browsers can cache them.
+"""
+
+from io import BytesIO
+import logging
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .media import versioned_media_url
+
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels; avatars are drawn at up to 48px, so 96 covers 2x screens.
+PHOTO_SIZES = {"avatar": 96, "profile": 480}
+THUMBNAIL_QUALITY = 80
+
+
+class PhotoThumbnailError(Exception):
+    pass
+
+
+def photo_variant_name(name: str, size: str) -> str:
+    # The full file name keeps ada.jpg and ada.png from sharing thumbnails.
+    path = PurePosixPath(name)
+    return str(path.with_name(f"{path.name}.{size}.webp"))
+
+
+def photo_variant_url(photo, size: str = "avatar") -> str:
+    """Versioned URL of a photo's size variant, or of the original if the variant has not been made."""
+    if not photo:
+        return ""
+    return (
+        versioned_media_url(photo_variant_name(photo.name, size), photo.storage)
+        or versioned_media_url(photo.name, photo.storage)
+        or photo.url
+    )
+
+
+def generate_photo_thumbnails(photo, *, force: bool = False) -> list[str]:
+    """Write every missing size variant of a photo. Returns the names written."""
+    if not photo:
+        return []
+    storage = photo.storage
+    pending = {
+        size: photo_variant_name(photo.name, size)
+        for size in PHOTO_SIZES
+        if force or not storage.exists(photo_variant_name(photo.name, size))
+    }
+    if not pending:
+        return []
+    try:
+        with storage.open(photo.name, "rb") as original:
+            image = ImageOps.exif_transpose(Image.open(original))
+            image.load()
+    except (OSError, UnidentifiedImageError) as exc:
+        raise PhotoThumbnailError(f"Could not read photo {photo.name}: {exc}") from exc
+    if image.mode not in {"RGB", "RGBA"}:
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    written = []
+    # Largest first, so each smaller variant is resampled from an already reduced image.
+    for size, variant_name in sorted(pending.items(), key=lambda item: PHOTO_SIZES[item[0]], reverse=True):
+        image.thumbnail((PHOTO_SIZES[size], PHOTO_SIZES[size]), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, format="WEBP", quality=THUMBNAIL_QUALITY, method=4)
+        storage.delete(variant_name)
+        written.append(storage.save(variant_name, ContentFile(buffer.getvalue())))
+    return written
+
+
+def ensure_person_thumbnails(person) -> None:
+    """Make missing thumbnails for a saved person, logging instead of failing the save."""
+    try:
+        generate_photo_thumbnails(person.photo)
+    except PhotoThumbnailError:
+        logger.warning("Could not make thumbnails for person %s.", person.pk, exc_info=True)
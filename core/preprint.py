@@ -0,0 +1,260 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+import base64
+import logging
+import multiprocessing
+import platform
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from .audit import log_event
+from .label_render_worker import init_worker, render_label_chunk
+from .member_queries import members_active_for_service
+from .models import AuditLog, Person, PrePrintRun
+from .printnode import (
+    PrintNodeError,
+    ServerPrinterError,
+    _parse_server_printer_config,
+    _profile_server_printer_config,
+    _send_to_server_printer_target,
+    get_printer_profile,
+    submit_printnode_job,
+)
+from .settings_store import get_setting
+
+
+logger = logging.getLogger(__name__)
+
+SOURCE_ACTIVE_MEMBERS = "active_members"
+SOURCE_TAGS = "tags"
+SOURCE_FAMILIES = "families"
+MAX_CHUNK_SIZE = 100
+
+_active_runs = set()
+_active_runs_lock = threading.Lock()
+
+
+class PrePrintError(Exception):
+    pass
+
+
+def preprint_people(source: str, *, service=None, tag_ids=(), family_ids=()) -> QuerySet[Person]:
+    if source == SOURCE_ACTIVE_MEMBERS:
+        queryset = members_active_for_service(service)
+    elif source == SOURCE_TAGS:
+        if not tag_ids:
+            raise PrePrintError("Choose at least one tag.")
+        queryset = Person.objects.filter(is_active=True, tags__id__in=tag_ids).distinct()
+    elif source == SOURCE_FAMILIES:
+        if not family_ids:
+            raise PrePrintError("Choose at least one family.")
+        queryset = Person.objects.filter(is_active=True, family_id__in=family_ids)
+    else:
+        raise PrePrintError("Choose who to pre-print labels for.")
+    return queryset.order_by("last_name", "first_name", "id")
+
+
+def create_preprint_run(*, profile_name: str, people, selection: str, service=None, user=None, chunk_size: int = 25) -> PrePrintRun:
+    _resolve_profile_target(profile_name)
+    person_ids = list(people.values_list("id", flat=True))
+    if not person_ids:
+        raise PrePrintError("No people matched the selection.")
+    run = PrePrintRun.objects.create(
+        profile_name=profile_name,
+        selection=selection[:255],
+        person_ids=person_ids,
+        chunk_size=min(max(int(chunk_size), 1), MAX_CHUNK_SIZE),
+        requested_by=user if getattr(user, "is_authenticated", False) else None,
+        service=service,
+    )
+    log_event(
+        AuditLog.ACTION_PRINT,
+        user=user,
+        service=service,
+        message="Pre-print run queued.",
+        metadata={"mode": "preprint", "preprint_run_id": run.id, "count": len(person_ids), "profile": profile_name},
+    )
+    return run
+
+
+def start_preprint_run(run_id: int) -> bool:
+    """Run (or resume) a pre-print run on a background thread. Returns False if it is already running here."""
+    with _active_runs_lock:
+        if run_id in _active_runs:
+            return False
+        _active_runs.add(run_id)
+    threading.Thread(target=_run_in_thread, args=(run_id,), name=f"preprint-{run_id}", daemon=True).start()
+    return True
+
+
+def is_preprint_run_active(run_id: int) -> bool:
+    with _active_runs_lock:
+        return run_id in _active_runs
+
+
+def run_preprint(run_id: int) -> None:
+    """Render and send the remaining labels of a run, continuing from its saved cursor."""
+    claimed = PrePrintRun.objects.filter(id=run_id).exclude(status=PrePrintRun.DONE).update(
+        status=PrePrintRun.RUNNING,
+        error="",
+        updated_at=timezone.now(),
+    )
+    if not claimed:
+        return
+    run = PrePrintRun.objects.select_related("requested_by", "service").get(id=run_id)
+    try:
+        profile, target = _resolve_profile_target(run.profile_name)
+        output = _render_output(profile, target)
+        chunks = deque(_pending_chunks(run))
+        with _render_pool(len(chunks)) as pool:
+            # Keep a few chunks rendering ahead while the current one is being sent.
+            lookahead = _render_processes() * 2 if pool else 1
+            in_flight = deque()
+            while chunks or in_flight:
+                while chunks and len(in_flight) < lookahead:
+                    person_ids, rows = chunks.popleft()
+                    in_flight.append((person_ids, _submit_render(pool, rows, profile, output)))
+                person_ids, rendered = in_flight.popleft()
+                content = rendered.result()
+                if content:
+                    _send_chunk(profile, target, output, content, run)
+                run.printed_count += len(person_ids)
+                run.save(update_fields=["printed_count", "updated_at"])
+    except (PrePrintError, PrintNodeError, ServerPrinterError) as exc:
+        _finish_run(run, status=PrePrintRun.FAILED, error=str(exc))
+        return
+    except Exception as exc:
+        logger.exception("Pre-print run %s crashed.", run.id)
+        _finish_run(run, status=PrePrintRun.FAILED, error=f"Unexpected pre-print error: {exc}")
+        return
+    _finish_run(run, status=PrePrintRun.DONE)
+
+
+def _pending_chunks(run: PrePrintRun) -> list[tuple[list[int], list[tuple[str, str]]]]:
+    remaining_ids = list(run.person_ids or [])[run.printed_count :]
+    people = Person.objects.in_bulk(remaining_ids)
+    chunks = []
+    for start in range(0, len(remaining_ids), run.chunk_size):
+        person_ids = remaining_ids[start : start + run.chunk_size]
+        rows = [(people[person_id].first_name, people[person_id].last_name) for person_id in person_ids if person_id in people]
+        chunks.append((person_ids, rows))
+    return chunks
+
+
+def _submit_render(pool, rows, profile, output) -> Future:
+    if pool is None or not rows:
+        future = Future()
+        future.set_result(render_label_chunk(rows, profile, output) if rows else None)
+        return future
+    return pool.submit(render_label_chunk, rows, profile, output)
+
+
+def _send_chunk(profile: dict, target: dict | None, output: str, content, run: PrePrintRun) -> None:
+    if profile["backend"] == "printnode":
+        api_key = (get_setting("printnode_api_key", "") or "").strip()
+        if not api_key:
+            raise PrintNodeError("PrintNode API key is not configured.")
+        submit_printnode_job(
+            api_key,
+            {
+                "printerId": int(profile["printer_id"]),
+                "title": f"Welcome System Pre-print {run.id}",
+                "contentType": "raw_base64",
+                "content": base64.b64encode(content).decode("ascii"),
+                "source": "Welcome System pre-print",
+                "expireAfter": 3600,
+            },
+        )
+        return
+    _send_to_server_printer_target(
+        target,
+        raw_bytes=content if output == "raw" else b"",
+        pdf_bytes=content if output == "pdf" else b"",
+        images=content if output == "images" else None,
+    )
+
+
+def _resolve_profile_target(profile_name: str) -> tuple[dict, dict | None]:
+    profile_name = (profile_name or "").strip()
+    if not profile_name:
+        raise PrePrintError("Choose a printer profile.")
+    profile = get_printer_profile(profile_name, PrePrintError)
+    if profile["backend"] == "printnode":
+        printer_id = str(profile.get("printer_id") or profile.get("printnode_printer_id") or "").strip()
+        if not printer_id.isdigit():
+            raise PrePrintError(f'Printer profile "{profile_name}" must include a numeric PrintNode printer_id.')
+        return {**profile, "printer_id": printer_id}, None
+    printer_config = _profile_server_printer_config(profile)
+    if not printer_config:
+        raise PrePrintError(f'Printer profile "{profile_name}" must include a server target, queue, or host.')
+    try:
+        return profile, _parse_server_printer_config(printer_config, profile_name)
+    except ServerPrinterError as exc:
+        raise PrePrintError(str(exc)) from exc
+
+
+def _render_output(profile: dict, target: dict | None) -> str:
+    if profile["backend"] == "printnode" or target["kind"] == "raw":
+        return "raw"
+    if target["kind"] == "ipp":
+        return "pdf"
+    return "images" if platform.system() == "Windows" else "pdf"
+
+
+@contextmanager
+def _render_pool(chunk_count: int):
+    """Yield a spawn-based process pool for rendering, or None to render on the run thread."""
+    workers = min(_render_processes(), chunk_count)
+    if workers <= 1:
+        yield None
+        return
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+    )
+    try:
+        yield pool
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _finish_run(run: PrePrintRun, *, status: str, error: str = "") -> None:
+    run.status = status
+    run.error = error
+    run.finished_at = timezone.now() if status == PrePrintRun.DONE else None
+    run.save(update_fields=["status", "error", "finished_at", "updated_at"])
+    log_event(
+        AuditLog.ACTION_PRINT,
+        user=run.requested_by,
+        service=run.service,
+        message=("Pre-print run finished." if status == PrePrintRun.DONE else f"Pre-print run stopped: {error}")[:255],
+        metadata={
+            "mode": "preprint",
+            "preprint_run_id": run.id,
+            "printed": run.printed_count,
+            "count": run.total,
+            "profile": run.profile_name,
+        },
+    )
+
+
+def _run_in_thread(run_id: int) -> None:
+    close_old_connections()
+    try:
+        run_preprint(run_id)
+    except Exception:
+        logger.exception("Pre-print run %s could not be processed.", run_id)
+    finally:
+        with _active_runs_lock:
+            _active_runs.discard(run_id)
+        connection.close()
+
+
+def _render_processes() -> int:
+    return max(int(getattr(settings, "PREPRINT_RENDER_PROCESSES", 2)), 0)
@@ -0,0 +1,137 @@
+from collections import deque
+import threading
+import time
+
+from django.conf import settings
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+PRINTNODE_BREAKER_KEY = "printnode"
+
+_breakers: dict[str, "CircuitBreaker"] = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitBreaker:
+    """Track recent send outcomes for one print target and stop calling it while it is down.
+
+    The breaker opens once the last ``window`` calls hold at least ``failure_threshold``
+    failures at or above ``error_rate``. After ``cooldown`` seconds a single half-open
+    probe is let through; its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, key: str, *, window: int, failure_threshold: int, error_rate: float, cooldown: float):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def retry_after_seconds(self) -> int:
+        with self._lock:
+            if self._current_state() != OPEN:
+                return 0
+            return max(int(self._opened_at + self.cooldown - time.monotonic()) + 1, 1)
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._current_state() == HALF_OPEN:
+                self._outcomes.clear()
+            self._state = CLOSED
+            self._probe_in_flight = False
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if self._current_state() == HALF_OPEN or (
+                failures >= self.failure_threshold and failures / len(self._outcomes) >= self.error_rate
+            ):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """Finish a call that neither proved nor disproved the target is reachable."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def open_message(self, label: str) -> str:
+        return f"{label} is not responding. Skipping sends for {self.retry_after_seconds()} more seconds."
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            failures = self._outcomes.count(False)
+            calls = len(self._outcomes)
+        return {
+            "key": self.key,
+            "state": state,
+            "recent_failures": failures,
+            "recent_calls": calls,
+            "retry_after_seconds": self.retry_after_seconds(),
+        }
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+        return self._state
+
+
+def get_circuit_breaker(key: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                key,
+                window=max(int(getattr(settings, "PRINT_BREAKER_WINDOW", 10)), 1),
+                failure_threshold=max(int(getattr(settings, "PRINT_BREAKER_FAILURE_THRESHOLD", 3)), 1),
+                error_rate=float(getattr(settings, "PRINT_BREAKER_ERROR_RATE", 0.5)),
+                cooldown=max(float(getattr(settings, "PRINT_BREAKER_COOLDOWN_SECONDS", 30)), 0),
+            )
+            _breakers[key] = breaker
+        return breaker
+
+
+def find_open_circuit_breaker(key: str) -> CircuitBreaker | None:
+    """Return the breaker for ``key`` when it is currently refusing calls, without claiming a probe."""
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+    if breaker and breaker.state == OPEN:
+        return breaker
+    return None
+
+
+def server_printer_breaker_key(target: dict) -> str:
+    if target["kind"] == "queue":
+        return f'queue:{target["queue"]}'
+    if target["kind"] == "ipp":
+        return f'ipp:{target["uri"]}'
+    return f'raw:{target["host"]}:{target["port"]}'
+
+
+def reset_circuit_breakers() -> None:
+    with _breakers_lock:
+        _breakers.clear()
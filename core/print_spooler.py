@@ -0,0 +1,397 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .audit import log_event
+from .ipp_client import FINISHED_JOB_STATES
+from .models import AuditLog, PrintJob
+from .print_breaker import PRINTNODE_BREAKER_KEY, find_open_circuit_breaker, server_printer_breaker_key
+from .printnode import (
+    PrintNodeError,
+    PrintNodeJobUnconfirmedError,
+    PrintNodeUnavailableError,
+    ServerPrinterError,
+    ServerPrinterUnavailableError,
+    _get_kiosk_printer_profile,
+    _profile_setting,
+    _safe_int,
+    confirm_server_print_accepted,
+    get_kiosk_printer_id,
+    get_kiosk_server_printer,
+    get_server_print_job_state,
+    submit_attendance_print_job,
+    submit_server_attendance_print_job,
+)
+from .settings_store import get_setting
+
+
+logger = logging.getLogger(__name__)
+
+PRINT_JOB_EXPIRE_AFTER = timedelta(minutes=10)
+MAX_COALESCE_WINDOW_MS = 5000
+MAX_COALESCED_JOBS = 20
+# IPP jobs are polled for their printer-side state until it is final or this long has passed.
+BACKEND_STATE_TRACK_FOR = timedelta(minutes=2)
+BACKEND_STATE_POLL_SECONDS = 1
+MODE_LABELS = {
+    PrintJob.PRINTNODE: "PrintNode",
+    PrintJob.SERVER: "Server Printer",
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_open_batches = set()
+_batch_lock = threading.Lock()
+_tracker_thread = None
+_tracker_lock = threading.Lock()
+_tracker_wake_event = threading.Event()
+
+
+def enqueue_attendance_print_job(mode: str, attendance_ids, *, kiosk_id: str, user=None, service=None) -> PrintJob:
+    """Validate the kiosk printer route, record a PrintJob, and hand it to the worker pool.
+
+    Configuration problems (missing API key, unmapped kiosk) raise immediately so the
+    greeter sees them; transmission problems are retried in the background.
+    """
+    _validate_print_target(mode, kiosk_id)
+    job = PrintJob.objects.create(
+        mode=mode,
+        kiosk_id=kiosk_id,
+        attendance_ids=list(attendance_ids),
+        requested_by=user if getattr(user, "is_authenticated", False) else None,
+        service=service,
+    )
+    if _worker_count() == 0:
+        run_print_job(job.id, allow_retry=False)
+        job.refresh_from_db()
+        return job
+    transaction.on_commit(lambda: _dispatch(job.id))
+    return job
+
+
+def run_print_job(job_id: int, *, allow_retry: bool = True) -> None:
+    job = PrintJob.objects.filter(id=job_id, status=PrintJob.QUEUED).only("id", "mode", "kiosk_id").first()
+    if job is None:
+        return
+    window = _coalesce_window_seconds(job) if _worker_count() else 0
+    if not window:
+        if _claim_print_job(job_id):
+            _send_jobs([PrintJob.objects.select_related("requested_by", "service").get(id=job_id)], allow_retry=allow_retry)
+        return
+    batch_key = (job.mode, job.kiosk_id)
+    # Jobs that arrive while the batch is open return straight away and leave their
+    # printing to the worker holding it, which keeps sending batches until none are queued.
+    while _open_batch(batch_key):
+        try:
+            while jobs := _collect_batch(job.mode, job.kiosk_id, window):
+                _send_jobs(jobs, allow_retry=allow_retry)
+        finally:
+            _close_batch(batch_key)
+        # A job queued just before the batch closed saw it open; pick it up unless another worker has.
+        if not PrintJob.objects.filter(status=PrintJob.QUEUED, mode=job.mode, kiosk_id=job.kiosk_id).exists():
+            return
+
+
+def _collect_batch(mode: str, kiosk_id: str, window: float) -> list[PrintJob]:
+    """Claim the oldest queued job for a kiosk, wait out the window, then claim what else arrived."""
+    jobs = _claim_queued_jobs(mode, kiosk_id, limit=1)
+    if not jobs:
+        return []
+    time.sleep(window)
+    return jobs + _claim_queued_jobs(mode, kiosk_id, limit=MAX_COALESCED_JOBS - 1)
+
+
+def _send_jobs(jobs: list[PrintJob], *, allow_retry: bool) -> None:
+    job = jobs[0]
+    attendance_ids = [attendance_id for batch_job in jobs for attendance_id in batch_job.attendance_ids or []]
+    max_attempts = _max_attempts() if allow_retry else job.attempts + 1
+    submit_job = submit_server_attendance_print_job if job.mode == PrintJob.SERVER else submit_attendance_print_job
+    last_error = ""
+    while job.attempts < max_attempts:
+        for batch_job in jobs:
+            batch_job.attempts += 1
+            batch_job.save(update_fields=["attempts", "updated_at"])
+        try:
+            backend_job_id = submit_job(attendance_ids, kiosk_id=job.kiosk_id, user=job.requested_by)
+        except (PrintNodeUnavailableError, ServerPrinterUnavailableError) as exc:
+            # The breaker is open; retrying before its cooldown would fail the same way.
+            last_error = str(exc)
+            break
+        except PrintNodeJobUnconfirmedError as exc:
+            # PrintNode may already have the job; sending it again could print a second label.
+            last_error = str(exc)
+            break
+        except (PrintNodeError, ServerPrinterError) as exc:
+            last_error = str(exc)
+            if job.attempts < max_attempts:
+                time.sleep(_retry_delay() * job.attempts)
+            continue
+        except Exception as exc:
+            logger.exception("Print job %s crashed.", job.id)
+            last_error = f"Unexpected print error: {exc}"
+            break
+        backend_job_id = str(backend_job_id)
+        # Only the worker pool runs the state tracker; inline mode reports the submission alone.
+        backend_state = "pending" if backend_job_id.startswith("ipp:") and _worker_count() else ""
+        try:
+            confirm_server_print_accepted(backend_job_id)
+        except ServerPrinterError as exc:
+            # The label reached the printer, so a resend could print it once the fault is cleared.
+            last_error = str(exc)
+            break
+        for batch_job in jobs:
+            _finish_job(batch_job, status=PrintJob.DONE, backend_job_id=backend_job_id, backend_state=backend_state, batch=jobs)
+        if backend_state:
+            _request_state_tracking()
+        return
+    for batch_job in jobs:
+        _finish_job(batch_job, status=PrintJob.FAILED, error=last_error or "Print job failed.", batch=jobs)
+
+
+def resume_pending_print_jobs(*, created_before=None) -> int:
+    """Re-dispatch queued jobs left by a server restart; fail ones that may already have printed.
+
+    A job that was PRINTING may have reached the printer before the process died,
+    so it is marked failed for staff to reprint rather than being sent again.
+    """
+    cutoff = timezone.now() - PRINT_JOB_EXPIRE_AFTER
+    pending = PrintJob.objects.filter(status__in=[PrintJob.QUEUED, PrintJob.PRINTING])
+    if created_before:
+        pending = pending.filter(created_at__lt=created_before)
+    for job in pending.filter(status=PrintJob.PRINTING).select_related("requested_by", "service"):
+        _finish_job(
+            job,
+            status=PrintJob.FAILED,
+            error="The server restarted while this label was being sent. Reprint it if it did not come out.",
+        )
+    for job in pending.filter(created_at__lt=cutoff).select_related("requested_by", "service"):
+        _finish_job(job, status=PrintJob.FAILED, error="Print job expired before it could be sent.")
+    job_ids = list(pending.filter(status=PrintJob.QUEUED, created_at__gte=cutoff).values_list("id", flat=True))
+    for job_id in job_ids:
+        _dispatch(job_id)
+    return len(job_ids)
+
+
+def print_job_payload(job: PrintJob) -> dict:
+    payload = {
+        "print_job_id": job.id,
+        "status": job.status,
+        "queued": not job.is_finished,
+        "printed": job.status == PrintJob.DONE,
+        "print_mode": job.mode,
+        "print_mode_label": MODE_LABELS.get(job.mode, "Printer"),
+        "count": len(job.attendance_ids or []),
+        "attempts": job.attempts,
+    }
+    if job.backend_job_id:
+        payload["backend_job_id"] = job.backend_job_id
+    if job.backend_state:
+        payload["backend_state"] = job.backend_state
+    if job.status == PrintJob.FAILED:
+        payload["print_error"] = job.error or "Print job failed."
+    return payload
+
+
+def _finish_job(
+    job: PrintJob,
+    *,
+    status: str,
+    backend_job_id: str = "",
+    backend_state: str = "",
+    error: str = "",
+    batch=(),
+) -> None:
+    job.status = status
+    job.backend_job_id = backend_job_id
+    job.backend_state = backend_state
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "backend_job_id", "backend_state", "error", "finished_at", "updated_at"])
+    mode_label = MODE_LABELS.get(job.mode, "Printer")
+    metadata = {"attendance_ids": job.attendance_ids, "kiosk_id": job.kiosk_id, "spool_job_id": job.id, "attempts": job.attempts}
+    if len(batch) > 1:
+        metadata["coalesced_with"] = [batch_job.id for batch_job in batch if batch_job.id != job.id]
+    if status == PrintJob.DONE:
+        log_event(
+            AuditLog.ACTION_SERVER_PRINT_SUCCESS if job.mode == PrintJob.SERVER else AuditLog.ACTION_PRINTNODE_SUCCESS,
+            user=job.requested_by,
+            service=job.service,
+            message=f"{mode_label} nametag print job submitted.",
+            metadata={**metadata, "print_job_id": backend_job_id},
+        )
+    else:
+        log_event(
+            AuditLog.ACTION_SERVER_PRINT_FAILURE if job.mode == PrintJob.SERVER else AuditLog.ACTION_PRINTNODE_FAILURE,
+            user=job.requested_by,
+            service=job.service,
+            message=error[:255],
+            metadata=metadata,
+        )
+
+
+def track_backend_states() -> int:
+    """Store the printer-side state of recent IPP jobs that have not finished. Returns how many are still open."""
+    pending = PrintJob.objects.filter(
+        status=PrintJob.DONE,
+        backend_job_id__startswith="ipp:",
+        finished_at__gte=timezone.now() - BACKEND_STATE_TRACK_FOR,
+    ).exclude(backend_state__in=FINISHED_JOB_STATES)
+    # Coalesced jobs share one printer job, so each is asked about once.
+    open_count = 0
+    for backend_job_id in set(pending.values_list("backend_job_id", flat=True)):
+        state = get_server_print_job_state(backend_job_id)
+        if state:
+            pending.filter(backend_job_id=backend_job_id).exclude(backend_state=state).update(
+                backend_state=state,
+                updated_at=timezone.now(),
+            )
+        if state not in FINISHED_JOB_STATES:
+            open_count += 1
+    return open_count
+
+
+def _request_state_tracking() -> None:
+    global _tracker_thread
+    _tracker_wake_event.set()
+    with _tracker_lock:
+        if _tracker_thread and _tracker_thread.is_alive():
+            return
+        _tracker_thread = threading.Thread(target=_tracker_loop, name="print-state-tracker", daemon=True)
+        _tracker_thread.start()
+
+
+def _tracker_loop() -> None:
+    open_count = 0
+    while True:
+        # Sleep until a new IPP job is sent once nothing is left to poll.
+        _tracker_wake_event.wait(BACKEND_STATE_POLL_SECONDS if open_count else None)
+        _tracker_wake_event.clear()
+        close_old_connections()
+        try:
+            open_count = track_backend_states()
+        except Exception:
+            logger.exception("Print job states could not be refreshed.")
+            open_count = 0
+        finally:
+            connection.close()
+
+
+def _validate_print_target(mode: str, kiosk_id: str) -> None:
+    if mode == PrintJob.SERVER:
+        target = get_kiosk_server_printer(kiosk_id)
+        breaker = find_open_circuit_breaker(server_printer_breaker_key(target))
+        if breaker:
+            raise ServerPrinterUnavailableError(breaker.open_message("The server printer"))
+        return
+    if not (get_setting("printnode_api_key", "") or "").strip():
+        raise PrintNodeError("PrintNode API key is not configured.")
+    get_kiosk_printer_id(kiosk_id)
+    breaker = find_open_circuit_breaker(PRINTNODE_BREAKER_KEY)
+    if breaker:
+        raise PrintNodeUnavailableError(breaker.open_message("PrintNode"))
+
+
+def _claim_print_job(job_id: int) -> bool:
+    # Claim the job atomically so two workers never transmit the same job.
+    return bool(
+        PrintJob.objects.filter(id=job_id, status=PrintJob.QUEUED).update(
+            status=PrintJob.PRINTING,
+            updated_at=timezone.now(),
+        )
+    )
+
+
+def _claim_queued_jobs(mode: str, kiosk_id: str, *, limit: int) -> list[PrintJob]:
+    candidate_ids = PrintJob.objects.filter(
+        status=PrintJob.QUEUED,
+        mode=mode,
+        kiosk_id=kiosk_id,
+    ).order_by("created_at", "id").values_list("id", flat=True)[:limit]
+    claimed_ids = [candidate_id for candidate_id in candidate_ids if _claim_print_job(candidate_id)]
+    jobs = PrintJob.objects.filter(id__in=claimed_ids).select_related("requested_by", "service").in_bulk()
+    return [jobs[claimed_id] for claimed_id in claimed_ids if claimed_id in jobs]
+
+
+def _coalesce_window_seconds(job: PrintJob) -> float:
+    backend, error_class = ("server", ServerPrinterError) if job.mode == PrintJob.SERVER else ("printnode", PrintNodeError)
+    try:
+        profile = _get_kiosk_printer_profile(job.kiosk_id, backend, error_class)
+    except error_class:
+        profile = None
+    window_ms = _safe_int(
+        _profile_setting(profile, "print_coalesce_window_ms", "0"),
+        0,
+        minimum=0,
+        maximum=MAX_COALESCE_WINDOW_MS,
+    )
+    return window_ms / 1000
+
+
+def _open_batch(batch_key) -> bool:
+    with _batch_lock:
+        if batch_key in _open_batches:
+            return False
+        _open_batches.add(batch_key)
+        return True
+
+
+def _close_batch(batch_key) -> None:
+    with _batch_lock:
+        _open_batches.discard(batch_key)
+
+
+def _dispatch(job_id: int) -> None:
+    _get_executor().submit(_run_in_worker, job_id)
+
+
+def _run_in_worker(job_id: int) -> None:
+    close_old_connections()
+    try:
+        run_print_job(job_id)
+    except Exception:
+        logger.exception("Print job %s could not be processed.", job_id)
+    finally:
+        connection.close()
+
+
+def ensure_print_spooler_started() -> None:
+    """Start the worker pool, which first resumes or fails the jobs left by the last run."""
+    if _worker_count():
+        _get_executor()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(_worker_count(), 1), thread_name_prefix="print-spooler")
+            _executor.submit(_resume_in_worker, timezone.now())
+    return _executor
+
+
+def _resume_in_worker(started_at) -> None:
+    close_old_connections()
+    try:
+        resume_pending_print_jobs(created_before=started_at)
+    except Exception:
+        logger.exception("Pending print jobs could not be resumed.")
+    finally:
+        connection.close()
+
+
+def _worker_count() -> int:
+    return max(int(getattr(settings, "PRINT_SPOOLER_WORKERS", 2)), 0)
+
+
+def _max_attempts() -> int:
+    return max(int(getattr(settings, "PRINT_SPOOLER_MAX_ATTEMPTS", 3)), 1)
+
+
+def _retry_delay() -> float:
+    return max(float(getattr(settings, "PRINT_SPOOLER_RETRY_DELAY_SECONDS", 2)), 0)
@@ -0,0 +1,406 @@
+"""Local stand-ins for Brother QL network printers and the PrintNode API.
+
+The emulators let print throughput and failure handling be exercised without
+real hardware or a PrintNode account. A Brother emulator listens for raw jobs
+(normally port 9100), decodes the raster stream into labels, and serves the
+status page read by ``printnode._fetch_brother_web_status``. The PrintNode
+emulator answers the handful of API calls the app makes. Both can add latency
+and fail a share of requests.
+"""
+
+from dataclasses import dataclass, field
+import base64
+import html
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image
+
+
+BROTHER_MODEL_NAME = "Brother QL-820NWB"
+RASTER_ROW_BYTES = 90
+MEDIA_TYPES = {"62": "Continuous Length Tape 62mm", "62red": "Continuous Length Tape 62mm (Black/Red)"}
+
+
+class RasterDecodeError(Exception):
+    pass
+
+
+@dataclass
+class RasterPage:
+    rows: int
+    two_color: bool
+    black: list = field(default_factory=list)
+    red: list = field(default_factory=list)
+
+    def to_image(self):
+        """Render the page as seen from the printed side (black, red, and white)."""
+        width = RASTER_ROW_BYTES * 8
+        image = Image.new("RGB", (width, len(self.black)), "white")
+        for plane, color in ((self.black, (0, 0, 0)), (self.red, (255, 0, 0))):
+            if not plane:
+                continue
+            mask = Image.frombytes("1", (width, len(plane)), b"".join(plane)).transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+            image.paste(color, (0, 0), mask)
+        return image
+
+
+@dataclass
+class EmulatorStats:
+    jobs: int = 0
+    labels: int = 0
+    bytes_received: int = 0
+    failed: int = 0
+    rejected: int = 0
+    lock: threading.Condition = field(default_factory=threading.Condition, repr=False)
+
+    def record(self, **counts) -> None:
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+            self.lock.notify_all()
+
+    def wait_for_jobs(self, count: int, *, timeout: float = 5.0) -> bool:
+        """Block until ``count`` jobs (accepted or rejected) have been received."""
+        with self.lock:
+            return self.lock.wait_for(lambda: self.jobs >= count, timeout=timeout)
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {"jobs": self.jobs, "labels": self.labels, "bytes_received": self.bytes_received, "failed": self.failed, "rejected": self.rejected}
+
+
+def decode_brother_raster(data: bytes) -> list[RasterPage]:
+    """Parse a Brother QL raster job into pages, raising RasterDecodeError on malformed input."""
+    pages = []
+    position = 0
+    compressed = False
+    rows_expected = 0
+    two_color = False
+    page = None
+
+    def take(count: int) -> bytes:
+        nonlocal position
+        chunk = data[position : position + count]
+        if len(chunk) != count:
+            raise RasterDecodeError(f"Raster job ended inside a command at byte {position}.")
+        position += count
+        return chunk
+
+    while position < len(data):
+        command = data[position]
+        position += 1
+        if command == 0x00:
+            continue
+        if command == 0x1B:
+            code = take(1)
+            if code == b"@":
+                continue
+            if code != b"i":
+                raise RasterDecodeError(f"Unknown ESC command 0x{code.hex()} at byte {position - 1}.")
+            sub = take(1)
+            if sub == b"z":
+                rows_expected = struct.unpack("<L", take(10)[4:8])[0]
+            elif sub == b"K":
+                two_color = bool(take(1)[0] & 0x01)
+            elif sub == b"d":
+                take(2)
+            elif sub in {b"a", b"M", b"A"}:
+                take(1)
+            elif sub != b"S":
+                raise RasterDecodeError(f"Unknown ESC i command {sub!r} at byte {position - 1}.")
+            continue
+        if command == 0x4D:
+            compressed = take(1)[0] == 0x02
+            continue
+        if command in {0x67, 0x77, 0x5A}:
+            if page is None:
+                page = RasterPage(rows=rows_expected, two_color=two_color)
+            if command == 0x5A:
+                page.black.append(bytes(RASTER_ROW_BYTES))
+                continue
+            color = take(1)[0]
+            row = take(take(1)[0])
+            row = _unpack_bits(row) if compressed else row
+            if len(row) != RASTER_ROW_BYTES:
+                raise RasterDecodeError(f"Raster row is {len(row)} bytes, expected {RASTER_ROW_BYTES}.")
+            (page.red if command == 0x77 and color == 0x02 else page.black).append(row)
+            continue
+        if command in {0x0C, 0x1A}:
+            if page is None:
+                raise RasterDecodeError("Print command arrived before any raster data.")
+            if page.rows and len(page.black) != page.rows:
+                raise RasterDecodeError(f"Page declared {page.rows} rows but sent {len(page.black)}.")
+            pages.append(page)
+            page = None
+            continue
+        raise RasterDecodeError(f"Unknown raster command 0x{command:02x} at byte {position - 1}.")
+    if page is not None:
+        raise RasterDecodeError("Raster job ended without a print command.")
+    return pages
+
+
+class _FaultInjector:
+    def __init__(self, *, latency_ms: int, failure_rate: float, seed):
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.stats = EmulatorStats()
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def delay(self) -> None:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def should_fail(self) -> bool:
+        with self._random_lock:
+            return self.failure_rate > 0 and self._random.random() < self.failure_rate
+
+
+class BrotherPrinterEmulator(_FaultInjector):
+    """Raw-port and status-page stand-in for one Brother QL printer."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        *,
+        raw_port: int = 9100,
+        status_port: int = 80,
+        media: str = "62red",
+        latency_ms: int = 0,
+        failure_rate: float = 0.0,
+        seed=None,
+    ):
+        super().__init__(latency_ms=latency_ms, failure_rate=failure_rate, seed=seed)
+        self.host = host
+        self.raw_port = raw_port
+        self.status_port = status_port
+        self.media = media
+        self.device_status = "Ready"
+        self.media_status = "OK"
+        self.last_pages = []
+        self._servers = []
+
+    def start(self) -> "BrotherPrinterEmulator":
+        raw_server = _ThreadingTCPServer((self.host, self.raw_port), _RawJobHandler)
+        status_server = ThreadingHTTPServer((self.host, self.status_port), _BrotherStatusHandler)
+        for server in (raw_server, status_server):
+            server.emulator = self
+            threading.Thread(target=server.serve_forever, name=f"brother-emulator-{self.host}", daemon=True).start()
+        self._servers = [raw_server, status_server]
+        self.raw_port = raw_server.server_address[1]
+        self.status_port = status_server.server_address[1]
+        return self
+
+    def stop(self) -> None:
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+    def set_state(self, *, device_status: str | None = None, media_status: str | None = None) -> None:
+        if device_status is not None:
+            self.device_status = device_status
+        if media_status is not None:
+            self.media_status = media_status
+
+    @property
+    def is_ready(self) -> bool:
+        return self.device_status.lower() == "ready" and self.media_status.lower() != "empty"
+
+    def status_page(self) -> str:
+        values = {
+            "Model Name": BROTHER_MODEL_NAME,
+            "Emulation": "Raster",
+            "Device Status": self.device_status,
+            "Media Status": self.media_status,
+            "Media Type": MEDIA_TYPES.get(self.media, self.media),
+        }
+        rows = "".join(f"<dt>{html.escape(label)}</dt><dd>{html.escape(value)}</dd>" for label, value in values.items())
+        return f"<html><head><title>{BROTHER_MODEL_NAME}</title></head><body><dl>{rows}</dl></body></html>"
+
+
+class PrintNodeEmulator(_FaultInjector):
+    """Stand-in for the PrintNode API endpoints used by the app."""
+
+    def __init__(self, host: str = "127.0.0.1", *, port: int = 0, api_key: str = "", latency_ms: int = 0, failure_rate: float = 0.0, seed=None):
+        super().__init__(latency_ms=latency_ms, failure_rate=failure_rate, seed=seed)
+        self.host = host
+        self.port = port
+        self.api_key = api_key
+        self._next_job_id = 1000
+        self._job_lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "PrintNodeEmulator":
+        self._server = ThreadingHTTPServer((self.host, self.port), _PrintNodeHandler)
+        self._server.emulator = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="printnode-emulator", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def authorized(self, header: str) -> bool:
+        if not header.startswith("Basic "):
+            return False
+        if not self.api_key:
+            return True
+        try:
+            user = base64.b64decode(header.removeprefix("Basic ")).decode("utf-8").split(":", 1)[0]
+        except (ValueError, UnicodeDecodeError):
+            return False
+        return user == self.api_key
+
+    def next_job_id(self) -> int:
+        with self._job_lock:
+            self._next_job_id += 1
+            return self._next_job_id
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _RawJobHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        emulator = self.server.emulator
+        emulator.delay()
+        if emulator.should_fail():
+            # Drop the connection as a jammed or rebooting printer would.
+            emulator.stats.record(failed=1)
+            self.request.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            return
+        chunks = []
+        while True:
+            chunk = self.request.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        data = b"".join(chunks)
+        if not emulator.is_ready:
+            emulator.stats.record(jobs=1, bytes_received=len(data), rejected=1)
+            return
+        try:
+            pages = decode_brother_raster(data)
+        except RasterDecodeError:
+            emulator.stats.record(jobs=1, bytes_received=len(data), rejected=1)
+            return
+        emulator.last_pages = pages
+        emulator.stats.record(jobs=1, labels=len(pages), bytes_received=len(data))
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, status: int, body: str, content_type: str = "application/json"):
+        encoded = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def log_message(self, format, *args):
+        return
+
+
+class _BrotherStatusHandler(_QuietHandler):
+    def do_GET(self):
+        emulator = self.server.emulator
+        if urlsplit(self.path).path == "/emulator/stats":
+            self._reply(200, json.dumps({**emulator.stats.as_dict(), "device_status": emulator.device_status, "media_status": emulator.media_status}))
+            return
+        emulator.delay()
+        self._reply(200, emulator.status_page(), "text/html; charset=utf-8")
+
+    def do_POST(self):
+        # POST /emulator/state with device_status=Busy or media_status=Empty injects a printer state.
+        if urlsplit(self.path).path != "/emulator/state":
+            self._reply(404, '{"message": "Not found"}')
+            return
+        values = {**parse_qs(urlsplit(self.path).query), **parse_qs(self._read_body().decode("utf-8"))}
+        self.server.emulator.set_state(
+            device_status=values.get("device_status", [None])[0],
+            media_status=values.get("media_status", [None])[0],
+        )
+        self._reply(200, json.dumps({"device_status": self.server.emulator.device_status, "media_status": self.server.emulator.media_status}))
+
+
+class _PrintNodeHandler(_QuietHandler):
+    def do_GET(self):
+        if not self._admit():
+            return
+        if urlsplit(self.path).path.rstrip("/").endswith("/emulator/stats"):
+            self._reply(200, json.dumps(self.server.emulator.stats.as_dict()))
+            return
+        self._reply(200, '"ok"' if urlsplit(self.path).path.endswith("/noop") else "[]")
+
+    def do_POST(self):
+        body = self._read_body()
+        if not self._admit():
+            return
+        emulator = self.server.emulator
+        if not urlsplit(self.path).path.endswith("/printjobs"):
+            self._reply(404, '{"message": "Not found"}')
+            return
+        try:
+            payload = json.loads(body)
+            content = base64.b64decode(payload.get("content", ""))
+            labels = len(decode_brother_raster(content)) if payload.get("contentType") == "raw_base64" else 1
+        except (ValueError, AttributeError, RasterDecodeError) as exc:
+            emulator.stats.record(jobs=1, bytes_received=len(body), rejected=1)
+            self._reply(400, json.dumps({"message": f"Invalid print job: {exc}"}))
+            return
+        if not str(payload.get("printerId", "")).isdigit():
+            emulator.stats.record(jobs=1, bytes_received=len(body), rejected=1)
+            self._reply(400, '{"message": "printerId is invalid"}')
+            return
+        emulator.stats.record(jobs=1, labels=labels, bytes_received=len(body))
+        self._reply(201, str(emulator.next_job_id()))
+
+    def _admit(self) -> bool:
+        emulator = self.server.emulator
+        emulator.delay()
+        if not emulator.authorized(self.headers.get("Authorization", "")):
+            self._reply(401, '{"code": "Unauthorized", "message": "API key not found"}')
+            return False
+        if emulator.should_fail():
+            emulator.stats.record(failed=1)
+            self._reply(503, '{"message": "Service temporarily unavailable"}')
+            return False
+        return True
+
+
+def _unpack_bits(data: bytes) -> bytes:
+    out = bytearray()
+    position = 0
+    while position < len(data):
+        header = data[position]
+        position += 1
+        if header < 128:
+            out += data[position : position + header + 1]
+            position += header + 1
+        elif header > 128:
+            out += data[position : position + 1] * (257 - header)
+            position += 1
+    return bytes(out)
@@ -0,0 +1,177 @@
+from dataclasses import dataclass
+from datetime import datetime
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from . import printnode
+from .settings_store import get_setting
+
+
+logger = logging.getLogger(__name__)
+
+# A cached status older than this many poll intervals is treated as unknown.
+STALE_AFTER_INTERVALS = 3
+
+_status_cache: dict[str, "PrinterStatus"] = {}
+_cache_lock = threading.Lock()
+_monitor_thread = None
+_monitor_lock = threading.Lock()
+_wake_event = threading.Event()
+
+
+@dataclass(frozen=True)
+class PrinterStatus:
+    host: str
+    device_status: str
+    media_status: str
+    media_type: str
+    emulation: str
+    reachable: bool
+    checked_at: datetime
+
+    @property
+    def age_seconds(self) -> float:
+        return max((timezone.now() - self.checked_at).total_seconds(), 0)
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.age_seconds <= monitor_interval_seconds() * STALE_AFTER_INTERVALS
+
+    @property
+    def is_ready(self) -> bool:
+        return self.device_status.lower() in {"", "ready"} and self.media_status.lower() != "empty"
+
+    def as_dict(self) -> dict:
+        return {
+            "host": self.host,
+            "device_status": self.device_status,
+            "media_status": self.media_status,
+            "media_type": self.media_type,
+            "reachable": self.reachable,
+            "checked_at": self.checked_at.isoformat(),
+            "age_seconds": int(self.age_seconds),
+        }
+
+
+def monitor_interval_seconds() -> int:
+    return max(int(getattr(settings, "PRINTER_MONITOR_INTERVAL_SECONDS", 15)), 0)
+
+
+def get_cached_printer_status(host: str, *, fresh_only: bool = True) -> PrinterStatus | None:
+    with _cache_lock:
+        status = _status_cache.get(host)
+    if status and fresh_only and not status.is_fresh:
+        return None
+    return status
+
+
+def get_printer_status(host: str, *, timeout: int) -> PrinterStatus:
+    """Return a fresh cached status, fetching the Brother status page only when the cache is cold."""
+    status = get_cached_printer_status(host)
+    if status:
+        return status
+    return refresh_printer_status(host, timeout=timeout)
+
+
+def refresh_printer_status(host: str, *, timeout: int) -> PrinterStatus:
+    raw_status = printnode._fetch_brother_web_status(host, timeout=timeout)
+    status = PrinterStatus(
+        host=host,
+        device_status=raw_status.get("device_status", ""),
+        media_status=raw_status.get("media_status", ""),
+        media_type=raw_status.get("media_type", ""),
+        emulation=raw_status.get("emulation", ""),
+        reachable=bool(raw_status),
+        checked_at=timezone.now(),
+    )
+    with _cache_lock:
+        _status_cache[host] = status
+    return status
+
+
+def clear_printer_status_cache() -> None:
+    with _cache_lock:
+        _status_cache.clear()
+
+
+def configured_raw_printers() -> dict[str, dict]:
+    """Collect every raw network printer referenced by kiosk maps and server printer profiles."""
+    printers = {}
+
+    def add(printer_config, kiosk_id: str, profile_name: str = ""):
+        try:
+            target = printnode._parse_server_printer_config(printer_config, kiosk_id or profile_name)
+        except printnode.ServerPrinterError:
+            return
+        if target["kind"] != "raw":
+            return
+        entry = printers.setdefault(
+            target["host"],
+            {"host": target["host"], "port": target["port"], "kiosks": [], "profiles": []},
+        )
+        if kiosk_id and kiosk_id not in entry["kiosks"]:
+            entry["kiosks"].append(kiosk_id)
+        if profile_name and profile_name not in entry["profiles"]:
+            entry["profiles"].append(profile_name)
+
+    for kiosk_id, printer_config in _json_setting("server_printer_map").items():
+        add(printer_config, str(kiosk_id))
+
+    profile_map = _json_setting("kiosk_printer_profile_map")
+    for profile_name, profile in _json_setting("printer_profiles").items():
+        if not isinstance(profile, dict) or str(profile.get("backend", "")).strip().lower() != "server":
+            continue
+        printer_config = printnode._profile_server_printer_config(profile)
+        if not printer_config:
+            continue
+        kiosks = [str(kiosk_id) for kiosk_id, name in profile_map.items() if str(name).strip() == profile_name]
+        for kiosk_id in kiosks or [""]:
+            add(printer_config, kiosk_id, profile_name)
+    return printers
+
+
+def poll_configured_printers() -> list[PrinterStatus]:
+    timeout = min(printnode._safe_int(get_setting("server_printer_timeout_seconds", "10"), 10, minimum=1, maximum=60), 5)
+    return [refresh_printer_status(host, timeout=timeout) for host in configured_raw_printers()]
+
+
+def ensure_printer_monitor_started() -> None:
+    global _monitor_thread
+    if monitor_interval_seconds() <= 0:
+        return
+    with _monitor_lock:
+        if _monitor_thread and _monitor_thread.is_alive():
+            return
+        _monitor_thread = threading.Thread(target=_monitor_loop, name="printer-monitor", daemon=True)
+        _monitor_thread.start()
+
+
+def request_printer_refresh() -> None:
+    """Ask the monitor to poll now instead of waiting for the next interval."""
+    _wake_event.set()
+
+
+def _monitor_loop() -> None:
+    while True:
+        close_old_connections()
+        try:
+            poll_configured_printers()
+        except Exception:
+            logger.exception("Printer status poll failed.")
+        finally:
+            connection.close()
+        _wake_event.wait(monitor_interval_seconds())
+        _wake_event.clear()
+
+
+def _json_setting(key: str) -> dict:
+    try:
+        value = json.loads(get_setting(key, "{}") or "{}")
+    except json.JSONDecodeError:
+        return {}
+    return value if isinstance(value, dict) else {}
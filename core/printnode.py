@@ -1,5 +1,8 @@
 import base64
+from dataclasses import dataclass, replace
+from functools import lru_cache
 import html
+import http.client
 import json
 import logging
 import platform
@@ -8,27 +11,41 @@ import re
 import socket
 import subprocess
 import tempfile
+import threading
 import time
 import urllib.error
 import urllib.request
+from urllib.parse import quote
 import warnings
 
+from django.conf import settings
 from django.utils import timezone
 from PIL import Image, ImageDraw, ImageFont
 
+from .brother_raster import BrotherRasterError, encode_label_raster
+from .fonts import SYSTEM_FONT_CHOICES
+from .ipp_client import IppError, get_ipp_client, parse_ipp_uri
 from .models import Attendance
-from .settings_store import get_setting
+from .print_breaker import PRINTNODE_BREAKER_KEY, get_circuit_breaker
+from .printnode_client import ResponseLostError, get_printnode_client
+from .settings_store import get_setting, get_settings_version
 
 
+logger = logging.getLogger(__name__)
+
 PRINT_MODE_CONNECTED = "Connected Printer"
 PRINT_MODE_PRINTNODE = "PrintNode Printer"
 PRINT_MODE_SERVER = "Server Printer"
-PRINTNODE_API_URL = "https://api.printnode.com/printjobs"
-PRINTNODE_NOOP_URL = "https://api.printnode.com/noop"
+PRINTNODE_PRINTJOBS_PATH = "/printjobs"
+PRINTNODE_NOOP_PATH = "/noop"
 BROTHER_MODEL = "QL-820NWB"
 BROTHER_DEFAULT_LABEL = "62red"
 BROTHER_LABEL_MEDIA_CHOICES = {"62", "62red"}
 PRINTER_PROFILE_BACKENDS = {"printnode", "server"}
+QUEUE_TRANSPORTS = {"lp", "ipp"}
+IPP_USER_NAME = "welcome-system"
+# Brother printers take a moment after a raw send before their status page shows a rejection.
+RAW_PRINT_SETTLE_SECONDS = 0.75
 LABEL_DPI = 300
 LABEL_WIDTH_PX = 696
 LABEL_HEIGHT_PX = 330
@@ -41,6 +58,12 @@ FONT_FILE_CANDIDATES = {
     "Trebuchet MS": (("Trebuchet MS Bold.ttf", "Trebuchet MS.ttf"),),
     "Verdana": (("Verdana Bold.ttf", "Verdana.ttf"),),
 }
+SERIF_LABEL_FONTS = {"Georgia", "Times New Roman", "Merriweather", "Playfair Display", "Noto Serif"}
+SYSTEM_FONT_NAMES = {name for name, _label in SYSTEM_FONT_CHOICES}
+
+_layouts = {}
+_layouts_version = None
+_layouts_lock = threading.Lock()
 
 
 class PrintNodeError(Exception):
@@ -51,6 +74,18 @@ class ServerPrinterError(Exception):
     """Raised when a server-side network printer job cannot be submitted."""
 
 
+class PrintNodeUnavailableError(PrintNodeError):
+    """Raised without contacting PrintNode while its circuit breaker is open."""
+
+
+class PrintNodeJobUnconfirmedError(PrintNodeError):
+    """Raised when a job was sent but PrintNode's answer was lost; sending it again could print it twice."""
+
+
+class ServerPrinterUnavailableError(ServerPrinterError):
+    """Raised without contacting the printer while its circuit breaker is open."""
+
+
 def is_printnode_mode() -> bool:
     return get_setting("print_mode", PRINT_MODE_CONNECTED).strip() == PRINT_MODE_PRINTNODE
 
@@ -202,6 +237,8 @@ def submit_server_test_print_job(*, kiosk_id: str) -> str:
 
 
 def _send_to_server_printer_target(target: dict, *, raw_bytes: bytes, pdf_bytes: bytes, images=None) -> str:
+    if target["kind"] == "ipp":
+        return _send_pdf_to_ipp_printer(target["uri"], pdf_bytes)
     if target["kind"] == "queue":
         if platform.system() == "Windows":
             return _send_images_to_windows_print_queue(target["queue"], images or [])
@@ -273,9 +310,52 @@ def _send_pdf_to_print_queue(queue_name: str, pdf_bytes: bytes) -> str:
     return _parse_lp_job_id(result.stdout) or f"queue:{queue_name}"
 
 
+def _send_pdf_to_ipp_printer(printer_uri: str, pdf_bytes: bytes) -> str:
+    breaker = get_circuit_breaker(f"ipp:{printer_uri}")
+    if not breaker.allow_request():
+        raise ServerPrinterUnavailableError(breaker.open_message(f"IPP printer {printer_uri}"))
+    timeout = _safe_int(get_setting("server_printer_timeout_seconds", "10"), 10, minimum=1, maximum=60)
+    try:
+        job = get_ipp_client(printer_uri, timeout=timeout).print_job(
+            printer_uri,
+            pdf_bytes,
+            job_name=f"Welcome System Nametags {timezone.localtime():%Y-%m-%d %H:%M:%S}",
+            user_name=IPP_USER_NAME,
+        )
+    except (OSError, http.client.HTTPException) as exc:
+        breaker.record_failure()
+        raise ServerPrinterError(f"Could not reach IPP printer {printer_uri}: {exc}") from exc
+    except IppError as exc:
+        breaker.record_success()
+        raise ServerPrinterError(f"IPP printer {printer_uri} rejected the job: {exc}") from exc
+    breaker.record_success()
+    return f"ipp:{job.job_id}@{printer_uri}"
+
+
+def get_server_print_job_state(backend_job_id: str) -> str:
+    """Ask the IPP endpoint for the state of a job it accepted; blank for other backends or on error."""
+    job_id, separator, printer_uri = (backend_job_id or "").removeprefix("ipp:").partition("@")
+    if not backend_job_id.startswith("ipp:") or not separator or not job_id.isdigit():
+        return ""
+    timeout = _safe_int(get_setting("server_printer_timeout_seconds", "10"), 10, minimum=1, maximum=60)
+    try:
+        return get_ipp_client(printer_uri, timeout=timeout).get_job_state(printer_uri, int(job_id), user_name=IPP_USER_NAME)
+    except (OSError, http.client.HTTPException, IppError, ValueError):
+        return ""
+
+
 def _send_raw_to_server_printer(host: str, port: int, raw_bytes: bytes) -> None:
+    from .printer_monitor import request_printer_refresh
+
+    breaker = get_circuit_breaker(f"raw:{host}:{port}")
+    if not breaker.allow_request():
+        raise ServerPrinterUnavailableError(breaker.open_message(f"Server printer at {host}:{port}"))
     timeout = _safe_int(get_setting("server_printer_timeout_seconds", "10"), 10, minimum=1, maximum=60)
-    _validate_raw_brother_status(host, timeout=min(timeout, 5))
+    try:
+        _validate_raw_brother_status(host, timeout=min(timeout, 5))
+    except ServerPrinterError:
+        breaker.release()
+        raise
     try:
         with socket.create_connection((host, port), timeout=timeout) as printer_socket:
             printer_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
@@ -285,37 +365,72 @@ def _send_raw_to_server_printer(host: str, port: int, raw_bytes: bytes) -> None:
             except OSError:
                 pass
     except OSError as exc:
+        breaker.record_failure()
         raise ServerPrinterError(f"Could not reach server printer at {host}:{port}: {exc}") from exc
-    time.sleep(0.75)
-    _validate_raw_brother_status(host, timeout=min(timeout, 5), after_send=True)
+    breaker.record_success()
+    # The monitor re-reads the status page in the background so a rejected job
+    # shows up on the kiosk status line; the spooler confirms the job itself.
+    request_printer_refresh()
+
+
+def confirm_server_print_accepted(backend_job_id: str) -> None:
+    """Re-read a raw Brother printer's status after a send and raise if it rejected the job.
+
+    Other backends report their own errors, so this does nothing for them. It waits for
+    the printer to react, so the spooler calls it from its worker rather than a request.
+    """
+    from .printer_monitor import refresh_printer_status
+
+    host, separator, _port = (backend_job_id or "").removeprefix("raw:").rpartition(":")
+    if not backend_job_id.startswith("raw:") or not separator:
+        return
+    time.sleep(RAW_PRINT_SETTLE_SECONDS)
+    timeout = _safe_int(get_setting("server_printer_timeout_seconds", "10"), 10, minimum=1, maximum=60)
+    status = refresh_printer_status(host, timeout=min(timeout, 5))
+    if not status.reachable:
+        return
+    if status.device_status and status.device_status.lower() not in {"ready", "printing"}:
+        raise ServerPrinterError(
+            f"Brother printer at {host} rejected the print job. Current status: {status.device_status}. Check the printer LCD for details."
+        )
+    if status.media_status.lower() == "empty":
+        raise ServerPrinterError(f"Brother printer at {host} reports empty media. Load a label roll, then reprint.")
 
 
 def submit_printnode_job(api_key: str, payload: dict) -> int:
-    body = json.dumps(payload).encode("utf-8")
-    auth = base64.b64encode(f"{api_key}:".encode("utf-8")).decode("ascii")
-    request = urllib.request.Request(
-        PRINTNODE_API_URL,
-        data=body,
-        headers={
-            "Authorization": f"Basic {auth}",
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        },
-        method="POST",
-    )
-    try:
-        with urllib.request.urlopen(request, timeout=15) as response:
-            response_body = response.read().decode("utf-8").strip()
-    except urllib.error.HTTPError as exc:
-        detail = exc.read().decode("utf-8", errors="replace").strip()
-        raise PrintNodeError(f"PrintNode rejected the print job: {detail or exc.reason}") from exc
-    except urllib.error.URLError as exc:
-        raise PrintNodeError(f"Could not reach PrintNode: {exc.reason}") from exc
+    return submit_printnode_jobs(api_key, [payload])[0]
 
-    try:
-        return int(json.loads(response_body))
-    except (TypeError, ValueError, json.JSONDecodeError) as exc:
-        raise PrintNodeError("PrintNode returned an unexpected response.") from exc
+
+def submit_printnode_jobs(api_key: str, payloads) -> list[int]:
+    """Submit print jobs back to back over the pooled PrintNode connection."""
+    client = get_printnode_client()
+    breaker = get_circuit_breaker(PRINTNODE_BREAKER_KEY)
+    job_ids = []
+    for payload in payloads:
+        if not breaker.allow_request():
+            raise PrintNodeUnavailableError(breaker.open_message("PrintNode"))
+        try:
+            response = client.request("POST", PRINTNODE_PRINTJOBS_PATH, api_key=api_key, payload=payload)
+        except ResponseLostError as exc:
+            breaker.record_failure()
+            raise PrintNodeJobUnconfirmedError(
+                f"PrintNode may have received the print job, but the connection closed before it answered ({exc}). "
+                "Check the printer before reprinting."
+            ) from exc
+        except (OSError, http.client.HTTPException) as exc:
+            breaker.record_failure()
+            raise PrintNodeError(f"Could not reach PrintNode: {exc}") from exc
+        if response.status >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if not response.ok:
+            raise PrintNodeError(f"PrintNode rejected the print job: {response.body or response.reason}")
+        try:
+            job_ids.append(int(json.loads(response.body)))
+        except (TypeError, ValueError, json.JSONDecodeError) as exc:
+            raise PrintNodeError("PrintNode returned an unexpected response.") from exc
+    return job_ids
 
 
 def verify_printnode_api_key(api_key: str | None = None) -> tuple[bool, str]:
@@ -323,31 +438,105 @@ def verify_printnode_api_key(api_key: str | None = None) -> tuple[bool, str]:
     if not api_key:
         return False, "PrintNode API key is blank."
 
-    auth = base64.b64encode(f"{api_key}:".encode("utf-8")).decode("ascii")
-    request = urllib.request.Request(
-        PRINTNODE_NOOP_URL,
-        headers={
-            "Authorization": f"Basic {auth}",
-            "Accept": "application/json",
-        },
-        method="GET",
-    )
     try:
-        with urllib.request.urlopen(request, timeout=10) as response:
-            response.read()
-    except urllib.error.HTTPError as exc:
-        detail = exc.read().decode("utf-8", errors="replace").strip()
+        response = get_printnode_client().request("GET", PRINTNODE_NOOP_PATH, api_key=api_key)
+    except (OSError, http.client.HTTPException) as exc:
+        return False, f"Could not reach PrintNode: {exc}"
+    if not response.ok:
         try:
-            payload = json.loads(detail)
-            message = payload.get("message") or payload.get("code") or detail
-        except json.JSONDecodeError:
-            message = detail or exc.reason
+            payload = json.loads(response.body)
+            message = payload.get("message") or payload.get("code") or response.body
+        except (AttributeError, json.JSONDecodeError):
+            message = response.body or response.reason
         return False, f"PrintNode rejected the API key: {message}"
-    except urllib.error.URLError as exc:
-        return False, f"Could not reach PrintNode: {exc.reason}"
     return True, "PrintNode API key verified."
 
 
+@dataclass(frozen=True)
+class LabelLayout:
+    """Label geometry and styling resolved once per settings version and printer profile.
+
+    The raster renderer, the PDF writer and the browser print templates all read
+    the same layout, so the three outputs cannot drift apart.
+    """
+
+    width_in: float
+    height_in: float
+    margin_in: float
+    first_name_color: str
+    last_name_color: str
+    first_name_scale: int
+    last_name_scale: int
+    hide_last_name: bool
+    font_name: str
+    font_file_candidates: tuple
+    pdf_fonts: tuple[str, str]
+    css_font_family: str
+    brother_label_media: str
+
+    @property
+    def margin_px(self) -> int:
+        return int(self.margin_in * LABEL_DPI)
+
+    @property
+    def first_name_rgb(self) -> tuple[int, int, int]:
+        return _hex_to_255_rgb(self.first_name_color, (0, 0, 0))
+
+    @property
+    def last_name_rgb(self) -> tuple[int, int, int]:
+        return _hex_to_255_rgb(self.last_name_color, (0, 0, 0))
+
+    def html_context(self) -> dict:
+        return {
+            "first_name_color": self.first_name_color,
+            "last_name_color": self.last_name_color,
+            "hide_last_name": self.hide_last_name,
+            "label_font_family": self.css_font_family,
+            "label_first_name_scale_factor": f"{self.first_name_scale / 100:.2f}",
+            "label_last_name_scale_factor": f"{self.last_name_scale / 100:.2f}",
+            "label_width_in": f"{self.width_in:.3f}",
+            "label_height_in": f"{self.height_in:.3f}",
+            "label_margin_in": f"{self.margin_in:.3f}",
+        }
+
+
+def get_label_layout(profile=None) -> LabelLayout:
+    """Return the compiled layout for ``profile``, recompiling only after settings change."""
+    global _layouts_version
+    version = get_settings_version()
+    profile_key = json.dumps(profile or {}, sort_keys=True, default=str)
+    with _layouts_lock:
+        if version != _layouts_version:
+            _layouts.clear()
+            _layouts_version = version
+        layout = _layouts.get(profile_key)
+    if layout is None:
+        layout = _compile_label_layout(profile)
+        with _layouts_lock:
+            if version == _layouts_version:
+                _layouts[profile_key] = layout
+    return layout
+
+
+def _compile_label_layout(profile=None) -> LabelLayout:
+    font_name = (get_setting("label_font", "Arial") or "Arial").strip()
+    return LabelLayout(
+        width_in=_safe_inches(_profile_setting(profile, "printnode_label_width_in", "2.440"), 2.440),
+        height_in=_safe_inches(_profile_setting(profile, "printnode_label_height_in", "1.1"), 1.1),
+        margin_in=_safe_inches(_profile_setting(profile, "printnode_label_margin_in", "0.1"), 0.1),
+        first_name_color=_safe_hex_color(get_setting("first_name_color", "#000000")),
+        last_name_color=_safe_hex_color(get_setting("last_name_color", "#000000")),
+        first_name_scale=_safe_percent_scale(get_setting("label_first_name_scale", "100")),
+        last_name_scale=_safe_percent_scale(get_setting("label_last_name_scale", "100")),
+        hide_last_name=_is_yes(get_setting("hide_last_name", "No")),
+        font_name=font_name,
+        font_file_candidates=_font_file_candidates(font_name),
+        pdf_fonts=("Times-Bold", "Times-Roman") if font_name in SERIF_LABEL_FONTS else ("Helvetica-Bold", "Helvetica"),
+        css_font_family=f'"{font_name if font_name in SYSTEM_FONT_NAMES else "Arial"}", Arial, sans-serif',
+        brother_label_media=_brother_label_media(profile=profile),
+    )
+
+
 def build_label_pdf(attendances, *, profile=None) -> bytes:
     rows = [(attendance.person.first_name, attendance.person.last_name) for attendance in attendances]
     return _build_label_pdf_from_rows(rows, profile=profile)
@@ -375,20 +564,30 @@ def build_test_label_images(kiosk_id: str, *, profile=None):
     return _build_label_images_from_rows([("TEST", f"KIOSK {kiosk_id}")], profile=profile)
 
 
-def _build_label_images_from_rows(rows, *, draw_border=False, profile=None):
+def _build_label_images_from_rows(rows, *, draw_border=False, profile=None, layout=None):
+    layout = layout or get_label_layout(profile)
     return [
-        _label_image(first_name, last_name, draw_border=draw_border, profile=profile)
+        _label_image(first_name, last_name, draw_border=draw_border, layout=layout)
         for first_name, last_name in rows
     ]
 
 
 def _build_label_raw_from_rows(rows, *, draw_border=False, profile=None) -> bytes:
-    convert, BrotherQLRaster = _load_brother_ql()
-    qlr = BrotherQLRaster(BROTHER_MODEL)
-    images = _build_label_images_from_rows(rows, draw_border=draw_border, profile=profile)
-    brother_label_media = _brother_label_media(profile=profile)
+    layout = get_label_layout(profile)
+    images = _build_label_images_from_rows(rows, draw_border=draw_border, layout=layout)
+    brother_label_media = layout.brother_label_media
     if brother_label_media == "62red":
         images = [_normalize_brother_label_colors(image) for image in images]
+    try:
+        return encode_label_raster(images, brother_label_media)
+    except BrotherRasterError as exc:
+        logger.info("Falling back to brother_ql raster conversion: %s", exc)
+    return _convert_with_brother_ql(images, brother_label_media)
+
+
+def _convert_with_brother_ql(images, brother_label_media: str) -> bytes:
+    convert, BrotherQLRaster = _load_brother_ql()
+    qlr = BrotherQLRaster(BROTHER_MODEL)
     with warnings.catch_warnings():
         warnings.filterwarnings(
             "ignore",
@@ -423,17 +622,18 @@ def _load_brother_ql():
     return convert, BrotherQLRaster
 
 
-def _label_image(first_name, last_name, *, draw_border=False, profile=None):
+def _label_image(first_name, last_name, *, draw_border=False, profile=None, layout=None):
+    layout = layout or get_label_layout(profile)
     first_text = (first_name or "").upper()
     last_text = (last_name or "").upper()
     image = Image.new("RGB", (LABEL_WIDTH_PX, LABEL_HEIGHT_PX), "white")
     draw = ImageDraw.Draw(image)
-    margin = int(_safe_inches(_profile_setting(profile, "printnode_label_margin_in", "0.1"), 0.1) * LABEL_DPI)
-    first_color = _hex_to_255_rgb(get_setting("first_name_color", "#000000"), (0, 0, 0))
-    last_color = _hex_to_255_rgb(get_setting("last_name_color", "#000000"), (0, 0, 0))
-    first_scale = _safe_percent_scale(get_setting("label_first_name_scale", "100")) / 100
-    last_scale = _safe_percent_scale(get_setting("label_last_name_scale", "100")) / 100
-    hide_last_name = _is_yes(get_setting("hide_last_name", "No"))
+    margin = layout.margin_px
+    first_color = layout.first_name_rgb
+    last_color = layout.last_name_rgb
+    first_scale = layout.first_name_scale / 100
+    last_scale = layout.last_name_scale / 100
+    font_names = layout.font_file_candidates
 
     if draw_border:
         draw.rectangle(
@@ -442,12 +642,12 @@ def _label_image(first_name, last_name, *, draw_border=False, profile=None):
             width=3,
         )
 
-    first_font = _fit_font(first_text, int(112 * first_scale), LABEL_WIDTH_PX - margin * 2, bold=True)
-    if hide_last_name:
+    first_font = _fit_font(first_text, int(112 * first_scale), LABEL_WIDTH_PX - margin * 2, font_names, bold=True)
+    if layout.hide_last_name:
         _center_text(draw, first_text, first_font, first_color, LABEL_WIDTH_PX / 2, LABEL_HEIGHT_PX / 2)
         return image
 
-    last_font = _fit_font(last_text, int(52 * last_scale), LABEL_WIDTH_PX - margin * 2, bold=False)
+    last_font = _fit_font(last_text, int(52 * last_scale), LABEL_WIDTH_PX - margin * 2, font_names, bold=False)
     _center_text(draw, first_text, first_font, first_color, LABEL_WIDTH_PX / 2, LABEL_HEIGHT_PX * 0.42)
     _center_text(draw, last_text, last_font, last_color, LABEL_WIDTH_PX / 2, LABEL_HEIGHT_PX * 0.68)
     return image
@@ -476,19 +676,19 @@ def _normalize_brother_label_colors(image):
     return normalized
 
 
-def _fit_font(text, starting_size, max_width, *, bold):
+def _fit_font(text, starting_size, max_width, font_names, *, bold):
     size = max(starting_size, 12)
     while size > 12:
-        font = _load_font(size, bold=bold)
+        font = _load_font(font_names, size, bold=bold)
         bbox = ImageDraw.Draw(Image.new("RGB", (1, 1))).textbbox((0, 0), text, font=font)
         if bbox[2] - bbox[0] <= max_width:
             return font
         size -= 4
-    return _load_font(size, bold=bold)
+    return _load_font(font_names, size, bold=bold)
 
 
-def _load_font(size, *, bold):
-    font_names = _configured_font_file_candidates()
+@lru_cache(maxsize=256)
+def _load_font(font_names, size, *, bold):
     search_dirs = (
         Path("/System/Library/Fonts/Supplemental"),
         Path("/System/Library/Fonts"),
@@ -506,8 +706,7 @@ def _load_font(size, *, bold):
     return ImageFont.load_default()
 
 
-def _configured_font_file_candidates():
-    configured_font = (get_setting("label_font", "Arial") or "Arial").strip()
+def _font_file_candidates(configured_font: str):
     selected = FONT_FILE_CANDIDATES.get(configured_font, ())
     fallback = (
         ("Arial Bold.ttf", "Arial.ttf"),
@@ -518,19 +717,18 @@ def _configured_font_file_candidates():
 
 
 def _build_label_pdf_from_rows(rows, *, hide_last_name_override=None, draw_border=False, profile=None) -> bytes:
-    width = _safe_inches(_profile_setting(profile, "printnode_label_width_in", "2.440"), 2.440) * 72
-    height = _safe_inches(_profile_setting(profile, "printnode_label_height_in", "1.1"), 1.1) * 72
-    margin = _safe_inches(_profile_setting(profile, "printnode_label_margin_in", "0.1"), 0.1) * 72
-    hide_last_name = (
-        hide_last_name_override
-        if hide_last_name_override is not None
-        else _is_yes(get_setting("hide_last_name", "No"))
-    )
-    first_color = _hex_to_rgb(get_setting("first_name_color", "#000000"), (0, 0, 0))
-    last_color = _hex_to_rgb(get_setting("last_name_color", "#000000"), (0, 0, 0))
-    first_scale = _safe_percent_scale(get_setting("label_first_name_scale", "100")) / 100
-    last_scale = _safe_percent_scale(get_setting("label_last_name_scale", "100")) / 100
-    pdf_bold_font, pdf_regular_font = _configured_pdf_font_names()
+    layout = get_label_layout(profile)
+    if hide_last_name_override is not None:
+        layout = replace(layout, hide_last_name=hide_last_name_override)
+    width = layout.width_in * 72
+    height = layout.height_in * 72
+    margin = layout.margin_in * 72
+    hide_last_name = layout.hide_last_name
+    first_color = _hex_to_rgb(layout.first_name_color, (0, 0, 0))
+    last_color = _hex_to_rgb(layout.last_name_color, (0, 0, 0))
+    first_scale = layout.first_name_scale / 100
+    last_scale = layout.last_name_scale / 100
+    pdf_bold_font, pdf_regular_font = layout.pdf_fonts
 
     objects = []
     page_refs = []
@@ -703,7 +901,13 @@ def _get_kiosk_printer_profile(kiosk_id: str, expected_backend: str, error_class
     profile_name = _get_kiosk_printer_profile_name(kiosk_id, error_class)
     if not profile_name:
         return None
+    profile = get_printer_profile(profile_name, error_class, default_backend=expected_backend)
+    if profile["backend"] != expected_backend:
+        raise error_class(f'Printer profile "{profile_name}" is for {profile["backend"]}, not {expected_backend}.')
+    return profile
 
+
+def get_printer_profiles(error_class=ServerPrinterError) -> dict:
     raw_profiles = get_setting("printer_profiles", "{}") or "{}"
     try:
         profiles = json.loads(raw_profiles)
@@ -711,17 +915,18 @@ def _get_kiosk_printer_profile(kiosk_id: str, expected_backend: str, error_class
         raise error_class("Printer profiles setting is not valid JSON.") from exc
     if not isinstance(profiles, dict):
         raise error_class("Printer profiles setting must be a JSON object.")
+    return profiles
+
 
-    profile = profiles.get(profile_name)
+def get_printer_profile(profile_name: str, error_class=ServerPrinterError, *, default_backend: str = "server") -> dict:
+    profile = get_printer_profiles(error_class).get(profile_name)
     if not isinstance(profile, dict):
         raise error_class(f'Printer profile "{profile_name}" is not configured.')
 
-    backend = str(profile.get("backend", expected_backend)).strip().lower()
+    backend = str(profile.get("backend", default_backend)).strip().lower()
     if backend and backend not in PRINTER_PROFILE_BACKENDS:
         raise error_class(f'Printer profile "{profile_name}" has an unsupported backend "{backend}".')
-    if backend != expected_backend:
-        raise error_class(f'Printer profile "{profile_name}" is for {backend}, not {expected_backend}.')
-    return {"name": profile_name, **profile}
+    return {"name": profile_name, **profile, "backend": backend}
 
 
 def _get_kiosk_printer_profile_name(kiosk_id: str, error_class) -> str:
@@ -737,12 +942,19 @@ def _get_kiosk_printer_profile_name(kiosk_id: str, error_class) -> str:
 
 def _profile_server_printer_config(profile: dict):
     if "target" in profile:
-        return profile.get("target")
-    if profile.get("queue"):
-        return {"queue": profile.get("queue")}
-    if profile.get("host"):
+        printer_config = profile.get("target")
+    elif profile.get("queue"):
+        printer_config = {"queue": profile.get("queue")}
+    elif profile.get("host"):
         return {"host": profile.get("host"), "port": profile.get("port", 9100)}
-    return None
+    else:
+        return None
+    # A profile-level "transport" picks how a queue target is reached (lp or IPP).
+    if profile.get("transport") and isinstance(printer_config, str) and printer_config.startswith("queue:"):
+        printer_config = {"queue": printer_config.removeprefix("queue:")}
+    if profile.get("transport") and isinstance(printer_config, dict) and printer_config.get("queue"):
+        printer_config = {**printer_config, "transport": profile.get("transport")}
+    return printer_config
 
 
 def _profile_setting(profile: dict | None, key: str, default: str) -> str:
@@ -751,6 +963,7 @@ def _profile_setting(profile: dict | None, key: str, default: str) -> str:
         "printnode_label_height_in": ("printnode_label_height_in", "label_height_in", "height_in"),
         "printnode_label_margin_in": ("printnode_label_margin_in", "label_margin_in", "margin_in"),
         "brother_label_media": ("brother_label_media", "media"),
+        "print_coalesce_window_ms": ("print_coalesce_window_ms", "coalesce_window_ms"),
     }
     for profile_key in aliases.get(key, (key,)):
         if profile and profile.get(profile_key) not in (None, ""):
@@ -762,6 +975,11 @@ def _parse_server_printer_config(printer_config, kiosk_id: str) -> dict:
     if isinstance(printer_config, dict):
         queue_name = str(printer_config.get("queue", "")).strip()
         if queue_name:
+            transport = str(printer_config.get("transport") or "lp").strip().lower()
+            if transport not in QUEUE_TRANSPORTS:
+                raise ServerPrinterError(f'Server printer queue for kiosk "{kiosk_id}" has an unsupported transport "{transport}".')
+            if transport == "ipp":
+                return {"kind": "ipp", "uri": f"{_cups_ipp_url()}/printers/{quote(queue_name)}", "queue": queue_name}
             return {"kind": "queue", "queue": queue_name}
         host = str(printer_config.get("host", "")).strip()
         port_value = printer_config.get("port", 9100)
@@ -772,6 +990,12 @@ def _parse_server_printer_config(printer_config, kiosk_id: str) -> dict:
             if not queue_name:
                 raise ServerPrinterError(f'Server printer queue for kiosk "{kiosk_id}" cannot be blank.')
             return {"kind": "queue", "queue": queue_name}
+        if raw_value.startswith(("ipp://", "ipps://")):
+            try:
+                parse_ipp_uri(raw_value)
+            except ValueError as exc:
+                raise ServerPrinterError(f'Server printer IPP address for kiosk "{kiosk_id}" is not valid.') from exc
+            return {"kind": "ipp", "uri": raw_value}
         if ":" in raw_value:
             host, port_value = raw_value.rsplit(":", 1)
             host = host.strip()
@@ -788,6 +1012,10 @@ def _parse_server_printer_config(printer_config, kiosk_id: str) -> dict:
     return {"kind": "raw", "host": host, "port": port}
 
 
+def _cups_ipp_url() -> str:
+    return str(getattr(settings, "CUPS_IPP_URL", "ipp://localhost:631")).rstrip("/")
+
+
 def _parse_lp_job_id(output: str) -> str:
     match = re.search(r"request id is ([^\s]+)", output or "")
     if not match:
@@ -795,33 +1023,26 @@ def _parse_lp_job_id(output: str) -> str:
     return f"queue:{match.group(1)}"
 
 
-def _configured_pdf_font_names() -> tuple[str, str]:
-    configured_font = (get_setting("label_font", "Arial") or "Arial").strip()
-    if configured_font in {"Georgia", "Times New Roman", "Merriweather", "Playfair Display", "Noto Serif"}:
-        return "Times-Bold", "Times-Roman"
-    return "Helvetica-Bold", "Helvetica"
+def _validate_raw_brother_status(host: str, *, timeout: int) -> None:
+    from .printer_monitor import get_printer_status
 
-
-def _validate_raw_brother_status(host: str, *, timeout: int, after_send: bool = False) -> None:
-    status = _fetch_brother_web_status(host, timeout=timeout)
-    if not status:
+    status = get_printer_status(host, timeout=timeout)
+    if not status.reachable:
         return
-    device_status = status.get("device_status", "").lower()
-    media_status = status.get("media_status", "").lower()
-    accepted_statuses = {"ready", "printing"} if after_send else {"ready"}
-    if device_status and device_status not in accepted_statuses:
-        prefix = "rejected the print job" if after_send else "is not ready"
+    if status.device_status and status.device_status.lower() != "ready":
         raise ServerPrinterError(
-            f'Brother printer at {host} {prefix}. Current status: {status.get("device_status")}. Check the printer LCD for details.'
+            f"Brother printer at {host} is not ready. Current status: {status.device_status}. Check the printer LCD for details."
         )
-    if media_status == "empty":
+    if status.media_status.lower() == "empty":
         raise ServerPrinterError(
             f'Brother printer at {host} reports empty media. Load a label roll, then try again.'
         )
 
 
 def _fetch_brother_web_status(host: str, *, timeout: int) -> dict:
-    request = urllib.request.Request(f"http://{host}/", headers={"User-Agent": "Welcome System"})
+    port = int(getattr(settings, "BROTHER_STATUS_PORT", 80))
+    address = host if port == 80 else f"{host}:{port}"
+    request = urllib.request.Request(f"http://{address}/", headers={"User-Agent": "Welcome System"})
     try:
         with urllib.request.urlopen(request, timeout=timeout) as response:
             body = response.read(20000).decode("utf-8", errors="replace")
@@ -859,6 +1080,11 @@ def _is_yes(value: str) -> bool:
     return str(value or "").strip().lower() in {"yes", "true", "1"}
 
 
+def _safe_hex_color(value: str, default: str = "#000000") -> str:
+    value = (value or "").strip()
+    return value if re.match(r"^#[0-9a-fA-F]{6}$", value) else default
+
+
 def _hex_to_rgb(value: str, default):
     if not value or not re.match(r"^#[0-9a-fA-F]{6}$", value):
         return default
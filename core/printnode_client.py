@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+import base64
+import http.client
+import json
+import select
+import threading
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+
+# Errors that mean a kept-alive connection was closed by the server while idle.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+# Only these are sent again after the connection drops once the request is out; a
+# repeated POST /printjobs would print a second label.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class ResponseLostError(http.client.HTTPException):
+    """The request was sent but the connection closed before a response, so PrintNode may have acted on it."""
+
+
+@dataclass(frozen=True)
+class PrintNodeResponse:
+    status: int
+    reason: str
+    body: str
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+class PrintNodeClient:
+    """Small PrintNode API client that keeps one HTTP connection open per worker thread."""
+
+    def __init__(self, base_url: str, *, connect_timeout: float, read_timeout: float):
+        parts = urlsplit(base_url)
+        if parts.scheme not in {"http", "https"} or not parts.hostname:
+            raise ValueError(f'PrintNode API URL "{base_url}" is not a valid http(s) URL.')
+        self.base_url = base_url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, *, api_key: str, payload=None) -> PrintNodeResponse:
+        """Send one API request; transport failures raise OSError or http.client.HTTPException."""
+        auth = base64.b64encode(f"{api_key}:".encode("utf-8")).decode("ascii")
+        headers = {"Authorization": f"Basic {auth}", "Accept": "application/json"}
+        body = None
+        if payload is not None:
+            body = json.dumps(payload).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        for first_try in (True, False):
+            connection, reused = self._connection()
+            may_resend = reused and first_try
+            try:
+                try:
+                    connection.request(method, f"{self.base_path}{path}", body=body, headers=headers)
+                except BrokenPipeError:
+                    # Nothing reached the server, so even a POST can go again on a new connection.
+                    if not may_resend:
+                        raise
+                    self.close()
+                    continue
+                try:
+                    return self._read_response(connection)
+                except STALE_CONNECTION_ERRORS as exc:
+                    if method not in IDEMPOTENT_METHODS:
+                        raise ResponseLostError(f"The connection closed before PrintNode answered the {method} request: {exc}") from exc
+                    if not may_resend:
+                        raise
+                    self.close()
+            except (OSError, http.client.HTTPException):
+                self.close()
+                raise
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            connection.close()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and connection.sock is not None:
+            # An idle keep-alive socket has nothing to read unless the server closed it.
+            if not select.select([connection.sock], [], [], 0)[0]:
+                return connection, True
+            self.close()
+        connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(self.host, self.port, timeout=self.connect_timeout)
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)
+        self._local.connection = connection
+        return connection, False
+
+    def _read_response(self, connection) -> PrintNodeResponse:
+        response = connection.getresponse()
+        response_body = response.read().decode("utf-8", errors="replace").strip()
+        if response.will_close:
+            self.close()
+        return PrintNodeResponse(status=response.status, reason=response.reason, body=response_body)
+
+
+def get_printnode_client() -> PrintNodeClient:
+    global _client
+    base_url = getattr(settings, "PRINTNODE_API_BASE_URL", "https://api.printnode.com")
+    connect_timeout = float(getattr(settings, "PRINTNODE_CONNECT_TIMEOUT_SECONDS", 5))
+    read_timeout = float(getattr(settings, "PRINTNODE_READ_TIMEOUT_SECONDS", 15))
+    with _client_lock:
+        if _client is None or (_client.base_url, _client.connect_timeout, _client.read_timeout) != (
+            base_url,
+            connect_timeout,
+            read_timeout,
+        ):
+            _client = PrintNodeClient(base_url, connect_timeout=connect_timeout, read_timeout=read_timeout)
+        return _client
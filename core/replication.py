@@ -0,0 +1,529 @@
+"""Continuous replication of the SQLite database by shipping WAL frames.
+
+The database runs in WAL mode with automatic checkpoints turned off, and a
+replicator in the web server holds it open. Every few seconds it takes the
+write lock just long enough to read the newly committed WAL frames, then
+compresses them into a segment in the replica directory with the lock
+released. Once every frame is on the replica it checkpoints the WAL itself.
+Because only the replicator checkpoints, the WAL never restarts over frames
+that have not been shipped. If something else does checkpoint it, the
+replicator notices the break and starts a new generation from a fresh
+snapshot. Snapshots are copied with SQLite's backup API inside a read
+transaction, so writers carry on while one is taken.
+
+Replica layout::
+
+    <replica dir>/<generation>/meta.json
+    <replica dir>/<generation>/snapshots/<segment>-<unix ms>.sqlite3.gz
+    <replica dir>/<generation>/segments/<segment>-<unix ms>.wal.gz
+
+A snapshot named ``N`` holds the database before segment ``N``. Snapshots are
+periodically rebuilt (compacted) from the previous snapshot plus its segments
+without touching the live database. Restoring to a point in time replays the
+newest snapshot before that time and the segments after it.
+"""
+
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+import gzip
+import json
+import logging
+import os
+from pathlib import Path
+import secrets
+import shutil
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+WAL_HEADER_SIZE = 32
+WAL_FRAME_HEADER_SIZE = 24
+WAL_MAGIC = (0x377F0682, 0x377F0683)
+SNAPSHOT_SUFFIX = ".sqlite3.gz"
+SEGMENT_SUFFIX = ".wal.gz"
+COPY_CHUNK_BYTES = 1024 * 1024
+# After a failed sync the replicator waits twice as long each time, up to this many seconds.
+MAX_RETRY_DELAY_SECONDS = 300
+
+_replicator = None
+_replicator_lock = threading.Lock()
+
+
+class ReplicationError(Exception):
+    """Raised when a replica cannot be written or restored."""
+
+
+class _WalRestarted(Exception):
+    """The WAL restarted over frames the replicator did not checkpoint itself."""
+
+
+@dataclass(frozen=True)
+class ReplicaFile:
+    path: Path
+    segment: int
+    created_at: datetime
+
+
+class Replicator:
+    """Ships committed WAL frames from one SQLite database to a replica directory."""
+
+    def __init__(self, database_path, replica_dir, *, checkpoint_frames: int = 1000, lock_timeout: float = 0.5):
+        self.database_path = Path(database_path)
+        self.wal_path = Path(f"{database_path}-wal")
+        self.replica_dir = Path(replica_dir)
+        self.checkpoint_frames = checkpoint_frames
+        self.lock_timeout = lock_timeout
+        self.generation = None
+        self.last_synced_at = None
+        self._connection = None
+        self._checkpointer = None
+        self._page_size = 0
+        self._salts = None
+        self._checkpointed_salts = None
+        self._checksum = (0, 0)
+        self._frames_shipped = 0
+        self._next_segment = 0
+        self._checkpoint_due = False
+
+    def open(self) -> "Replicator":
+        # Holding a connection open keeps SQLite from checkpointing and deleting
+        # the WAL when the last application connection closes.
+        self._connection = sqlite3.connect(self.database_path, timeout=self.lock_timeout, isolation_level=None)
+        mode = self._connection.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        if str(mode).lower() != "wal":
+            self.close()
+            raise ReplicationError(f"Could not switch {self.database_path.name} to WAL mode.")
+        self._connection.execute("PRAGMA wal_autocheckpoint=0")
+        self._checkpointer = sqlite3.connect(self.database_path, timeout=self.lock_timeout, isolation_level=None)
+        self._checkpointer.execute("PRAGMA wal_autocheckpoint=0")
+        return self
+
+    def close(self) -> None:
+        for connection in (self._checkpointer, self._connection):
+            if connection is not None:
+                connection.close()
+        self._connection = self._checkpointer = None
+
+    def sync(self, now=None) -> int:
+        """Ship newly committed frames. Returns the number of frames shipped, or -1 if the database was busy."""
+        now = now or timezone.now()
+        if self.generation is None and not self._start_generation(now):
+            return -1
+        try:
+            shipped = self._ship_frames(now)
+        except _WalRestarted:
+            logger.warning("The database WAL was checkpointed outside replication; starting a new replica generation.")
+            if not self._start_generation(now):
+                return -1
+            shipped = self._ship_frames(now)
+        if shipped < 0:
+            return -1
+        if self._checkpoint_due or self._frames_shipped >= self.checkpoint_frames:
+            self._checkpoint()
+        self.last_synced_at = now
+        return shipped
+
+    def compact(self, now=None, *, interval: timedelta = timedelta(hours=24)) -> Path | None:
+        """Write a new snapshot from the latest one plus its segments once it is older than ``interval``."""
+        now = now or timezone.now()
+        if self.generation is None:
+            return None
+        snapshot = latest_snapshot(self.generation)
+        segments = [segment for segment in list_segments(self.generation) if segment.segment >= snapshot.segment]
+        if not segments or now - snapshot.created_at < interval:
+            return None
+        with _scratch_copy(snapshot.path, self.replica_dir) as scratch:
+            page_size = _generation_page_size(self.generation)
+            for segment in segments:
+                _apply_segment(scratch, segment.path, page_size)
+            return _write_gzip(scratch, self.generation / "snapshots" / _file_name(segments[-1].segment + 1, segments[-1].created_at, SNAPSHOT_SUFFIX))
+
+    def prune(self, now=None, *, retention: timedelta = timedelta(days=7)) -> int:
+        """Delete replica files no longer needed to restore any point within ``retention``."""
+        cutoff = (now or timezone.now()) - retention
+        removed = 0
+        for generation in list_generations(self.replica_dir):
+            if generation == self.generation:
+                continue
+            files = list_snapshots(generation) + list_segments(generation)
+            if not files or max(item.created_at for item in files) < cutoff:
+                shutil.rmtree(generation, ignore_errors=True)
+                removed += 1
+        if self.generation is None:
+            return removed
+        # Keep the newest snapshot from before the cutoff as the base for restoring to the cutoff.
+        snapshots = list_snapshots(self.generation)
+        base = next((snapshot for snapshot in reversed(snapshots) if snapshot.created_at <= cutoff), snapshots[0])
+        for item in snapshots + list_segments(self.generation):
+            if item.segment < base.segment:
+                item.path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    @contextmanager
+    def _write_lock(self):
+        # While it is held no frame can be committed, and only the replicator checkpoints.
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        finally:
+            self._connection.execute("ROLLBACK")
+
+    def _start_generation(self, now) -> bool:
+        """Snapshot the database into a new generation. Returns False if the database was busy."""
+        # The checkpointer holds the write lock only while a read transaction opens
+        # and the WAL position is noted. The snapshot is then read inside that
+        # transaction, which lets writers carry on and stops any checkpoint past it.
+        try:
+            self._checkpointer.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            return False
+        try:
+            self._connection.execute("BEGIN")
+            self._connection.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            position = _committed_wal_position(self.wal_path)
+        except BaseException:
+            if self._connection.in_transaction:
+                self._connection.execute("ROLLBACK")
+            raise
+        finally:
+            self._checkpointer.execute("ROLLBACK")
+        name = f"{int(now.timestamp() * 1000):013d}-{secrets.token_hex(3)}"
+        generation = self.replica_dir / name
+        handle, scratch_name = tempfile.mkstemp(dir=self.database_path.parent, prefix=".replica-", suffix=".partial")
+        os.close(handle)
+        scratch = Path(scratch_name)
+        try:
+            try:
+                page_size = self._connection.execute("PRAGMA page_size").fetchone()[0]
+                with closing(sqlite3.connect(scratch)) as target:
+                    self._connection.backup(target)
+            finally:
+                self._connection.execute("ROLLBACK")
+            (generation / "snapshots").mkdir(parents=True)
+            (generation / "segments").mkdir()
+            (generation / "meta.json").write_text(
+                json.dumps({"database": self.database_path.name, "page_size": page_size, "created_at": now.isoformat()})
+            )
+            _write_gzip(scratch, generation / "snapshots" / _file_name(0, now, SNAPSHOT_SUFFIX))
+        except BaseException:
+            shutil.rmtree(generation, ignore_errors=True)
+            raise
+        finally:
+            scratch.unlink(missing_ok=True)
+        self.generation = generation
+        self._page_size = page_size
+        # Frames committed before the snapshot are already in it.
+        self._salts, self._checksum, self._frames_shipped = position or (None, (0, 0), 0)
+        self._checkpointed_salts = None
+        self._next_segment = 0
+        self._checkpoint_due = True
+        return True
+
+    def _ship_frames(self, now) -> int:
+        try:
+            with self._write_lock():
+                pending = self._read_new_frames()
+        except sqlite3.OperationalError:
+            return -1
+        if pending is None:
+            return 0
+        # Compressing and syncing to the replica drive happen without the write lock.
+        data, checksum = pending
+        segment_path = self.generation / "segments" / _file_name(self._next_segment, now, SEGMENT_SUFFIX)
+        _write_gzip_bytes(data, segment_path)
+        shipped = len(data) // (WAL_FRAME_HEADER_SIZE + self._page_size)
+        self._next_segment += 1
+        self._frames_shipped += shipped
+        self._checksum = checksum
+        return shipped
+
+    def _read_new_frames(self) -> tuple[bytes, tuple[int, int]] | None:
+        """The committed frames after the last shipped one and the checksum at their end, or None."""
+        header = _read_wal_header(self.wal_path)
+        if header is None:
+            if self._salts is not None and self._salts != self._checkpointed_salts:
+                raise _WalRestarted()
+            return None
+        page_size, salts, checksum, big_endian = header
+        if salts != self._salts:
+            # A new WAL run continues this generation only if it directly follows
+            # a run the replicator shipped and checkpointed in full. SQLite adds
+            # one to salt-1 on every restart, so a skipped run shows up here.
+            if self._salts is not None and (
+                self._salts != self._checkpointed_salts or salts[0] != (self._salts[0] + 1) & 0xFFFFFFFF
+            ):
+                raise _WalRestarted()
+            if page_size != self._page_size:
+                raise _WalRestarted()
+            self._salts = salts
+            self._checksum = checksum
+            self._frames_shipped = 0
+        frame_size = WAL_FRAME_HEADER_SIZE + page_size
+        with self.wal_path.open("rb") as wal:
+            wal.seek(WAL_HEADER_SIZE + self._frames_shipped * frame_size)
+            data = wal.read()
+        committed_end, committed_checksum = _committed_frames(data, frame_size, salts, self._checksum, big_endian)
+        if not committed_end:
+            return None
+        return data[:committed_end], committed_checksum
+
+    def _checkpoint(self) -> None:
+        # Under the write lock, so no frame can be committed between checking
+        # that everything is shipped and checkpointing.
+        try:
+            with self._write_lock():
+                if self._read_new_frames() is not None:
+                    return
+                _busy, log_frames, checkpointed = self._checkpointer.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        except (sqlite3.OperationalError, _WalRestarted):
+            # Busy, or the WAL broke; the next sync ships or starts over first.
+            return
+        if log_frames == checkpointed == self._frames_shipped:
+            self._checkpointed_salts = self._salts
+            self._checkpoint_due = False
+
+
+def restore_replica(replica_dir, output_path, *, at=None) -> datetime:
+    """Rebuild the database as of ``at`` (default: the latest shipped state) into ``output_path``."""
+    generations = list_generations(Path(replica_dir))
+    candidates = [generation for generation in generations if list_snapshots(generation)]
+    if at is not None:
+        candidates = [generation for generation in candidates if list_snapshots(generation)[0].created_at <= at]
+    if not candidates:
+        raise ReplicationError("The replica has nothing to restore from before that time.")
+    generation = candidates[-1]
+    snapshots = [snapshot for snapshot in list_snapshots(generation) if at is None or snapshot.created_at <= at]
+    snapshot = snapshots[-1]
+    output_path = Path(output_path)
+    with gzip.open(snapshot.path, "rb") as source, output_path.open("wb") as output:
+        shutil.copyfileobj(source, output, COPY_CHUNK_BYTES)
+    restored_at = snapshot.created_at
+    expected = snapshot.segment
+    page_size = _generation_page_size(generation)
+    for segment in list_segments(generation):
+        if segment.segment < expected:
+            continue
+        if segment.segment != expected or (at is not None and segment.created_at > at):
+            break
+        _apply_segment(output_path, segment.path, page_size)
+        restored_at = segment.created_at
+        expected += 1
+    return restored_at
+
+
+def list_generations(replica_dir: Path) -> list[Path]:
+    if not replica_dir.is_dir():
+        return []
+    return sorted(path for path in replica_dir.iterdir() if (path / "meta.json").is_file())
+
+
+def list_snapshots(generation: Path) -> list[ReplicaFile]:
+    return _list_replica_files(generation / "snapshots", SNAPSHOT_SUFFIX)
+
+
+def list_segments(generation: Path) -> list[ReplicaFile]:
+    return _list_replica_files(generation / "segments", SEGMENT_SUFFIX)
+
+
+def latest_snapshot(generation: Path) -> ReplicaFile:
+    return list_snapshots(generation)[-1]
+
+
+def replication_enabled() -> bool:
+    return bool(getattr(settings, "DATABASE_REPLICA_DIR", ""))
+
+
+def configure_replicated_connection(connection) -> None:
+    """Turn off automatic checkpoints on an application connection; the replicator checkpoints."""
+    if replication_enabled() and connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA wal_autocheckpoint=0")
+
+
+def ensure_replication_started() -> None:
+    global _replicator
+    if not replication_enabled():
+        return
+    with _replicator_lock:
+        if _replicator is not None:
+            return
+        from .backups import get_database_path
+
+        _replicator = Replicator(get_database_path(), settings.DATABASE_REPLICA_DIR)
+        threading.Thread(target=_replication_loop, args=(_replicator,), name="database-replication", daemon=True).start()
+
+
+def _replication_loop(replicator: Replicator) -> None:
+    interval = max(float(getattr(settings, "DATABASE_REPLICA_INTERVAL_SECONDS", 1)), 0.1)
+    snapshot_interval = timedelta(hours=float(getattr(settings, "DATABASE_REPLICA_SNAPSHOT_HOURS", 24)))
+    retention = timedelta(days=float(getattr(settings, "DATABASE_REPLICA_RETENTION_DAYS", 7)))
+    failures = 0
+    while True:
+        try:
+            if replicator._connection is None:
+                replicator.open()
+            replicator.sync()
+            if replicator.compact(interval=snapshot_interval):
+                replicator.prune(retention=retention)
+            failures = 0
+        except OSError:
+            # The replica drive failed. The database connection stays open, so no
+            # frame can be checkpointed away, and the next try carries on from the
+            # last file that was written.
+            failures += 1
+            logger.exception("Could not write the database replica; retrying.")
+        except Exception:
+            failures += 1
+            logger.exception("Database replication failed; retrying.")
+            replicator.close()
+            # Frames may have been missed while closed, so start over with a new generation.
+            replicator.generation = None
+        time.sleep(min(interval * 2**failures, MAX_RETRY_DELAY_SECONDS) if failures else interval)
+
+
+def _read_wal_header(wal_path: Path):
+    try:
+        with wal_path.open("rb") as wal:
+            header = wal.read(WAL_HEADER_SIZE)
+    except FileNotFoundError:
+        return None
+    if len(header) < WAL_HEADER_SIZE:
+        return None
+    magic, _version, page_size, _sequence, salt1, salt2, checksum1, checksum2 = struct.unpack(">8I", header)
+    if magic not in WAL_MAGIC:
+        return None
+    big_endian = magic & 1 == 1
+    if _wal_checksum(header[:24], (0, 0), big_endian) != (checksum1, checksum2):
+        return None
+    return (page_size or 65536), (salt1, salt2), (checksum1, checksum2), big_endian
+
+
+def _committed_frames(data: bytes, frame_size: int, salts, checksum, big_endian: bool) -> tuple[int, tuple[int, int]]:
+    """Byte length of the frames in ``data`` up to the last valid commit frame, and the checksum there."""
+    committed_end, committed_checksum = 0, checksum
+    running = checksum
+    for offset in range(0, len(data) - frame_size + 1, frame_size):
+        frame = data[offset : offset + frame_size]
+        if struct.unpack(">II", frame[8:16]) != salts:
+            break
+        running = _wal_checksum(frame[:8] + frame[WAL_FRAME_HEADER_SIZE:], running, big_endian)
+        if running != struct.unpack(">II", frame[16:24]):
+            break
+        if struct.unpack(">I", frame[4:8])[0]:
+            committed_end, committed_checksum = offset + frame_size, running
+    return committed_end, committed_checksum
+
+
+def _committed_wal_position(wal_path: Path):
+    """The salts, checksum and frame count at the end of the WAL's committed frames, or None if it has none."""
+    header = _read_wal_header(wal_path)
+    if header is None:
+        return None
+    page_size, salts, checksum, big_endian = header
+    frame_size = WAL_FRAME_HEADER_SIZE + page_size
+    with wal_path.open("rb") as wal:
+        wal.seek(WAL_HEADER_SIZE)
+        data = wal.read()
+    committed_end, committed_checksum = _committed_frames(data, frame_size, salts, checksum, big_endian)
+    return salts, committed_checksum, committed_end // frame_size
+
+
+def _wal_checksum(data: bytes, checksum: tuple[int, int], big_endian: bool) -> tuple[int, int]:
+    # SQLite's WAL checksum: a Fibonacci-weighted sum over pairs of 32-bit words.
+    words = struct.unpack(f"{'>' if big_endian else '<'}{len(data) // 4}I", data)
+    s0, s1 = checksum
+    for index in range(0, len(words), 2):
+        s0 = (s0 + words[index] + s1) & 0xFFFFFFFF
+        s1 = (s1 + words[index + 1] + s0) & 0xFFFFFFFF
+    return s0, s1
+
+
+def _apply_segment(database_path: Path, segment_path: Path, page_size: int) -> None:
+    # The same work as a checkpoint: write each frame's page in place and cut
+    # the file to the database size recorded on commit frames.
+    frame_size = WAL_FRAME_HEADER_SIZE + page_size
+    with gzip.open(segment_path, "rb") as segment, database_path.open("r+b") as database:
+        while frame := segment.read(frame_size):
+            if len(frame) < frame_size:
+                raise ReplicationError(f"Replica segment {segment_path.name} is truncated.")
+            page_number, database_pages = struct.unpack(">II", frame[:8])
+            database.seek((page_number - 1) * page_size)
+            database.write(frame[WAL_FRAME_HEADER_SIZE:])
+            if database_pages:
+                database.truncate(database_pages * page_size)
+
+
+def _list_replica_files(directory: Path, suffix: str) -> list[ReplicaFile]:
+    if not directory.is_dir():
+        return []
+    files = []
+    for path in directory.iterdir():
+        if not path.name.endswith(suffix):
+            continue
+        segment, _separator, milliseconds = path.name.removesuffix(suffix).partition("-")
+        if segment.isdigit() and milliseconds.isdigit():
+            created_at = datetime.fromtimestamp(int(milliseconds) / 1000, tz=dt_timezone.utc)
+            files.append(ReplicaFile(path=path, segment=int(segment), created_at=created_at))
+    return sorted(files, key=lambda item: (item.segment, item.created_at))
+
+
+def _generation_page_size(generation: Path) -> int:
+    return int(json.loads((generation / "meta.json").read_text())["page_size"])
+
+
+def _file_name(segment: int, created_at, suffix: str) -> str:
+    return f"{segment:08d}-{int(created_at.timestamp() * 1000):013d}{suffix}"
+
+
+def _write_gzip(source_path: Path, target_path: Path) -> Path:
+    partial_path = target_path.with_name(target_path.name + ".partial")
+    try:
+        with source_path.open("rb") as source, partial_path.open("wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as output:
+                shutil.copyfileobj(source, output, COPY_CHUNK_BYTES)
+            _sync(raw)
+        partial_path.replace(target_path)
+    finally:
+        partial_path.unlink(missing_ok=True)
+    return target_path
+
+
+def _write_gzip_bytes(data: bytes, target_path: Path) -> Path:
+    partial_path = target_path.with_name(target_path.name + ".partial")
+    try:
+        with partial_path.open("wb") as raw:
+            raw.write(gzip.compress(data, compresslevel=6))
+            _sync(raw)
+        partial_path.replace(target_path)
+    finally:
+        partial_path.unlink(missing_ok=True)
+    return target_path
+
+
+def _sync(handle) -> None:
+    # Replicas often live on removable drives; make each file durable before it is named.
+    handle.flush()
+    os.fsync(handle.fileno())
+
+
+@contextmanager
+def _scratch_copy(snapshot_path: Path, directory: Path):
+    # Compaction works on a decompressed copy inside the replica directory.
+    handle, name = tempfile.mkstemp(dir=directory, prefix=".compact-", suffix=".partial")
+    path = Path(name)
+    try:
+        with gzip.open(snapshot_path, "rb") as source, open(handle, "wb") as output:
+            shutil.copyfileobj(source, output, COPY_CHUNK_BYTES)
+        yield path
+    finally:
+        path.unlink(missing_ok=True)
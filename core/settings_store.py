@@ -1,7 +1,12 @@
+import threading
+
+from django.db import connection, transaction
+from django.db.models import F
 from django.db.utils import OperationalError, ProgrammingError
 from django.contrib.auth.models import Group
+from django.utils import timezone
 
-from .models import SystemSetting
+from .models import SettingsVersion, SystemSetting
 
 
 DEFAULT_SETTINGS = {
@@ -33,6 +38,7 @@ DEFAULT_SETTINGS = {
     "printnode_printer_map": "{}",
     "server_printer_map": "{}",
     "server_printer_timeout_seconds": "10",
+    "print_coalesce_window_ms": "0",
     "admin_skin": "default",
 }
 
@@ -65,9 +71,17 @@ DEFAULT_SETTING_DESCRIPTIONS = {
     "printnode_printer_map": 'JSON object mapping kiosk ids to PrintNode printer ids, e.g. {"kiosk1": "123456"}.',
     "server_printer_map": 'JSON object mapping kiosk ids to server printer queues or network printer addresses, e.g. {"kiosk1": "queue:Brother_QL_820NWB"}.',
     "server_printer_timeout_seconds": "Connection timeout for server-side network printer jobs.",
+    "print_coalesce_window_ms": "Milliseconds to wait for more check-ins from the same kiosk before sending one combined PrintNode or server label job. 0 turns coalescing off.",
     "admin_skin": "Jazzmin/Bootswatch skin used in the admin area.",
 }
 
+# The settings version is kept in memory until a setting is saved. The app runs
+# as one Waitress process, so the save signal reaches every reader. A version
+# read inside a transaction is never kept, as the transaction may still roll back.
+_version_lock = threading.Lock()
+_version_generation = 0
+_cached_version = None
+
 
 def ensure_default_settings() -> None:
     try:
@@ -94,3 +108,39 @@ def get_setting(key: str, default: str = "") -> str:
     if setting and setting.value is not None:
         return setting.value
     return DEFAULT_SETTINGS.get(key, default)
+
+
+def get_settings_version() -> tuple[int, object]:
+    """Return a stamp that changes whenever a system setting is saved or deleted.
+
+    The timestamp is part of the stamp so a rolled-back change can never be
+    confused with a later change that reaches the same counter value.
+    """
+    global _cached_version
+    with _version_lock:
+        if _cached_version is not None:
+            return _cached_version
+        generation = _version_generation
+    version = SettingsVersion.objects.filter(pk=1).values_list("version", "updated_at").first() or (0, None)
+    if not connection.in_atomic_block:
+        with _version_lock:
+            if generation == _version_generation:
+                _cached_version = version
+    return version
+
+
+def forget_settings_version() -> None:
+    """Make the next ``get_settings_version`` call read the version from the database."""
+    global _cached_version, _version_generation
+    with _version_lock:
+        _cached_version = None
+        _version_generation += 1
+
+
+def bump_settings_version() -> None:
+    updated = SettingsVersion.objects.filter(pk=1).update(version=F("version") + 1, updated_at=timezone.now())
+    if not updated:
+        SettingsVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+    # Readers may still see the old version until the change commits, so forget it again then.
+    forget_settings_version()
+    transaction.on_commit(forget_settings_version)
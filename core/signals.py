@@ -1,11 +1,16 @@
 from datetime import date
 
+from django.contrib.auth.models import Group, User
 from django.contrib.auth.signals import user_logged_in
-from django.db.models.signals import post_migrate
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
 from django.dispatch import receiver
 
-from .models import Service
-from .settings_store import ensure_default_groups, ensure_default_settings
+from .models import Person, Service, SystemSetting
+from .permissions import forget_roles, invalidate_roles
+from .photos import ensure_person_thumbnails
+from .replication import configure_replicated_connection
+from .settings_store import bump_settings_version, ensure_default_groups, ensure_default_settings
 
 
 def _service_label(service_date: date) -> str:
@@ -25,6 +30,42 @@ def ensure_sabbath_service(sender, user, request, **kwargs):
     )
 
 
+@receiver(post_save, sender=SystemSetting)
+@receiver(post_delete, sender=SystemSetting)
+def publish_settings_change(sender, **kwargs):
+    bump_settings_version()
+
+
+@receiver(post_save, sender=Person)
+def make_photo_thumbnails(sender, instance, update_fields=None, **kwargs):
+    if instance.photo and (update_fields is None or "photo" in update_fields):
+        ensure_person_thumbnails(instance)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def expire_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if not reverse:
+        forget_roles(instance)
+        invalidate_roles([instance.pk])
+    elif action == "post_clear":
+        invalidate_roles()
+    else:
+        invalidate_roles(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def expire_roles_on_group_change(sender, **kwargs):
+    invalidate_roles()
+
+
+@receiver(connection_created)
+def disable_autocheckpoint_for_replication(sender, connection, **kwargs):
+    configure_replicated_connection(connection)
+
+
 @receiver(post_migrate)
 def bootstrap_defaults_after_migrate(sender, app_config=None, **kwargs):
     # Seed defaults only after migrations, to avoid DB access during app startup.
@@ -0,0 +1,117 @@
+from datetime import date, datetime
+from io import BytesIO
+import json
+import time
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.utils import timezone
+
+from core.attendance_import import (
+    NDJSON_FORMAT,
+    AttendanceImportError,
+    import_attendance_file,
+)
+from core.models import Attendance, AuditLog, Person, Service
+
+
+class AttendanceImportTests(TestCase):
+    def setUp(self):
+        self.jane = Person.objects.create(first_name="Jane", last_name="Example", email="jane@example.com")
+        self.john = Person.objects.create(first_name="John", last_name="Example", phone="555-123-4567")
+
+    def test_csv_matches_people_and_services_and_keeps_history_times(self):
+        existing = Service.objects.create(date=date(2019, 4, 13), label="Sabbath Service 04-13-2019", status=Service.CLOSED)
+        Attendance.objects.create(person=self.jane, service=existing)
+        upload = BytesIO(
+            b"Date,Service,Time,First Name,Last Name,Email,Phone\n"
+            b"2019-04-13,,,Jane,Example,jane@example.com,\n"
+            b"2019-04-13,,10:05,John,Example,,5551234567\n"
+            b"04/20/2019,Youth Vespers,6:30 PM,John,Example,,\n"
+            b"2019-04-20,,,Nobody,Here,,\n"
+            b"not-a-date,,,Jane,Example,,\n"
+        )
+
+        result = import_attendance_file(upload)
+
+        self.assertEqual(
+            (result.rows, result.inserted, result.already_recorded, result.skipped, result.services_created),
+            (5, 2, 1, 2, 1),
+        )
+        self.assertEqual([row for row, _message in result.problems], [5, 6])
+        john_first = Attendance.objects.get(person=self.john, service=existing)
+        self.assertEqual(timezone.localtime(john_first.checked_in_at).time().strftime("%H:%M"), "10:05")
+        vespers = Service.objects.get(label="Youth Vespers")
+        self.assertEqual((vespers.date, vespers.status), (date(2019, 4, 20), Service.CLOSED))
+        self.assertEqual(timezone.localtime(Attendance.objects.get(service=vespers).checked_in_at).hour, 18)
+
+    def test_ndjson_records_and_ambiguous_names(self):
+        Person.objects.create(first_name="John", last_name="Example", phone="555-999-0000")
+        lines = [
+            {"date": "2020-01-04T09:30:00", "email": "JANE@example.com"},
+            {"date": "2020-01-04", "first_name": "John", "last_name": "Example"},
+            "not json",
+        ]
+        upload = BytesIO("\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines).encode())
+
+        result = import_attendance_file(upload, file_format=NDJSON_FORMAT)
+
+        self.assertEqual((result.inserted, result.skipped), (1, 2))
+        self.assertIn("2 people are named John Example", result.problems[0][1])
+        self.assertEqual(result.problems[1], (3, "Line is not valid JSON."))
+        checked_in_at = Attendance.objects.get(person=self.jane).checked_in_at
+        self.assertEqual(timezone.localtime(checked_in_at).replace(tzinfo=None), datetime(2020, 1, 4, 9, 30))
+
+    def test_check_ins_made_during_the_import_are_not_counted_as_imported(self):
+        service = Service.objects.create(date=date(2019, 4, 13), label="Sabbath Service 04-13-2019", status=Service.CLOSED)
+        walk_in = Person.objects.create(first_name="Walk", last_name="In")
+        original_bulk_create = Attendance.objects.bulk_create
+
+        def bulk_create_alongside_kiosk(objs, **kwargs):
+            Attendance.objects.create(person=walk_in, service=service)
+            return original_bulk_create(objs, **kwargs)
+
+        upload = BytesIO(b"Date,Email\n2019-04-13,jane@example.com\n")
+        with patch.object(Attendance.objects, "bulk_create", side_effect=bulk_create_alongside_kiosk):
+            result = import_attendance_file(upload)
+
+        self.assertEqual((result.inserted, result.already_recorded), (1, 0))
+        self.assertEqual(Attendance.objects.filter(service=service).count(), 2)
+
+    def test_file_without_date_column_is_rejected(self):
+        with self.assertRaises(AttendanceImportError):
+            import_attendance_file(BytesIO(b"First Name,Last Name\nJane,Example\n"))
+
+    def test_hundred_thousand_rows_import_in_seconds(self):
+        people = Person.objects.bulk_create(
+            Person(first_name=f"Member{index}", last_name="Bulk", email=f"member{index}@example.com") for index in range(500)
+        )
+        lines = ["Date,Email"]
+        for week in range(200):
+            service_date = date.fromordinal(date(2015, 1, 3).toordinal() + week * 7).isoformat()
+            lines += [f"{service_date},{person.email}" for person in people]
+        upload = BytesIO(("\n".join(lines) + "\n").encode())
+
+        started = time.perf_counter()
+        result = import_attendance_file(upload)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual((result.rows, result.inserted, result.services_created), (100000, 100000, 200))
+        self.assertLess(elapsed, 30)
+
+
+class AttendanceImportAdminTests(TestCase):
+    def test_admin_upload_imports_and_logs_one_summary(self):
+        admin_user = User.objects.create_superuser(username="admin", email="admin@example.com", password="password123")
+        self.client.force_login(admin_user)
+        Person.objects.create(first_name="Jane", last_name="Example", email="jane@example.com")
+        upload = SimpleUploadedFile("history.csv", b"Date,Email\n2019-04-13,jane@example.com\n2019-04-20,jane@example.com\n")
+
+        response = self.client.post("/admin/attendance-import/", {"attendance_file": upload})
+
+        self.assertContains(response, "2 check-ins added")
+        self.assertEqual(Attendance.objects.count(), 2)
+        log = AuditLog.objects.get(action=AuditLog.ACTION_ATTENDANCE_IMPORT)
+        self.assertEqual(log.metadata["inserted"], 2)
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import time
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.audit import log_event
+from core.backup_schedule import backups_to_prune, due_backup_label, prune_scheduled_backups, run_scheduled_backups
+from core.backups import get_backup_progress, list_database_backups
+from core.models import AuditLog
+
+
+def _local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class BackupScheduleTests(TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.backup_dir = Path(self.temp_dir.name)
+        settings_override = override_settings(DATABASE_BACKUP_DIR=self.backup_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _backup_file(self, label: str, created_at) -> Path:
+        path = self.backup_dir / f"welcome-system-{label}-{created_at:%Y%m%d-%H%M%S}.sqlite3.gz"
+        path.write_bytes(b"\x1f\x8b" + bytes(18))
+        os.utime(path, (created_at.timestamp(), created_at.timestamp()))
+        return path
+
+    def test_due_backups_follow_nightly_sabbath_and_service_close_schedule(self):
+        saturday_morning = _local(2026, 10, 17, 9, 0)
+
+        self.assertEqual(due_backup_label(saturday_morning), "pre-service")
+        self._backup_file("pre-service", _local(2026, 10, 17, 8, 0, 30))
+        self.assertEqual(due_backup_label(saturday_morning), "nightly")
+        self._backup_file("nightly", _local(2026, 10, 17, 2, 0, 30))
+        self.assertIsNone(due_backup_label(saturday_morning))
+
+        log_event(AuditLog.ACTION_SERVICE_CLOSE, message="Service closed.")
+        self.assertEqual(due_backup_label(), "post-service")
+        self._backup_file("post-service", timezone.now() + timedelta(seconds=1))
+        self.assertEqual(due_backup_label(_local(2026, 10, 18, 1, 0)), None)
+        self.assertEqual(due_backup_label(_local(2026, 10, 18, 2, 0)), "nightly")
+
+    @override_settings(DATABASE_BACKUP_KEEP_DAILY=2, DATABASE_BACKUP_KEEP_WEEKLY=1, DATABASE_BACKUP_KEEP_MONTHLY=2)
+    def test_retention_keeps_newest_per_day_week_and_month_and_never_prunes_manual_backups(self):
+        first_night = _local(2026, 8, 1, 2, 0)
+        for day in range(40):
+            self._backup_file("nightly", first_night + timedelta(days=day))
+        self._backup_file("manual", first_night)
+        self._backup_file("pre-service", _local(2026, 8, 8, 8, 0))
+
+        pruned = prune_scheduled_backups()
+
+        remaining = sorted(backup.name for backup in list_database_backups())
+        self.assertEqual(len(pruned), 37)
+        self.assertEqual(
+            remaining,
+            [
+                "welcome-system-manual-20260801-020000.sqlite3.gz",
+                "welcome-system-nightly-20260831-020000.sqlite3.gz",
+                "welcome-system-nightly-20260908-020000.sqlite3.gz",
+                "welcome-system-nightly-20260909-020000.sqlite3.gz",
+                "welcome-system-pre-service-20260808-080000.sqlite3.gz",
+            ],
+        )
+        self.assertEqual(backups_to_prune(list_database_backups()), [])
+        self.assertEqual(AuditLog.objects.get(action=AuditLog.ACTION_DATABASE_BACKUP).metadata["pruned"], pruned)
+
+
+class ScheduledBackupRunTests(TransactionTestCase):
+    def test_due_backup_runs_on_the_background_backup_path_and_is_audited(self):
+        with TemporaryDirectory() as temp_dir, override_settings(DATABASE_BACKUP_DIR=Path(temp_dir)):
+            self.assertEqual(run_scheduled_backups(_local(2026, 10, 14, 12, 0)), "nightly")
+            deadline = time.monotonic() + 10
+            while get_backup_progress().is_running and time.monotonic() < deadline:
+                time.sleep(0.02)
+
+            (backup,) = list_database_backups()
+            self.assertTrue(backup.name.startswith("welcome-system-nightly-"))
+            log = AuditLog.objects.get(action=AuditLog.ACTION_DATABASE_BACKUP)
+            self.assertEqual((log.metadata["label"], log.actor), ("nightly", None))
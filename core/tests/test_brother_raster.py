@@ -0,0 +1,63 @@
+import random
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+from PIL import Image, ImageDraw
+
+from core.brother_raster import BrotherRasterError, encode_label_raster, packbits
+from core.models import SystemSetting
+from core.printnode import (
+    _build_label_images_from_rows,
+    _build_label_raw_from_rows,
+    _convert_with_brother_ql,
+    _normalize_brother_label_colors,
+)
+
+
+class PackBitsTests(SimpleTestCase):
+    def test_matches_reference_encoder_on_runs_and_literals(self):
+        import packbits as reference
+
+        generator = random.Random(820)
+        for _ in range(2000):
+            data = bytearray()
+            length = generator.randint(0, 400)
+            while len(data) < length:
+                data += bytes([generator.choice(b"\x00\x0f\xf0\xff")]) * generator.choice([1, 1, 2, 3, 127, 128, 129, 300])
+            data = bytes(data[:length])
+            self.assertEqual(packbits(data), reference.encode(data), data)
+
+
+class NativeRasterTests(TestCase):
+    def assertMatchesBrotherQl(self, images, media):
+        self.assertEqual(encode_label_raster(images, media), _convert_with_brother_ql(images, media))
+
+    def test_name_labels_match_brother_ql_for_both_media(self):
+        SystemSetting.objects.update_or_create(key="first_name_color", defaults={"value": "#cc0000"})
+        for rows in ([("Ada", "Lee")], [("Maximilianus-Alexander", "Featherstonehaugh-Worthington")] * 3):
+            images = _build_label_images_from_rows(rows)
+            with self.subTest(rows=len(rows)):
+                self.assertMatchesBrotherQl(images, "62")
+                self.assertMatchesBrotherQl([_normalize_brother_label_colors(image) for image in images], "62red")
+
+    def test_anti_aliased_colours_match_brother_ql(self):
+        image = Image.new("RGB", (696, 120), "white")
+        draw = ImageDraw.Draw(image)
+        for x in range(0, 696, 3):
+            draw.line((x, 0, (x * 7) % 696, 119), fill=((x * 37) % 256, (x * 91) % 256, (x * 13) % 256), width=2)
+
+        self.assertMatchesBrotherQl([image, image.convert("L")], "62")
+        self.assertMatchesBrotherQl([image, image.convert("L")], "62red")
+
+    def test_unsupported_input_is_rejected(self):
+        with self.assertRaises(BrotherRasterError):
+            encode_label_raster([Image.new("RGB", (696, 10), "white")], "29")
+        with self.assertRaises(BrotherRasterError):
+            encode_label_raster([Image.new("RGB", (400, 10), "white")], "62")
+
+    @patch("core.printnode.encode_label_raster", side_effect=BrotherRasterError("unsupported"))
+    def test_raw_labels_fall_back_to_brother_ql(self, mock_encode):
+        raw_bytes = _build_label_raw_from_rows([("Ada", "Lee")], profile={"name": "hall", "brother_label_media": "62"})
+
+        mock_encode.assert_called_once()
+        self.assertIn(b"\x1biK\b", raw_bytes)
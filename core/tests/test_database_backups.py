@@ -1,13 +1,30 @@
+import gzip
+import os
 from pathlib import Path
 import sqlite3
 from tempfile import TemporaryDirectory
+import time
+from unittest.mock import patch
 import warnings
 
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TransactionTestCase, override_settings
 
-from core.backups import create_database_backup, list_database_backups, restore_database_backup
+from core.backups import (
+    VERIFY_FAILED,
+    VERIFY_OK,
+    VERIFY_PENDING,
+    BackupCancelled,
+    BackupError,
+    BackupProgress,
+    cancel_database_backup,
+    create_database_backup,
+    get_backup_progress,
+    list_database_backups,
+    restore_database_backup,
+    verify_pending_backups,
+)
 from core.models import AuditLog, Person
 
 
@@ -31,11 +48,73 @@ class DatabaseBackupAdminTests(TransactionTestCase):
         response = self.client.post("/admin/database-backup/", {"action": "create_backup"})
 
         self.assertEqual(response.status_code, 302)
+        progress = _wait_for_backup()
+        self.assertEqual((progress.status, progress.percent), (BackupProgress.DONE, 100))
         backups = list_database_backups()
         self.assertEqual(len(backups), 1)
         self.assertTrue(backups[0].name.startswith("welcome-system-manual-"))
+        self.assertTrue(backups[0].compressed)
+        self.assertGreater(backups[0].logical_size_bytes, backups[0].size_bytes)
         self.assertTrue(AuditLog.objects.filter(action=AuditLog.ACTION_DATABASE_BACKUP).exists())
 
+    def test_stepwise_backup_lets_other_connections_write(self):
+        current_db = Path(self.temp_dir.name) / "current.sqlite3"
+        with sqlite3.connect(current_db) as connection:
+            connection.execute("CREATE TABLE sample (name text)")
+            connection.executemany("INSERT INTO sample VALUES (?)", [("x" * 200,) for _index in range(2000)])
+        progress = _WritingProgress(label="manual", database_path=current_db)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            with override_settings(
+                DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": str(current_db)}},
+                DATABASE_BACKUP_PAGES_PER_STEP=5,
+                DATABASE_BACKUP_STEP_SLEEP_SECONDS=0,
+            ):
+                backup = create_database_backup(progress=progress)
+
+        self.assertEqual(progress.writes, 3)
+        self.assertEqual(progress.pages_remaining, 0)
+        copy_db = Path(self.temp_dir.name) / "copy.sqlite3"
+        copy_db.write_bytes(gzip.decompress(backup.path.read_bytes()))
+        with sqlite3.connect(copy_db) as connection:
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM sample WHERE name = 'written'").fetchone()[0], 3)
+
+    def test_backup_restarted_by_constant_writes_finishes_in_one_step(self):
+        current_db = Path(self.temp_dir.name) / "current.sqlite3"
+        with sqlite3.connect(current_db) as connection:
+            connection.execute("CREATE TABLE sample (name text)")
+            connection.executemany("INSERT INTO sample VALUES (?)", [("x" * 200,) for _index in range(2000)])
+        progress = _WritingProgress(label="manual", database_path=current_db, max_writes=1000)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            with override_settings(
+                DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": str(current_db)}},
+                DATABASE_BACKUP_PAGES_PER_STEP=5,
+                DATABASE_BACKUP_STEP_SLEEP_SECONDS=0,
+                DATABASE_BACKUP_MAX_RESTARTS=2,
+            ), self.assertLogs("core.backups", "WARNING"):
+                backup = create_database_backup(progress=progress)
+
+        self.assertEqual((progress.restarts, progress.single_step, progress.writes), (3, True, 4))
+        self.assertEqual(progress.pages_remaining, 0)
+        copy_db = Path(self.temp_dir.name) / "copy.sqlite3"
+        copy_db.write_bytes(gzip.decompress(backup.path.read_bytes()))
+        with sqlite3.connect(copy_db) as connection:
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM sample WHERE name = 'written'").fetchone()[0], 4)
+
+    def test_cancelled_backup_leaves_no_file(self):
+        Person.objects.bulk_create(Person(first_name=f"Member{index}", last_name="Backup" * 40) for index in range(500))
+        progress = BackupProgress(label="manual", cancel_requested=True)
+
+        with override_settings(DATABASE_BACKUP_PAGES_PER_STEP=1):
+            with self.assertRaises(BackupCancelled):
+                create_database_backup(progress=progress)
+
+        self.assertEqual(list(Path(self.temp_dir.name).iterdir()), [])
+        self.assertFalse(cancel_database_backup())
+
     def test_backup_download_returns_sqlite_file(self):
         backup = create_database_backup()
 
@@ -43,7 +122,36 @@ class DatabaseBackupAdminTests(TransactionTestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "application/vnd.sqlite3")
-        self.assertIn("attachment", response["Content-Disposition"])
+        self.assertIn(f'attachment; filename="{backup.download_name}"', response["Content-Disposition"])
+        content = b"".join(response.streaming_content)
+        self.assertTrue(content.startswith(b"SQLite format 3\x00"))
+        self.assertEqual(len(content), backup.logical_size_bytes)
+
+    @patch("core.views.start_backup_verification")
+    def test_uploaded_plain_backup_is_stored_compressed_and_restorable(self, start_verification):
+        source_db = Path(self.temp_dir.name) / "source.sqlite3"
+        with sqlite3.connect(source_db) as connection:
+            connection.execute("CREATE TABLE sample (name text)")
+            connection.execute("INSERT INTO sample VALUES ('uploaded')")
+        uploaded = SimpleUploadedFile("upload.sqlite3", source_db.read_bytes())
+        source_db.unlink()
+
+        response = self.client.post("/admin/database-backup/", {"action": "upload_backup", "backup_file": uploaded})
+
+        self.assertEqual(response.status_code, 302)
+        start_verification.assert_called_once()
+        (backup,) = list_database_backups()
+        self.assertTrue(backup.name.endswith(".sqlite3.gz"))
+        self.assertEqual(backup.logical_size_bytes, len(uploaded.file.getvalue()))
+        current_db = Path(self.temp_dir.name) / "current.sqlite3"
+        sqlite3.connect(current_db).close()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            with override_settings(DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": str(current_db)}}):
+                restore_database_backup(backup.name)
+        with sqlite3.connect(current_db) as connection:
+            self.assertEqual(connection.execute("SELECT name FROM sample").fetchone()[0], "uploaded")
+        self.assertEqual(sorted(path.suffix for path in Path(self.temp_dir.name).iterdir()), [".gz", ".gz", ".sqlite3"])
 
     def test_restore_requires_explicit_confirmation(self):
         backup = create_database_backup()
@@ -80,16 +188,38 @@ class DatabaseBackupAdminTests(TransactionTestCase):
                         "ENGINE": "django.db.backends.sqlite3",
                         "NAME": str(current_db),
                     }
-                }
+                },
+                DATABASE_BACKUP_PAGES_PER_STEP=1,
+                DATABASE_BACKUP_STEP_SLEEP_SECONDS=30,
             ):
+                started = time.monotonic()
                 restored = restore_database_backup(backup_db.name)
 
+        # The pre-restore copy is taken in one step, not throttled page by page.
+        self.assertLess(time.monotonic() - started, 10)
+
         self.assertEqual(restored.name, backup_db.name)
         with sqlite3.connect(current_db) as connection:
             value = connection.execute("SELECT name FROM sample").fetchone()[0]
         self.assertEqual(value, "backup")
         self.assertTrue(any(backup.name.startswith("welcome-system-pre-restore-") for backup in list_database_backups()))
 
+    def test_full_verification_is_cached_per_file_and_blocks_restoring_failed_backups(self):
+        backup = create_database_backup()
+        broken = backup.path.with_name("welcome-system-broken-20260101-000000.sqlite3.gz")
+        broken.write_bytes(backup.path.read_bytes()[:200])
+
+        self.assertEqual(verify_pending_backups(), 2)
+        self.assertEqual(verify_pending_backups(), 0)
+        statuses = {item.name: item.verification_status for item in list_database_backups()}
+        self.assertEqual(statuses, {backup.name: VERIFY_OK, broken.name: VERIFY_FAILED})
+        with self.assertRaisesMessage(BackupError, "failed its full integrity check"):
+            restore_database_backup(broken.name)
+
+        stat = backup.path.stat()
+        os.utime(backup.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertEqual({item.name: item.verification_status for item in list_database_backups()}[backup.name], VERIFY_PENDING)
+
     def test_upload_rejects_non_sqlite_file(self):
         uploaded = SimpleUploadedFile("not-a-database.sqlite3", b"this is not sqlite")
 
@@ -100,3 +230,37 @@ class DatabaseBackupAdminTests(TransactionTestCase):
 
         self.assertEqual(response.status_code, 302)
         self.assertEqual(list_database_backups(), [])
+
+
+class _WritingProgress(BackupProgress):
+    """Writes to the source database from another connection between backup steps."""
+
+    def __init__(self, *, database_path, max_writes=3, **kwargs):
+        self.database_path = database_path
+        self.max_writes = max_writes
+        self.writes = 0
+        super().__init__(**kwargs)
+
+    @property
+    def cancel_requested(self):
+        if self.writes < self.max_writes and self.pages_remaining:
+            # timeout=0: the write fails instead of waiting if the backup holds a lock.
+            writer = sqlite3.connect(self.database_path, timeout=0)
+            with writer:
+                writer.execute("INSERT INTO sample VALUES ('written')")
+            writer.close()
+            self.writes += 1
+        return False
+
+    @cancel_requested.setter
+    def cancel_requested(self, value):
+        pass
+
+
+def _wait_for_backup(timeout: float = 10.0) -> BackupProgress:
+    deadline = time.monotonic() + timeout
+    progress = get_backup_progress()
+    while progress.is_running and time.monotonic() < deadline:
+        time.sleep(0.02)
+        progress = get_backup_progress()
+    return progress
@@ -0,0 +1,139 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.ipp_client import (
+    END_OF_ATTRIBUTES_TAG,
+    ENUM,
+    INTEGER,
+    JOB_ATTRIBUTES_TAG,
+    KEYWORD,
+    OPERATION_ATTRIBUTES_TAG,
+    OPERATION_GET_JOB_ATTRIBUTES,
+    OPERATION_PRINT_JOB,
+    TEXT,
+    URI,
+    IppMessage,
+    decode_message,
+    encode_message,
+)
+from core.models import SystemSetting
+from core.print_breaker import reset_circuit_breakers
+from core.printnode import (
+    ServerPrinterError,
+    _parse_server_printer_config,
+    _send_to_server_printer_target,
+    get_kiosk_server_printer,
+    get_server_print_job_state,
+)
+
+
+class FakeIppHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connection_count += 1
+
+    def do_POST(self):
+        request = decode_message(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.received.append((self.path, request))
+        operation = request.groups[0][1]
+        if request.code == OPERATION_PRINT_JOB and self.path != "/printers/Brother_QL":
+            self._reply(IppMessage(0x0406, request.request_id, [(OPERATION_ATTRIBUTES_TAG, {"status-message": [(TEXT, "Printer not found")]})]))
+            return
+        job_id = operation["job-id"][0] if request.code == OPERATION_GET_JOB_ATTRIBUTES else 40 + len(self.server.received)
+        job = {
+            "job-id": [(INTEGER, job_id)],
+            "job-uri": [(URI, f"ipp://127.0.0.1/jobs/{job_id}")],
+            "job-state": [(ENUM, 9 if request.code == OPERATION_GET_JOB_ATTRIBUTES else 3)],
+        }
+        self._reply(IppMessage(0x0000, request.request_id, [(OPERATION_ATTRIBUTES_TAG, {}), (JOB_ATTRIBUTES_TAG, job)]))
+
+    def _reply(self, message):
+        body = encode_message(message)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/ipp")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+class IppMessageTests(SimpleTestCase):
+    def test_round_trip_keeps_multi_valued_attributes_and_document(self):
+        message = IppMessage(
+            OPERATION_GET_JOB_ATTRIBUTES,
+            7,
+            [(OPERATION_ATTRIBUTES_TAG, {"job-id": [(INTEGER, 12)], "requested-attributes": [(KEYWORD, "job-state"), (KEYWORD, "job-name")]})],
+            data=b"%PDF-1.4",
+        )
+
+        encoded = encode_message(message)
+        decoded = decode_message(encoded)
+
+        self.assertEqual(encoded[:8], b"\x02\x00\x00\x09\x00\x00\x00\x07")
+        self.assertIn(bytes([END_OF_ATTRIBUTES_TAG]) + b"%PDF-1.4", encoded)
+        self.assertEqual(decoded.groups, [(OPERATION_ATTRIBUTES_TAG, {"job-id": [12], "requested-attributes": ["job-state", "job-name"]})])
+        self.assertEqual(decoded.data, b"%PDF-1.4")
+
+    def test_ipp_addresses_parse_as_ipp_targets(self):
+        self.assertEqual(
+            _parse_server_printer_config("ipp://printer.local:631/ipp/print", "kiosk1"),
+            {"kind": "ipp", "uri": "ipp://printer.local:631/ipp/print"},
+        )
+        with self.assertRaises(ServerPrinterError):
+            _parse_server_printer_config({"queue": "Brother_QL", "transport": "smb"}, "kiosk1")
+
+
+class IppPrintTests(TestCase):
+    def setUp(self):
+        reset_circuit_breakers()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeIppHandler)
+        self.server.connection_count = 0
+        self.server.received = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"ipp://127.0.0.1:{self.server.server_address[1]}"
+        settings_override = override_settings(CUPS_IPP_URL=self.base_url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        SystemSetting.objects.update_or_create(
+            key="printer_profiles",
+            defaults={"value": '{"hall": {"backend": "server", "queue": "Brother_QL", "transport": "ipp"}}'},
+        )
+        SystemSetting.objects.update_or_create(key="kiosk_printer_profile_map", defaults={"value": '{"kiosk1": "hall"}'})
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_profile_transport_sends_pdf_over_one_connection_and_tracks_state(self):
+        target = get_kiosk_server_printer("kiosk1")
+
+        first = _send_to_server_printer_target(target, raw_bytes=b"", pdf_bytes=b"%PDF-one")
+        second = _send_to_server_printer_target(target, raw_bytes=b"", pdf_bytes=b"%PDF-two")
+
+        printer_uri = f"{self.base_url}/printers/Brother_QL"
+        self.assertEqual(target, {"kind": "ipp", "uri": printer_uri, "queue": "Brother_QL"})
+        self.assertEqual((first, second), (f"ipp:41@{printer_uri}", f"ipp:42@{printer_uri}"))
+        path, request = self.server.received[0]
+        operation = request.groups[0][1]
+        self.assertEqual(path, "/printers/Brother_QL")
+        self.assertEqual(list(operation)[:3], ["attributes-charset", "attributes-natural-language", "printer-uri"])
+        self.assertEqual(operation["document-format"], ["application/pdf"])
+        self.assertEqual(request.data, b"%PDF-one")
+        self.assertEqual(get_server_print_job_state(first), "completed")
+        self.assertEqual(self.server.connection_count, 1)
+
+    def test_rejected_job_reports_ipp_status_message(self):
+        target = {"kind": "ipp", "uri": f"{self.base_url}/printers/Missing"}
+
+        with self.assertRaisesMessage(ServerPrinterError, "Printer not found"):
+            _send_to_server_printer_target(target, raw_bytes=b"", pdf_bytes=b"%PDF")
+
+    def test_job_state_is_blank_for_other_backends(self):
+        self.assertEqual(get_server_print_job_state("queue:Brother_QL-12"), "")
+        self.assertEqual(get_server_print_job_state("raw:192.168.1.50:9100"), "")
@@ -0,0 +1,73 @@
+import json
+from io import StringIO
+from pathlib import Path
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, tag
+
+from core.label_benchmarks import BenchmarkScenario, build_scenarios, compare_benchmarks, run_scenario
+
+
+class LabelBenchmarkScenarioTests(SimpleTestCase):
+    def test_scenarios_skip_media_modes_that_do_not_apply(self):
+        scenarios = build_scenarios(batches=["single"], name_lengths=["short"])
+        names = {scenario.name for scenario in scenarios}
+
+        self.assertIn("raster/single/62/short", names)
+        self.assertIn("raster/single/62red/short", names)
+        self.assertIn("normalize_colors/single/62red/short", names)
+        self.assertNotIn("normalize_colors/single/62/short", names)
+        self.assertIn("pdf/single/62/short", names)
+        self.assertNotIn("pdf/single/62red/short", names)
+
+    def test_compare_reports_only_medians_beyond_threshold(self):
+        baseline = {"results": [{"name": "raster/single/62/short", "median_ms": 10.0}, {"name": "pdf/single/62/short", "median_ms": 2.0}]}
+        current = {"results": [{"name": "raster/single/62/short", "median_ms": 13.0}, {"name": "pdf/single/62/short", "median_ms": 2.1}]}
+
+        regressions = compare_benchmarks(current, baseline, threshold=1.2)
+
+        self.assertEqual(regressions, [{"name": "raster/single/62/short", "baseline_ms": 10.0, "median_ms": 13.0, "ratio": 1.3}])
+
+
+@tag("benchmark")
+class LabelBenchmarkCommandTests(TestCase):
+    def test_run_scenario_records_timing_and_memory(self):
+        result = run_scenario(BenchmarkScenario("pdf", "family", "62", "long"), repeats=3)
+
+        self.assertEqual(result.batch_size, 5)
+        self.assertEqual(result.repeats, 3)
+        self.assertGreater(result.median_ms, 0)
+        self.assertGreaterEqual(result.p95_ms, result.median_ms)
+        self.assertGreater(result.peak_memory_kb, 0)
+
+    def test_command_writes_json_and_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / "bench.json"
+            call_command(
+                "benchmark_labels",
+                "--stage", "pdf",
+                "--batch", "single",
+                "--names", "short",
+                "--repeats", "1",
+                "--output", str(output),
+                stderr=StringIO(),
+            )
+            report = json.loads(output.read_text(encoding="utf-8"))
+            self.assertEqual([result["name"] for result in report["results"]], ["pdf/single/62/short"])
+
+            for result in report["results"]:
+                result["median_ms"] = result["median_ms"] / 1000
+            baseline = Path(directory) / "baseline.json"
+            baseline.write_text(json.dumps(report), encoding="utf-8")
+            with self.assertRaisesMessage(CommandError, "regressed"):
+                call_command(
+                    "benchmark_labels",
+                    "--stage", "pdf",
+                    "--batch", "single",
+                    "--names", "short",
+                    "--repeats", "1",
+                    "--compare", str(baseline),
+                    stdout=StringIO(),
+                    stderr=StringIO(),
+                )
@@ -0,0 +1,67 @@
+from django.test import TestCase, TransactionTestCase
+
+from core.models import SettingsVersion, SystemSetting
+from core.printnode import _build_label_pdf_from_rows, _build_label_raw_from_rows, get_label_layout
+from core.settings_store import forget_settings_version
+
+
+class LabelLayoutTests(TestCase):
+    def test_layout_is_reused_until_a_setting_changes(self):
+        layout = get_label_layout()
+        with self.assertNumQueries(1):
+            self.assertIs(get_label_layout(), layout)
+
+        version = SettingsVersion.objects.get(pk=1).version
+        SystemSetting.objects.update_or_create(key="hide_last_name", defaults={"value": "Yes"})
+
+        self.assertEqual(SettingsVersion.objects.get(pk=1).version, version + 1)
+        self.assertTrue(get_label_layout().hide_last_name)
+
+    def test_profile_overrides_geometry_and_media(self):
+        layout = get_label_layout({"name": "hall", "label_width_in": "3.5", "media": "62"})
+
+        self.assertEqual(layout.width_in, 3.5)
+        self.assertEqual(layout.height_in, 1.1)
+        self.assertEqual(layout.brother_label_media, "62")
+        self.assertEqual(get_label_layout().brother_label_media, "62red")
+
+    def test_html_context_matches_resolved_styling(self):
+        SystemSetting.objects.update_or_create(key="first_name_color", defaults={"value": "#CC0000"})
+        SystemSetting.objects.update_or_create(key="last_name_color", defaults={"value": "red"})
+        SystemSetting.objects.update_or_create(key="label_font", defaults={"value": "Georgia"})
+        SystemSetting.objects.update_or_create(key="label_first_name_scale", defaults={"value": "250"})
+
+        context = get_label_layout().html_context()
+
+        self.assertEqual(context["first_name_color"], "#CC0000")
+        self.assertEqual(context["last_name_color"], "#000000")
+        self.assertEqual(context["label_font_family"], '"Georgia", Arial, sans-serif')
+        self.assertEqual(context["label_first_name_scale_factor"], "2.00")
+        self.assertEqual(context["label_width_in"], "2.440")
+        self.assertEqual(get_label_layout().pdf_fonts, ("Times-Bold", "Times-Roman"))
+
+    def test_multi_label_jobs_read_settings_once(self):
+        rows = [("Ada", "Lovelace")] * 4
+        get_label_layout()
+
+        with self.assertNumQueries(1):
+            _build_label_raw_from_rows(rows)
+        with self.assertNumQueries(1):
+            _build_label_pdf_from_rows(rows)
+
+
+class SettingsVersionCacheTests(TransactionTestCase):
+    def setUp(self):
+        forget_settings_version()
+        self.addCleanup(forget_settings_version)
+
+    def test_label_jobs_reuse_the_layout_without_queries_until_a_setting_is_saved(self):
+        layout = get_label_layout()
+        with self.assertNumQueries(0):
+            self.assertIs(get_label_layout(), layout)
+
+        SystemSetting.objects.update_or_create(key="hide_last_name", defaults={"value": "Yes"})
+
+        self.assertTrue(get_label_layout().hide_last_name)
+        with self.assertNumQueries(0):
+            get_label_layout()
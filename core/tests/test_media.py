@@ -0,0 +1,57 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from core.media import versioned_media_url
+
+
+@override_settings(DEBUG=False)
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        media_root = Path(self.temp_dir.name)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        (media_root / "branding").mkdir()
+        (media_root / "branding/logo.png").write_bytes(b"0123456789")
+        (media_root / "people/photos").mkdir(parents=True)
+        (media_root / "people/photos/ada.jpg").write_bytes(b"photo")
+
+    def test_versioned_logo_is_cached_immutably_and_revalidates_with_304(self):
+        url = versioned_media_url("branding/logo.png")
+
+        response = self.client.get(url)
+        unversioned = self.client.get("/media/branding/logo.png")
+        revalidated = self.client.get("/media/branding/logo.png", HTTP_IF_NONE_MATCH=response["ETag"])
+
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertEqual(unversioned["Cache-Control"], "public, no-cache")
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated["Cache-Control"], "public, no-cache")
+
+    def test_byte_ranges(self):
+        partial = self.client.get("/media/branding/logo.png", HTTP_RANGE="bytes=2-5")
+        suffix = self.client.get("/media/branding/logo.png", HTTP_RANGE="bytes=-3")
+        unsatisfiable = self.client.get("/media/branding/logo.png", HTTP_RANGE="bytes=20-")
+
+        self.assertEqual((partial.status_code, partial["Content-Range"]), (206, "bytes 2-5/10"))
+        self.assertEqual(b"".join(partial.streaming_content), b"2345")
+        self.assertEqual(b"".join(suffix.streaming_content), b"789")
+        self.assertEqual((unsatisfiable.status_code, unsatisfiable["Content-Range"]), (416, "bytes */10"))
+
+    def test_person_photos_need_a_login_and_paths_stay_in_media_root(self):
+        self.assertEqual(self.client.get("/media/people/photos/ada.jpg").status_code, 403)
+        self.client.force_login(User.objects.create_user(username="kiosk", password="password123"))
+
+        response = self.client.get("/media/people/photos/ada.jpg")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Cache-Control"].startswith("private"))
+        self.assertEqual(self.client.get("/media/../cats/settings.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/people/photos/").status_code, 404)
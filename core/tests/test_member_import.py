@@ -1,22 +1,56 @@
+from datetime import timedelta
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
-from core.member_import import import_member_rows, parse_member_csv
-from core.models import AuditLog, Family, Person
+from core import member_import_jobs
+from core.member_import import MemberImportError, import_member_rows, iter_member_csv_chunks, match_existing_people
+from core.member_import_jobs import (
+    commit_member_import,
+    purge_expired_member_imports,
+    run_member_import_job,
+    stage_member_import,
+)
+from core.models import AuditLog, Family, MemberImportJob, Person
 
 
 def csv_file(content: str, name: str = "members.csv"):
     return SimpleUploadedFile(name, content.encode("utf-8"), content_type="text/csv")
 
 
+def parse_rows(content: str):
+    rows = [row for chunk in iter_member_csv_chunks(BytesIO(content.encode("utf-8"))) for row in chunk]
+    match_existing_people(rows)
+    return rows
+
+
+def use_temp_import_dir(test_case) -> Path:
+    temp_dir = TemporaryDirectory()
+    test_case.addCleanup(temp_dir.cleanup)
+    settings_override = override_settings(MEMBER_IMPORT_DIR=Path(temp_dir.name))
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
+    return Path(temp_dir.name)
+
+
+def staged_job(content: str) -> MemberImportJob:
+    job = stage_member_import(csv_file(content))
+    run_member_import_job(job.id)
+    job.refresh_from_db()
+    return job
+
+
 class MemberImportParserTests(TestCase):
-    def test_parse_member_csv_validates_and_normalizes_rows(self):
-        rows = parse_member_csv(
-            csv_file(
-                "First Name,Middle Initial,Last Name,Family,Phone,Email,Birth Month,Birth Day,Active\n"
-                "Jane,q,Example,Example Family,5551234567,jane@example.com,4,16,yes\n"
-            )
+    def test_member_csv_validates_and_normalizes_rows(self):
+        rows = parse_rows(
+            "First Name,Middle Initial,Last Name,Family,Phone,Email,Birth Month,Birth Day,Active\n"
+            "Jane,q,Example,Example Family,5551234567,jane@example.com,4,16,yes\n"
         )
 
         self.assertEqual(len(rows), 1)
@@ -27,18 +61,16 @@ class MemberImportParserTests(TestCase):
         self.assertEqual(row.data["birth_day"], 16)
         self.assertTrue(row.data["is_active"])
 
-    def test_parse_member_csv_reports_missing_required_names(self):
-        rows = parse_member_csv(csv_file("First Name,Last Name\n,Example\n"))
+    def test_member_csv_reports_missing_required_names(self):
+        rows = parse_rows("First Name,Last Name\n,Example\n")
 
         self.assertFalse(rows[0].is_valid)
         self.assertIn("First name is required.", rows[0].errors)
 
     def test_import_member_rows_creates_member_and_family(self):
-        rows = parse_member_csv(
-            csv_file(
-                "First Name,Last Name,Family,Phone,Email\n"
-                "Jane,Example,Example Family,5551234567,jane@example.com\n"
-            )
+        rows = parse_rows(
+            "First Name,Last Name,Family,Phone,Email\n"
+            "Jane,Example,Example Family,5551234567,jane@example.com\n"
         )
 
         result = import_member_rows(rows)
@@ -50,7 +82,7 @@ class MemberImportParserTests(TestCase):
 
     def test_import_member_rows_skips_existing_by_default(self):
         Person.objects.create(first_name="Jane", last_name="Example", email="jane@example.com", member_type=Person.VISITOR)
-        rows = parse_member_csv(csv_file("First Name,Last Name,Email\nJane,Example,jane@example.com\n"))
+        rows = parse_rows("First Name,Last Name,Email\nJane,Example,jane@example.com\n")
 
         result = import_member_rows(rows)
 
@@ -60,7 +92,7 @@ class MemberImportParserTests(TestCase):
 
     def test_import_member_rows_can_update_existing(self):
         Person.objects.create(first_name="Jane", last_name="Example", email="jane@example.com", member_type=Person.VISITOR)
-        rows = parse_member_csv(csv_file("First Name,Last Name,Phone,Email\nJane,Example,5551234567,jane@example.com\n"))
+        rows = parse_rows("First Name,Last Name,Phone,Email\nJane,Example,5551234567,jane@example.com\n")
 
         result = import_member_rows(rows, update_existing=True)
 
@@ -69,6 +101,136 @@ class MemberImportParserTests(TestCase):
         self.assertEqual(person.member_type, Person.MEMBER)
         self.assertEqual(person.phone, "5551234567")
 
+    def test_large_import_matches_and_saves_in_a_fixed_number_of_queries(self):
+        Family.objects.create(name="Existing")
+        for index in range(20):
+            Person.objects.create(first_name=f"Old{index}", last_name="Member", phone=f"555000{index:04d}")
+        lines = ["First Name,Last Name,Family,Phone,Email"]
+        lines += [f"Old{index},Member,Existing Family,{index:04d},old{index}@example.com" for index in range(20)]
+        lines += [f"New{index},Member,Family {index % 7},,new{index}@example.com" for index in range(300)]
+        content = "\n".join(lines) + "\n"
+
+        with self.assertNumQueries(1):
+            rows = parse_rows(content)
+        # Savepoint, people, families, family insert, six insert batches, one update, release.
+        with self.assertNumQueries(12):
+            result = import_member_rows(rows, update_existing=True)
+
+        self.assertEqual((result.created, result.updated), (300, 20))
+        self.assertEqual(Family.objects.count(), 8)
+        self.assertEqual(Person.objects.filter(family__name="Existing", email__startswith="old").count(), 20)
+
+    def test_repeated_rows_match_people_created_earlier_in_the_file(self):
+        Family.objects.create(name="Example")
+        rows = parse_rows(
+            "First Name,Last Name,Family,Email\n"
+            "Jane,Example,Example Family,jane@example.com\n"
+            "JANE,Example,Example Family,JANE@example.com\n"
+        )
+
+        result = import_member_rows(rows)
+
+        self.assertEqual((result.created, result.skipped), (1, 1))
+        self.assertEqual(Family.objects.count(), 1)
+        self.assertEqual(Person.objects.get().family.name, "Example")
+
+
+class MemberImportJobTests(TestCase):
+    def setUp(self):
+        self.import_dir = use_temp_import_dir(self)
+
+    def test_staged_import_streams_past_a_thousand_rows_and_keeps_row_errors(self):
+        lines = ["First Name,Last Name,Email"]
+        lines += [f"Member{index},Example,member{index}@example.com" for index in range(1200)]
+        lines.insert(600, ",Missing,missing@example.com")
+        job = stage_member_import(csv_file("\n".join(lines) + "\n"))
+
+        self.assertEqual((job.status, job.total_rows), (MemberImportJob.STAGING, 0))
+        run_member_import_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total_rows, job.error_count), (MemberImportJob.STAGED, 1201, 1))
+        self.assertEqual((job.file_name, job.progress_percent), ("", 0))
+        self.assertEqual(list(self.import_dir.iterdir()), [])
+        self.assertFalse(Person.objects.exists())
+        with self.assertRaisesMessage(MemberImportError, "1 rows have errors"):
+            commit_member_import(job)
+        commit_member_import(job, skip_invalid_rows=True)
+        run_member_import_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, MemberImportJob.DONE)
+        self.assertEqual((job.rows_processed, job.created_count), (1201, 1200))
+        self.assertEqual(Person.objects.count(), 1200)
+        self.assertEqual([(row.row_number, row.errors) for row in job.staged_rows.all()], [(601, ["First name is required."])])
+        self.assertEqual(AuditLog.objects.get(action=AuditLog.ACTION_MEMBER_IMPORT).metadata["invalid_rows_skipped"], 1)
+
+    @patch("core.member_import_jobs.IMPORT_CHUNK_SIZE", 2)
+    def test_staging_commits_each_chunk_and_resumes_after_the_last_one(self):
+        job = stage_member_import(csv_file("First Name,Last Name\nAda,One\nBen,Two\nCy,Three\nDee,Four\nEd,Five\n"))
+        real_match = member_import_jobs.match_existing_people
+        calls = []
+
+        def fail_second_chunk(rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise MemberImportError("Database is locked.")
+            return real_match(rows)
+
+        with patch("core.member_import_jobs.match_existing_people", side_effect=fail_second_chunk):
+            run_member_import_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total_rows, job.staged_rows.count()), (MemberImportJob.FAILED, 2, 2))
+        self.assertTrue((self.import_dir / job.file_name).exists())
+
+        run_member_import_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total_rows), (MemberImportJob.STAGED, 5))
+        self.assertEqual(list(job.staged_rows.values_list("row_number", flat=True)), [2, 3, 4, 5, 6])
+
+    @patch("core.member_import_jobs.IMPORT_CHUNK_SIZE", 2)
+    def test_failed_job_resumes_after_its_last_applied_chunk(self):
+        job = staged_job("First Name,Last Name\nAda,One\nBen,Two\nCy,Three\nDee,Four\nEd,Five\n")
+        commit_member_import(job, update_existing=True)
+        real_import = member_import_jobs.import_member_rows
+        calls = []
+
+        def fail_second_chunk(rows, **kwargs):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise MemberImportError("Disk full.")
+            return real_import(rows, **kwargs)
+
+        with patch("core.member_import_jobs.import_member_rows", side_effect=fail_second_chunk):
+            run_member_import_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error, job.rows_processed), (MemberImportJob.FAILED, "Disk full.", 2))
+
+        run_member_import_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_processed, job.created_count), (MemberImportJob.DONE, 5, 5))
+        self.assertEqual(Person.objects.count(), 5)
+
+    def test_upload_without_name_columns_is_not_staged(self):
+        with self.assertRaisesMessage(MemberImportError, "First Name"):
+            stage_member_import(csv_file("Email\njane@example.com\n"))
+
+        self.assertFalse(MemberImportJob.objects.exists())
+        self.assertEqual(list(self.import_dir.iterdir()), [])
+
+    def test_expired_preview_cannot_be_imported_and_is_purged(self):
+        job = staged_job("First Name,Last Name\nJane,Example\n")
+        MemberImportJob.objects.filter(id=job.id).update(expires_at=timezone.now() - timedelta(minutes=1))
+        job.refresh_from_db()
+
+        with self.assertRaisesMessage(MemberImportError, "expired"):
+            commit_member_import(job)
+        purge_expired_member_imports()
+
+        self.assertFalse(MemberImportJob.objects.exists())
+
 
 class MemberImportAdminTests(TestCase):
     def setUp(self):
@@ -78,21 +240,41 @@ class MemberImportAdminTests(TestCase):
             password="password123",
         )
         self.client.force_login(self.admin_user)
+        use_temp_import_dir(self)
 
-    def test_preview_member_import_does_not_create_people(self):
+    @patch("core.views.start_member_import_job", return_value=True)
+    def test_preview_stages_rows_once_and_imports_them_without_reupload(self, mock_start):
+        lines = ["First Name,Last Name,Family,Email"] + [f"Jane{index},Example,Example Family,jane{index}@example.com" for index in range(150)]
         response = self.client.post(
             "/admin/member-import/",
-            {
-                "action": "preview_members",
-                "member_file": csv_file("First Name,Last Name,Email\nJane,Example,jane@example.com\n"),
-            },
+            {"action": "preview_members", "member_file": csv_file("\n".join(lines) + "\n")},
         )
 
-        self.assertEqual(response.status_code, 200)
-        self.assertContains(response, "Preview ready")
+        job = MemberImportJob.objects.get()
+        self.assertRedirects(response, f"/admin/member-import/?job={job.id}", fetch_redirect_response=False)
+        mock_start.assert_called_once_with(job.id)
+        with patch("core.views.is_member_import_job_active", return_value=True):
+            page = self.client.get(f"/admin/member-import/?job={job.id}")
+        self.assertContains(page, "Checking the CSV")
+        self.assertContains(page, 'http-equiv="refresh"')
+        run_member_import_job(job.id)
         self.assertFalse(Person.objects.exists())
+        page = self.client.get(f"/admin/member-import/?job={job.id}&page=2")
+        self.assertContains(page, "Page 2 of 2")
+        self.assertContains(page, "Jane149")
+        self.assertNotContains(page, "jane0@example.com")
+
+        response = self.client.post("/admin/member-import/", {"action": "import_staged", "job_id": job.id})
+
+        self.assertRedirects(response, f"/admin/member-import/?job={job.id}", fetch_redirect_response=False)
+        self.assertEqual(mock_start.call_count, 2)
+        run_member_import_job(job.id)
+        self.assertContains(self.client.get(f"/admin/member-import/?job={job.id}"), "150 created")
+        self.assertEqual(Person.objects.filter(member_type=Person.MEMBER, family__name="Example").count(), 150)
+        self.assertTrue(AuditLog.objects.filter(action=AuditLog.ACTION_MEMBER_IMPORT).exists())
 
-    def test_import_member_csv_creates_people_and_logs_action(self):
+    @patch("core.views.start_member_import_job", return_value=True)
+    def test_import_member_csv_stages_and_imports_in_one_background_job(self, mock_start):
         response = self.client.post(
             "/admin/member-import/",
             {
@@ -101,11 +283,35 @@ class MemberImportAdminTests(TestCase):
             },
         )
 
-        self.assertEqual(response.status_code, 200)
-        self.assertContains(response, "Import complete")
-        self.assertTrue(Person.objects.filter(email="jane@example.com", member_type=Person.MEMBER).exists())
-        self.assertTrue(Family.objects.filter(name="Example").exists())
-        self.assertTrue(AuditLog.objects.filter(action=AuditLog.ACTION_MEMBER_IMPORT).exists())
+        job = MemberImportJob.objects.get()
+        self.assertEqual((job.status, job.import_when_staged), (MemberImportJob.STAGING, True))
+        self.assertRedirects(response, f"/admin/member-import/?job={job.id}", fetch_redirect_response=False)
+        mock_start.assert_called_once_with(job.id)
+        run_member_import_job(job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.created_count), (MemberImportJob.DONE, 1))
+
+    @patch("core.views.start_member_import_job", return_value=True)
+    def test_import_with_row_errors_waits_until_skipping_them_is_chosen(self, mock_start):
+        content = "First Name,Last Name\nJane,Example\n,Missing\n"
+        self.client.post("/admin/member-import/", {"action": "import_members", "member_file": csv_file(content)})
+        job = MemberImportJob.objects.get()
+        run_member_import_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error_count), (MemberImportJob.STAGED, 1))
+        self.assertContains(self.client.get(f"/admin/member-import/?job={job.id}"), "Skip the 1 rows with errors")
+        response = self.client.post("/admin/member-import/", {"action": "import_staged", "job_id": job.id}, follow=True)
+        self.assertContains(response, "1 rows have errors.")
+        job.refresh_from_db()
+        self.assertEqual(job.status, MemberImportJob.STAGED)
+
+        self.client.post("/admin/member-import/", {"action": "import_staged", "job_id": job.id, "skip_invalid_rows": "on"})
+        run_member_import_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.created_count, job.skip_invalid_rows), (MemberImportJob.DONE, 1, True))
+        self.assertEqual(Person.objects.get().first_name, "Jane")
 
     def test_sample_csv_download(self):
         response = self.client.get("/admin/member-import/sample/")
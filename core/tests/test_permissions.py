@@ -1,5 +1,7 @@
 from django.contrib.auth.models import Group, User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from core.permissions import (
     ROLE_ADMIN,
@@ -84,3 +86,29 @@ class PermissionRoleTests(TestCase):
         user.groups.add(Group.objects.get(name="greeter"))
 
         self.assertTrue(can_access_kiosk(user))
+
+    def test_roles_are_resolved_once_per_user_and_expire_when_membership_changes(self):
+        user = self._make_user("cached", is_staff=True)
+        self._assign(user, ROLE_GREETER)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(can_access_kiosk(user))
+            self.assertTrue(can_print_labels(user))
+            self.assertFalse(can_manage_configuration(user))
+        self._assign(user, ROLE_ADMIN)
+        self.assertTrue(can_manage_configuration(user))
+
+    def test_session_reuses_roles_until_group_membership_changes(self):
+        user = self._make_user("kiosk-greeter")
+        self._assign(user, ROLE_GREETER)
+        self.client.force_login(user)
+
+        def group_queries():
+            with CaptureQueriesContext(connection) as queries:
+                status = self.client.get("/kiosk/status/").status_code
+            return status, sum("auth_user_groups" in query["sql"] for query in queries)
+
+        self.assertEqual(group_queries(), (200, 1))
+        self.assertEqual(group_queries(), (200, 0))
+        Group.objects.get(name=ROLE_GREETER).user_set.remove(user)
+        self.assertEqual(group_queries(), (403, 1))
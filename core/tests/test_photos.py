@@ -0,0 +1,82 @@
+from io import BytesIO, StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.models import Person
+from core.photos import PHOTO_SIZES, photo_variant_name
+
+
+def _jpeg(width: int, height: int, *, orientation: int | None = None) -> bytes:
+    buffer = BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    Image.new("RGB", (width, height), "navy").save(buffer, format="JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+class PhotoThumbnailTests(TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.media_root = Path(self.temp_dir.name)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_upload_writes_upright_webp_variants_used_for_avatars(self):
+        # Orientation 6 means the camera stored a portrait photo sideways.
+        person = Person.objects.create(
+            first_name="Ada",
+            last_name="Lovelace",
+            photo=SimpleUploadedFile("ada.jpg", _jpeg(1200, 800, orientation=6), content_type="image/jpeg"),
+        )
+
+        for size, edge in PHOTO_SIZES.items():
+            with Image.open(self.media_root / photo_variant_name(person.photo.name, size)) as variant:
+                self.assertEqual(variant.format, "WEBP")
+                self.assertEqual(variant.size, (edge * 2 // 3, edge))
+        self.assertTrue(person.avatar_url.startswith(f"/media/{photo_variant_name(person.photo.name, 'avatar')}?v="))
+        self.assertIn(".profile.webp?v=", person.profile_photo_url)
+
+    def test_backfill_command_makes_missing_variants_and_avatars_fall_back_until_then(self):
+        Person.objects.bulk_create(
+            [Person(first_name="Grace", last_name="Hopper", photo="people/photos/grace.jpg")]
+        )
+        (self.media_root / "people/photos").mkdir(parents=True)
+        (self.media_root / "people/photos/grace.jpg").write_bytes(_jpeg(640, 640))
+        person = Person.objects.get()
+        self.assertTrue(person.avatar_url.startswith("/media/people/photos/grace.jpg?v="))
+
+        output = StringIO()
+        call_command("generate_photo_thumbnails", stdout=output)
+
+        self.assertIn("Wrote 2 thumbnail(s)", output.getvalue())
+        self.assertTrue(person.avatar_url.startswith("/media/people/photos/grace.jpg.avatar.webp?v="))
+        call_command("generate_photo_thumbnails", stdout=output)
+        self.assertIn("Wrote 0 thumbnail(s)", output.getvalue())
+
+    def test_photos_with_the_same_stem_get_their_own_thumbnails(self):
+        Person.objects.create(
+            first_name="Ada",
+            last_name="Lovelace",
+            photo=SimpleUploadedFile("IMG_0001.jpg", _jpeg(300, 300), content_type="image/jpeg"),
+        )
+        buffer = BytesIO()
+        Image.new("RGB", (300, 300), "red").save(buffer, format="PNG")
+        grace = Person.objects.create(
+            first_name="Grace",
+            last_name="Hopper",
+            photo=SimpleUploadedFile("IMG_0001.png", buffer.getvalue(), content_type="image/png"),
+        )
+
+        self.assertIn("/IMG_0001.png.avatar.webp?v=", grace.avatar_url)
+        with Image.open(self.media_root / photo_variant_name(grace.photo.name, "avatar")) as avatar:
+            red, _green, blue = avatar.convert("RGB").getpixel((10, 10))
+        self.assertGreater(red, 200)
+        self.assertLess(blue, 50)
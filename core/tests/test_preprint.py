@@ -0,0 +1,107 @@
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from core.models import Family, Person, PrePrintRun, Service, SystemSetting, Tag
+from core.preprint import SOURCE_ACTIVE_MEMBERS, SOURCE_FAMILIES, SOURCE_TAGS, PrePrintError, create_preprint_run, preprint_people, run_preprint
+from core.printnode import ServerPrinterError
+
+
+@override_settings(PREPRINT_RENDER_PROCESSES=0)
+class PrePrintRunTests(TestCase):
+    def setUp(self):
+        SystemSetting.objects.update_or_create(
+            key="printer_profiles",
+            defaults={"value": '{"hall": {"backend": "server", "host": "192.168.1.70"}}'},
+        )
+        self.family = Family.objects.create(name="Babbage")
+        self.tag = Tag.objects.create(name="Choir")
+        self.people = [
+            Person.objects.create(first_name=first, last_name=last, member_type=Person.MEMBER)
+            for first, last in [("Ada", "Lovelace"), ("Alan", "Turing"), ("Grace", "Hopper"), ("Edsger", "Dijkstra"), ("Barbara", "Liskov")]
+        ]
+        self.people[0].tags.add(self.tag)
+        Person.objects.filter(id=self.people[1].id).update(family=self.family)
+        Person.objects.create(first_name="Vera", last_name="Visitor", member_type=Person.VISITOR)
+
+    def test_selection_sources(self):
+        self.assertEqual(preprint_people(SOURCE_ACTIVE_MEMBERS).count(), 5)
+        self.assertEqual(list(preprint_people(SOURCE_TAGS, tag_ids=[self.tag.id])), [self.people[0]])
+        self.assertEqual(list(preprint_people(SOURCE_FAMILIES, family_ids=[self.family.id])), [self.people[1]])
+        with self.assertRaisesMessage(PrePrintError, "Choose at least one tag."):
+            preprint_people(SOURCE_TAGS)
+
+    def test_unknown_profile_is_rejected_before_creating_run(self):
+        with self.assertRaisesMessage(PrePrintError, 'Printer profile "missing" is not configured.'):
+            create_preprint_run(profile_name="missing", people=preprint_people(SOURCE_ACTIVE_MEMBERS), selection="All")
+        self.assertFalse(PrePrintRun.objects.exists())
+
+    @patch("core.preprint._send_to_server_printer_target", return_value="raw:192.168.1.70:9100")
+    @patch("core.preprint.render_label_chunk", side_effect=lambda rows, profile, output: repr(rows).encode())
+    def test_run_sends_labels_in_chunks_in_name_order(self, mock_render, mock_send):
+        run = create_preprint_run(
+            profile_name="hall",
+            people=preprint_people(SOURCE_ACTIVE_MEMBERS),
+            selection="Active members",
+            chunk_size=2,
+        )
+
+        run_preprint(run.id)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, PrePrintRun.DONE)
+        self.assertEqual(run.printed_count, 5)
+        self.assertEqual(mock_send.call_count, 3)
+        first_chunk = mock_render.call_args_list[0].args
+        self.assertEqual(first_chunk[0], [("Edsger", "Dijkstra"), ("Grace", "Hopper")])
+        self.assertEqual(first_chunk[2], "raw")
+        self.assertEqual(mock_send.call_args_list[0].args[0], {"kind": "raw", "host": "192.168.1.70", "port": 9100})
+
+    @patch("core.preprint.render_label_chunk", return_value=b"labels")
+    def test_failed_run_resumes_from_saved_cursor(self, mock_render):
+        run = create_preprint_run(
+            profile_name="hall",
+            people=preprint_people(SOURCE_ACTIVE_MEMBERS),
+            selection="Active members",
+            chunk_size=2,
+        )
+
+        with patch(
+            "core.preprint._send_to_server_printer_target",
+            side_effect=["raw:192.168.1.70:9100", ServerPrinterError("Printer offline.")],
+        ):
+            run_preprint(run.id)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, PrePrintRun.FAILED)
+        self.assertEqual(run.printed_count, 2)
+        self.assertEqual(run.error, "Printer offline.")
+
+        with patch("core.preprint._send_to_server_printer_target", return_value="raw:192.168.1.70:9100") as mock_send:
+            run_preprint(run.id)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, PrePrintRun.DONE)
+        self.assertEqual(run.printed_count, 5)
+        self.assertEqual(mock_send.call_count, 2)
+
+    @patch("core.views.start_preprint_run", return_value=True)
+    def test_admin_page_starts_run(self, mock_start):
+        admin_user = User.objects.create_superuser(username="preprint-admin", email="pp@example.com", password="pw")
+        self.client.force_login(admin_user)
+        service = Service.objects.create(date=date.today(), label="Sabbath Service", status=Service.OPEN)
+
+        response = self.client.post(
+            "/admin/preprint/",
+            {"action": "start", "source": SOURCE_ACTIVE_MEMBERS, "service_id": service.id, "profile_name": "hall", "chunk_size": "10"},
+        )
+
+        self.assertRedirects(response, "/admin/preprint/", fetch_redirect_response=False)
+        run = PrePrintRun.objects.get()
+        self.assertEqual(run.total, 5)
+        self.assertEqual(run.service, service)
+        mock_start.assert_called_once_with(run.id)
+        page = self.client.get("/admin/preprint/")
+        self.assertContains(page, "0 / 5")
@@ -0,0 +1,129 @@
+from datetime import date
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group, User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.models import Person, PrintJob, Service, SystemSetting
+from core.permissions import ROLE_GREETER
+from core.print_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, get_circuit_breaker, reset_circuit_breakers
+from core.print_spooler import run_print_job
+from core.printer_monitor import clear_printer_status_cache
+from core.printnode import PRINT_MODE_SERVER, ServerPrinterError, ServerPrinterUnavailableError, _send_raw_to_server_printer
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = patch("core.print_breaker.time.monotonic", side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.breaker = CircuitBreaker("raw:printer:9100", window=10, failure_threshold=3, error_rate=0.5, cooldown=30)
+
+    def test_opens_only_when_failures_reach_threshold_and_error_rate(self):
+        for _ in range(4):
+            self.breaker.record_success()
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual(self.breaker.retry_after_seconds(), 31)
+
+    def test_half_open_lets_one_probe_through_and_closes_on_success(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.now += 30
+
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success()
+
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_probe_reopens_breaker(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        self.now += 30
+        self.assertTrue(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+
+@override_settings(PRINTER_MONITOR_INTERVAL_SECONDS=0, PRINT_SPOOLER_WORKERS=0)
+class PrintBreakerIntegrationTests(TestCase):
+    def setUp(self):
+        reset_circuit_breakers()
+        clear_printer_status_cache()
+        self.addCleanup(reset_circuit_breakers)
+        greeter_group, _ = Group.objects.get_or_create(name=ROLE_GREETER)
+        self.user = User.objects.create_user(username="breaker-greeter", password="pw", is_active=True)
+        self.user.groups.add(greeter_group)
+        self.client.force_login(self.user)
+        Service.objects.create(date=date.today(), label="Sabbath Service", status=Service.OPEN)
+        self.person = Person.objects.create(first_name="Ada", last_name="Lovelace", member_type=Person.MEMBER)
+        SystemSetting.objects.update_or_create(key="print_mode", defaults={"value": PRINT_MODE_SERVER})
+        SystemSetting.objects.update_or_create(key="server_printer_map", defaults={"value": '{"kiosk1": "192.168.1.50:9100"}'})
+
+    def _open_breaker(self):
+        breaker = get_circuit_breaker("raw:192.168.1.50:9100")
+        for _ in range(3):
+            breaker.record_failure()
+        return breaker
+
+    @patch("core.printnode._fetch_brother_web_status", return_value={})
+    @patch("core.printnode.socket.create_connection", side_effect=OSError("timed out"))
+    def test_repeated_connection_failures_fail_fast(self, mock_connection, mock_status):
+        for _ in range(3):
+            with self.assertRaisesMessage(ServerPrinterError, "Could not reach server printer"):
+                _send_raw_to_server_printer("192.168.1.50", 9100, b"label")
+
+        with self.assertRaisesMessage(ServerPrinterUnavailableError, "is not responding"):
+            _send_raw_to_server_printer("192.168.1.50", 9100, b"label")
+        self.assertEqual(mock_connection.call_count, 3)
+
+    @patch("core.print_spooler.submit_server_attendance_print_job")
+    def test_kiosk_print_is_rejected_without_queueing_while_breaker_is_open(self, mock_submit):
+        self._open_breaker()
+
+        response = self.client.post(
+            "/kiosk/",
+            {"action": "print_selected", "person_ids": [self.person.id], "kiosk_id": "kiosk1"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+        self.assertEqual(response.status_code, 502)
+        self.assertIn("is not responding", response.json()["print_error"])
+        self.assertFalse(PrintJob.objects.exists())
+        mock_submit.assert_not_called()
+
+    def test_kiosk_status_reports_open_breaker(self):
+        self._open_breaker()
+
+        payload = self.client.get("/kiosk/printer-status/?kiosk=kiosk1").json()
+
+        self.assertEqual(payload["status"], "backend_unavailable")
+        self.assertEqual(payload["label"], "Server Printer: not responding")
+        self.assertEqual(payload["circuit"]["state"], OPEN)
+
+    @patch(
+        "core.print_spooler.submit_server_attendance_print_job",
+        side_effect=ServerPrinterUnavailableError("Server printer is not responding."),
+    )
+    def test_spooler_does_not_retry_while_breaker_is_open(self, mock_submit):
+        job = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", attendance_ids=[1])
+
+        with override_settings(PRINT_SPOOLER_MAX_ATTEMPTS=3):
+            run_print_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PrintJob.FAILED)
+        self.assertEqual(mock_submit.call_count, 1)
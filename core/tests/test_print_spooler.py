@@ -0,0 +1,267 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Attendance, AuditLog, Person, PrintJob, Service, SystemSetting
+from core.permissions import ROLE_GREETER
+from core import print_spooler
+from core.print_spooler import enqueue_attendance_print_job, resume_pending_print_jobs, run_print_job
+from core.printer_monitor import clear_printer_status_cache, get_cached_printer_status
+from core.printnode import (
+    PRINT_MODE_SERVER,
+    PrintNodeError,
+    PrintNodeJobUnconfirmedError,
+    ServerPrinterError,
+    confirm_server_print_accepted,
+)
+
+
+@override_settings(PRINT_SPOOLER_WORKERS=2, PRINT_SPOOLER_RETRY_DELAY_SECONDS=0)
+class PrintSpoolerKioskTests(TestCase):
+    def setUp(self):
+        greeter_group, _ = Group.objects.get_or_create(name=ROLE_GREETER)
+        self.user = User.objects.create_user(username="spool-greeter", password="pw", is_active=True)
+        self.user.groups.add(greeter_group)
+        self.client.force_login(self.user)
+        self.service = Service.objects.create(date=date.today(), label="Sabbath Service", status=Service.OPEN)
+        self.person = Person.objects.create(first_name="Ada", last_name="Lovelace", member_type=Person.MEMBER)
+        SystemSetting.objects.update_or_create(key="print_mode", defaults={"value": PRINT_MODE_SERVER})
+        SystemSetting.objects.update_or_create(
+            key="server_printer_map",
+            defaults={"value": '{"kiosk1": "192.168.1.50:9100"}'},
+        )
+        confirm_patcher = patch("core.print_spooler.confirm_server_print_accepted")
+        self.mock_confirm = confirm_patcher.start()
+        self.addCleanup(confirm_patcher.stop)
+        clear_printer_status_cache()
+        self.addCleanup(clear_printer_status_cache)
+
+    @patch("core.print_spooler._dispatch")
+    @patch("core.print_spooler.submit_server_attendance_print_job")
+    def test_kiosk_print_returns_queued_job_without_waiting_for_printer(self, mock_submit, mock_dispatch):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/kiosk/",
+                {"action": "print_selected", "person_ids": [self.person.id], "kiosk_id": "kiosk1"},
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertTrue(payload.get("queued"))
+        self.assertEqual(payload.get("status"), PrintJob.QUEUED)
+        job = PrintJob.objects.get(id=payload["print_job_id"])
+        self.assertEqual(payload.get("status_url"), f"/kiosk/print-jobs/{job.id}/?kiosk=kiosk1")
+        attendance = Attendance.objects.get(service=self.service, person=self.person)
+        self.assertEqual(job.attendance_ids, [attendance.id])
+        mock_dispatch.assert_called_once_with(job.id)
+        mock_submit.assert_not_called()
+
+    def test_kiosk_print_reports_unmapped_printer_immediately(self):
+        response = self.client.post(
+            "/kiosk/",
+            {"action": "print_selected", "person_ids": [self.person.id], "kiosk_id": "kiosk9"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+        self.assertEqual(response.status_code, 502)
+        self.assertIn("kiosk9", response.json().get("print_error", ""))
+        self.assertFalse(PrintJob.objects.exists())
+        self.assertTrue(AuditLog.objects.filter(action=AuditLog.ACTION_SERVER_PRINT_FAILURE).exists())
+
+    @patch("core.print_spooler.submit_server_attendance_print_job", side_effect=[ServerPrinterError("Busy."), "raw:192.168.1.50:9100"])
+    def test_worker_retries_and_logs_success_when_job_finishes(self, mock_submit):
+        job = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", attendance_ids=[1], requested_by=self.user)
+
+        run_print_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PrintJob.DONE)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.backend_job_id, "raw:192.168.1.50:9100")
+        self.assertEqual(mock_submit.call_count, 2)
+        log = AuditLog.objects.get(action=AuditLog.ACTION_SERVER_PRINT_SUCCESS)
+        self.assertEqual(log.metadata["spool_job_id"], job.id)
+        self.assertEqual(log.actor, self.user)
+
+    @patch("core.print_spooler._request_state_tracking")
+    @patch("core.print_spooler.submit_server_attendance_print_job", return_value="ipp:7@ipp://cups/printers/hall")
+    def test_ipp_jobs_are_tracked_in_the_background_and_status_reads_only_the_database(self, mock_submit, mock_track):
+        job = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", attendance_ids=[1], requested_by=self.user)
+
+        run_print_job(job.id)
+
+        mock_track.assert_called_once_with()
+        status_url = f"/kiosk/print-jobs/{job.id}/?kiosk=kiosk1"
+        with patch("core.print_spooler.get_server_print_job_state") as mock_state:
+            payload = self.client.get(status_url).json()
+            mock_state.assert_not_called()
+        self.assertEqual((payload["status"], payload["backend_state"]), (PrintJob.DONE, "pending"))
+
+        with patch("core.print_spooler.get_server_print_job_state", side_effect=["processing", "completed"]) as mock_state:
+            self.assertEqual(print_spooler.track_backend_states(), 1)
+            self.assertEqual(self.client.get(status_url).json()["backend_state"], "processing")
+            self.assertEqual(print_spooler.track_backend_states(), 0)
+            self.assertEqual(print_spooler.track_backend_states(), 0)
+        self.assertEqual(mock_state.call_count, 2)
+        self.assertEqual(self.client.get(status_url).json()["backend_state"], "completed")
+
+    @patch("core.printnode.time.sleep")
+    @patch("core.printnode._fetch_brother_web_status", return_value={"device_status": "COVER OPEN"})
+    @patch("core.print_spooler.submit_server_attendance_print_job", return_value="raw:192.168.1.50:9100")
+    def test_job_the_printer_rejects_after_the_send_fails_without_a_resend(self, mock_submit, mock_status, mock_sleep):
+        self.mock_confirm.side_effect = confirm_server_print_accepted
+        job = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", attendance_ids=[1])
+
+        run_print_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (PrintJob.FAILED, 1))
+        self.assertIn("rejected the print job. Current status: COVER OPEN", job.error)
+        mock_status.assert_called_once_with("192.168.1.50", timeout=5)
+        self.assertEqual(get_cached_printer_status("192.168.1.50").device_status, "COVER OPEN")
+
+    @patch("core.print_spooler.submit_attendance_print_job", side_effect=PrintNodeJobUnconfirmedError("Check the printer."))
+    def test_job_printnode_may_have_received_fails_without_a_resend(self, mock_submit):
+        job = PrintJob.objects.create(mode=PrintJob.PRINTNODE, kiosk_id="kiosk1", attendance_ids=[1])
+
+        with override_settings(PRINT_SPOOLER_MAX_ATTEMPTS=3):
+            run_print_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), (PrintJob.FAILED, 1, "Check the printer."))
+        mock_submit.assert_called_once()
+
+    @patch("core.print_spooler.submit_attendance_print_job", side_effect=PrintNodeError("PrintNode is down."))
+    def test_worker_marks_job_failed_after_max_attempts(self, mock_submit):
+        job = PrintJob.objects.create(mode=PrintJob.PRINTNODE, kiosk_id="kiosk1", attendance_ids=[1], requested_by=self.user)
+
+        with override_settings(PRINT_SPOOLER_MAX_ATTEMPTS=3):
+            run_print_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PrintJob.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(job.error, "PrintNode is down.")
+        self.assertIsNotNone(job.finished_at)
+        self.assertTrue(AuditLog.objects.filter(action=AuditLog.ACTION_PRINTNODE_FAILURE).exists())
+
+        response = self.client.get(f"/kiosk/print-jobs/{job.id}/?kiosk=kiosk1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json().get("queued"))
+        self.assertEqual(response.json().get("print_error"), "PrintNode is down.")
+
+    def test_job_status_is_only_shown_to_the_kiosk_session_that_queued_it(self):
+        job = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", attendance_ids=[1], requested_by=self.user)
+        other_greeter = User.objects.create_user(username="other-greeter", password="pw", is_active=True)
+        other_greeter.groups.add(Group.objects.get(name=ROLE_GREETER))
+
+        self.assertEqual(self.client.get(f"/kiosk/print-jobs/{job.id}/?kiosk=kiosk2").status_code, 404)
+        self.client.force_login(other_greeter)
+        self.assertEqual(self.client.get(f"/kiosk/print-jobs/{job.id}/?kiosk=kiosk1").status_code, 404)
+
+    @patch("core.print_spooler.ThreadPoolExecutor")
+    def test_starting_the_spooler_resumes_jobs_left_by_the_last_run(self, mock_executor):
+        with patch("core.print_spooler._executor", None):
+            print_spooler.ensure_print_spooler_started()
+
+        submitted = mock_executor.return_value.submit.call_args
+        self.assertEqual(submitted.args[0], print_spooler._resume_in_worker)
+
+    @patch("core.print_spooler.submit_server_attendance_print_job")
+    def test_finished_job_is_not_transmitted_again(self, mock_submit):
+        job = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", status=PrintJob.DONE)
+
+        run_print_job(job.id)
+
+        mock_submit.assert_not_called()
+
+    @patch("core.print_spooler._dispatch")
+    def test_resume_redispatches_queued_jobs_and_fails_interrupted_and_stale_ones(self, mock_dispatch):
+        queued = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1")
+        interrupted = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", status=PrintJob.PRINTING)
+        stale = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1")
+        PrintJob.objects.filter(id=stale.id).update(created_at=timezone.now() - timedelta(hours=1))
+
+        resumed = resume_pending_print_jobs()
+
+        self.assertEqual(resumed, 1)
+        mock_dispatch.assert_called_once_with(queued.id)
+        for job in (queued, interrupted, stale):
+            job.refresh_from_db()
+        self.assertEqual(queued.status, PrintJob.QUEUED)
+        self.assertEqual((interrupted.status, stale.status), (PrintJob.FAILED, PrintJob.FAILED))
+        self.assertIn("Reprint", interrupted.error)
+
+    @override_settings(PRINT_SPOOLER_WORKERS=0)
+    @patch("core.print_spooler.submit_server_attendance_print_job", side_effect=ServerPrinterError("Printer offline."))
+    def test_inline_mode_reports_failure_in_the_same_request(self, mock_submit):
+        job = enqueue_attendance_print_job(PrintJob.SERVER, [1], kiosk_id="kiosk1", user=self.user)
+
+        self.assertEqual(job.status, PrintJob.FAILED)
+        self.assertEqual(mock_submit.call_count, 1)
+
+    @patch("core.print_spooler.time.sleep")
+    @patch("core.print_spooler.submit_server_attendance_print_job", return_value="raw:192.168.1.50:9100")
+    def test_coalescing_window_merges_queued_jobs_from_the_same_kiosk(self, mock_submit, mock_sleep):
+        SystemSetting.objects.update_or_create(key="print_coalesce_window_ms", defaults={"value": "300"})
+        first = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", attendance_ids=[1, 2])
+        second = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", attendance_ids=[3])
+        other_kiosk = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk2", attendance_ids=[4])
+
+        run_print_job(first.id)
+
+        mock_sleep.assert_called_once_with(0.3)
+        mock_submit.assert_called_once_with([1, 2, 3], kiosk_id="kiosk1", user=None)
+        for job in (first, second):
+            job.refresh_from_db()
+            self.assertEqual(job.status, PrintJob.DONE)
+            self.assertEqual(job.backend_job_id, "raw:192.168.1.50:9100")
+        other_kiosk.refresh_from_db()
+        self.assertEqual(other_kiosk.status, PrintJob.QUEUED)
+        log = AuditLog.objects.get(action=AuditLog.ACTION_SERVER_PRINT_SUCCESS, metadata__spool_job_id=second.id)
+        self.assertEqual(log.metadata["coalesced_with"], [first.id])
+
+    @patch("core.print_spooler.time.sleep")
+    @patch("core.print_spooler.submit_server_attendance_print_job", return_value="raw:192.168.1.50:9100")
+    def test_collecting_worker_sends_overflow_and_late_arrivals_in_further_batches(self, mock_submit, mock_sleep):
+        SystemSetting.objects.update_or_create(key="print_coalesce_window_ms", defaults={"value": "300"})
+        jobs = [
+            PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", attendance_ids=[index])
+            for index in range(print_spooler.MAX_COALESCED_JOBS + 2)
+        ]
+        late_ids = []
+
+        def job_arrives_during_window(_seconds):
+            if not late_ids:
+                late = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", attendance_ids=[99])
+                late_ids.append(late.id)
+                # The batch is open, so the new job's own worker leaves it to this one.
+                run_print_job(late.id)
+
+        mock_sleep.side_effect = job_arrives_during_window
+
+        run_print_job(jobs[0].id)
+
+        self.assertEqual(mock_submit.call_count, 2)
+        self.assertEqual(len(mock_submit.call_args_list[0].args[0]), print_spooler.MAX_COALESCED_JOBS)
+        self.assertEqual(mock_submit.call_args_list[1].args[0], [20, 21, 99])
+        self.assertFalse(PrintJob.objects.exclude(status=PrintJob.DONE).exists())
+
+    @patch("core.print_spooler.submit_server_attendance_print_job")
+    def test_job_arriving_during_open_window_is_left_for_the_collecting_worker(self, mock_submit):
+        SystemSetting.objects.update_or_create(key="print_coalesce_window_ms", defaults={"value": "300"})
+        job = PrintJob.objects.create(mode=PrintJob.SERVER, kiosk_id="kiosk1", attendance_ids=[1])
+        self.assertTrue(print_spooler._open_batch((PrintJob.SERVER, "kiosk1")))
+        try:
+            run_print_job(job.id)
+        finally:
+            print_spooler._close_batch((PrintJob.SERVER, "kiosk1"))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, PrintJob.QUEUED)
+        mock_submit.assert_not_called()
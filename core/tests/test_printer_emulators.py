@@ -0,0 +1,95 @@
+import base64
+
+from django.test import TestCase, override_settings
+
+from core.models import SystemSetting
+from core.print_breaker import reset_circuit_breakers
+from core.printer_emulators import BrotherPrinterEmulator, PrintNodeEmulator, RasterDecodeError, decode_brother_raster
+from core.printer_monitor import clear_printer_status_cache
+from core.printnode import (
+    PrintNodeError,
+    ServerPrinterError,
+    _build_label_raw_from_rows,
+    submit_printnode_job,
+    submit_server_test_print_job,
+)
+from core.printnode_client import get_printnode_client
+
+
+class RasterDecodeTests(TestCase):
+    def test_decodes_two_color_job_into_labels(self):
+        pages = decode_brother_raster(_build_label_raw_from_rows([("Ada", "Lovelace"), ("Grace", "Hopper")]))
+
+        self.assertEqual(len(pages), 2)
+        self.assertTrue(pages[0].two_color)
+        self.assertEqual(len(pages[0].black), pages[0].rows)
+        self.assertEqual(len(pages[0].red), pages[0].rows)
+        self.assertEqual(pages[0].to_image().size, (720, pages[0].rows))
+
+    def test_truncated_job_is_rejected(self):
+        raw = _build_label_raw_from_rows([("Ada", "Lovelace")])
+
+        with self.assertRaises(RasterDecodeError):
+            decode_brother_raster(raw[:-40])
+
+
+@override_settings(PRINTER_MONITOR_INTERVAL_SECONDS=15)
+class BrotherEmulatorTests(TestCase):
+    def setUp(self):
+        reset_circuit_breakers()
+        clear_printer_status_cache()
+        self.printer = BrotherPrinterEmulator(raw_port=0, status_port=0).start()
+        self.addCleanup(self.printer.stop)
+        self.addCleanup(clear_printer_status_cache)
+        settings_override = override_settings(BROTHER_STATUS_PORT=self.printer.status_port)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        SystemSetting.objects.update_or_create(key="print_mode", defaults={"value": "server"})
+        SystemSetting.objects.update_or_create(
+            key="server_printer_map",
+            defaults={"value": f'{{"kiosk1": "127.0.0.1:{self.printer.raw_port}"}}'},
+        )
+
+    def test_raw_job_is_received_and_decoded(self):
+        submit_server_test_print_job(kiosk_id="kiosk1")
+
+        self.assertTrue(self.printer.stats.wait_for_jobs(1))
+        self.assertEqual(self.printer.stats.as_dict()["labels"], 1)
+        self.assertEqual(self.printer.stats.as_dict()["rejected"], 0)
+
+    def test_injected_empty_media_blocks_printing(self):
+        self.printer.set_state(media_status="Empty")
+
+        with self.assertRaisesMessage(ServerPrinterError, "empty media"):
+            submit_server_test_print_job(kiosk_id="kiosk1")
+        self.assertEqual(self.printer.stats.as_dict()["jobs"], 0)
+
+
+class PrintNodeEmulatorTests(TestCase):
+    def setUp(self):
+        reset_circuit_breakers()
+        self.printnode = PrintNodeEmulator(api_key="test-api-key", seed=1).start()
+        self.addCleanup(self.printnode.stop)
+        settings_override = override_settings(PRINTNODE_API_BASE_URL=self.printnode.base_url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(get_printnode_client().close)
+        self.payload = {
+            "printerId": 123456,
+            "title": "Emulated",
+            "contentType": "raw_base64",
+            "content": base64.b64encode(_build_label_raw_from_rows([("Ada", "Lovelace")] * 3)).decode("ascii"),
+        }
+
+    def test_job_is_accepted_and_labels_counted(self):
+        job_id = submit_printnode_job("test-api-key", self.payload)
+
+        self.assertEqual(job_id, 1001)
+        self.assertEqual(self.printnode.stats.as_dict()["labels"], 3)
+
+    def test_injected_failures_surface_as_printnode_errors(self):
+        self.printnode.failure_rate = 1.0
+
+        with self.assertRaises(PrintNodeError):
+            submit_printnode_job("test-api-key", self.payload)
+        self.assertEqual(self.printnode.stats.as_dict()["failed"], 1)
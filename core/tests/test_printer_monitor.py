@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import printer_monitor
+from core.models import Service, SystemSetting
+from core.permissions import ROLE_GREETER
+from core.printer_monitor import (
+    PrinterStatus,
+    clear_printer_status_cache,
+    configured_raw_printers,
+    get_cached_printer_status,
+    poll_configured_printers,
+)
+from core.printnode import PRINT_MODE_SERVER, ServerPrinterError, _send_raw_to_server_printer
+
+
+def status(host="192.168.1.50", device_status="READY", media_status="", checked_at=None):
+    return PrinterStatus(
+        host=host,
+        device_status=device_status,
+        media_status=media_status,
+        media_type="62mm x 29mm",
+        emulation="Raster",
+        reachable=True,
+        checked_at=checked_at or timezone.now(),
+    )
+
+
+@override_settings(PRINTER_MONITOR_INTERVAL_SECONDS=15)
+class PrinterMonitorTests(TestCase):
+    def setUp(self):
+        clear_printer_status_cache()
+        SystemSetting.objects.update_or_create(
+            key="server_printer_map",
+            defaults={"value": '{"kiosk1": "192.168.1.50:9100", "kiosk2": "queue:Office", "kiosk3": "192.168.1.50:9100"}'},
+        )
+
+    def tearDown(self):
+        clear_printer_status_cache()
+
+    def test_configured_raw_printers_collects_map_and_profile_targets(self):
+        SystemSetting.objects.update_or_create(
+            key="printer_profiles",
+            defaults={"value": '{"side": {"backend": "server", "host": "192.168.1.60"}, "cloud": {"backend": "printnode", "printer_id": "1"}}'},
+        )
+        SystemSetting.objects.update_or_create(key="kiosk_printer_profile_map", defaults={"value": '{"kiosk4": "side"}'})
+
+        printers = configured_raw_printers()
+
+        self.assertEqual(set(printers), {"192.168.1.50", "192.168.1.60"})
+        self.assertEqual(printers["192.168.1.50"]["kiosks"], ["kiosk1", "kiosk3"])
+        self.assertEqual(printers["192.168.1.60"]["profiles"], ["side"])
+        self.assertEqual(printers["192.168.1.60"]["kiosks"], ["kiosk4"])
+
+    @patch(
+        "core.printnode._fetch_brother_web_status",
+        return_value={"device_status": "READY", "media_status": "", "media_type": "62mm Continuous"},
+    )
+    def test_poll_caches_status_with_timestamp(self, mock_fetch):
+        poll_configured_printers()
+
+        cached = get_cached_printer_status("192.168.1.50")
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(cached.media_type, "62mm Continuous")
+        self.assertTrue(cached.is_ready)
+        self.assertLess(cached.age_seconds, 5)
+
+    @patch("core.printnode.socket.create_connection")
+    @patch("core.printnode._fetch_brother_web_status")
+    def test_print_path_uses_fresh_cached_status_instead_of_fetching(self, mock_fetch, mock_connection):
+        printer_monitor._status_cache["192.168.1.50"] = status()
+        mock_connection.return_value.__enter__.return_value = mock_connection.return_value
+
+        _send_raw_to_server_printer("192.168.1.50", 9100, b"label")
+
+        mock_fetch.assert_not_called()
+        mock_connection.return_value.sendall.assert_called_once_with(b"label")
+
+    @patch("core.printnode._fetch_brother_web_status")
+    def test_print_path_rejects_cached_empty_media(self, mock_fetch):
+        printer_monitor._status_cache["192.168.1.50"] = status(media_status="Empty")
+
+        with self.assertRaisesMessage(ServerPrinterError, "empty media"):
+            _send_raw_to_server_printer("192.168.1.50", 9100, b"label")
+        mock_fetch.assert_not_called()
+
+    @patch("core.printnode._fetch_brother_web_status", return_value={"device_status": "Cover Open"})
+    def test_stale_cache_is_refreshed_inline(self, mock_fetch):
+        printer_monitor._status_cache["192.168.1.50"] = status(checked_at=timezone.now() - timedelta(minutes=5))
+
+        with self.assertRaisesMessage(ServerPrinterError, "Cover Open"):
+            _send_raw_to_server_printer("192.168.1.50", 9100, b"label")
+        self.assertEqual(mock_fetch.call_count, 1)
+
+
+@override_settings(PRINTER_MONITOR_INTERVAL_SECONDS=15)
+@patch("core.views.ensure_printer_monitor_started")
+class PrinterMonitorViewTests(TestCase):
+    def setUp(self):
+        clear_printer_status_cache()
+        greeter_group, _ = Group.objects.get_or_create(name=ROLE_GREETER)
+        self.user = User.objects.create_user(username="monitor-greeter", password="pw", is_active=True)
+        self.user.groups.add(greeter_group)
+        Service.objects.create(date=date.today(), label="Sabbath Service", status=Service.OPEN)
+        SystemSetting.objects.update_or_create(key="print_mode", defaults={"value": PRINT_MODE_SERVER})
+        SystemSetting.objects.update_or_create(key="server_printer_map", defaults={"value": '{"kiosk1": "192.168.1.50:9100"}'})
+
+    def tearDown(self):
+        clear_printer_status_cache()
+
+    def test_kiosk_status_reports_cached_device_problem(self, mock_start):
+        self.client.force_login(self.user)
+        printer_monitor._status_cache["192.168.1.50"] = status(device_status="Cover Open")
+
+        payload = self.client.get("/kiosk/printer-status/?kiosk=kiosk1").json()
+
+        self.assertEqual(payload["status"], "printer_not_ready")
+        self.assertEqual(payload["label"], "Server Printer: Cover Open")
+        self.assertEqual(payload["device"]["media_type"], "62mm x 29mm")
+        mock_start.assert_called_once()
+
+    def test_printer_fleet_page_lists_cached_status(self, mock_start):
+        admin_user = User.objects.create_superuser(username="fleet-admin", email="fleet@example.com", password="pw")
+        self.client.force_login(admin_user)
+        printer_monitor._status_cache["192.168.1.50"] = status()
+
+        response = self.client.get("/admin/printer-fleet/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "192.168.1.50:9100")
+        self.assertContains(response, "kiosk1")
+        self.assertContains(response, "62mm x 29mm")
@@ -3,10 +3,11 @@ from datetime import date
 from unittest.mock import patch
 
 from django.contrib.auth.models import Group, User
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from core.models import Attendance, AuditLog, Person, Service, SystemSetting
 from core.permissions import ROLE_ADMIN, ROLE_GREETER
+from core.printer_monitor import clear_printer_status_cache
 from core.printnode import (
     PRINT_MODE_PRINTNODE,
     PRINT_MODE_SERVER,
@@ -16,11 +17,13 @@ from core.printnode import (
     build_test_label_pdf,
     get_kiosk_printer_id,
     get_kiosk_server_printer,
+    get_label_layout,
     submit_attendance_print_job,
     submit_server_attendance_print_job,
 )
 
 
+@override_settings(PRINT_SPOOLER_WORKERS=0)
 class PrintNodeKioskTests(TestCase):
     def setUp(self):
         greeter_group, _ = Group.objects.get_or_create(name=ROLE_GREETER)
@@ -33,7 +36,7 @@ class PrintNodeKioskTests(TestCase):
         SystemSetting.objects.update_or_create(key="printnode_api_key", defaults={"value": "test-api-key"})
         SystemSetting.objects.update_or_create(key="printnode_printer_map", defaults={"value": '{"kiosk1": "123456"}'})
 
-    @patch("core.views.submit_attendance_print_job", return_value=98765)
+    @patch("core.print_spooler.submit_attendance_print_job", return_value=98765)
     def test_kiosk_print_selected_submits_printnode_job(self, mock_submit):
         response = self.client.post(
             "/kiosk/",
@@ -50,7 +53,7 @@ class PrintNodeKioskTests(TestCase):
         mock_submit.assert_called_once_with([attendance.id], kiosk_id="kiosk1", user=self.user)
         self.assertTrue(AuditLog.objects.filter(action=AuditLog.ACTION_PRINTNODE_SUCCESS).exists())
 
-    @patch("core.views.submit_attendance_print_job", side_effect=PrintNodeError("No printer configured."))
+    @patch("core.print_spooler.submit_attendance_print_job", side_effect=PrintNodeError("No printer configured."))
     def test_kiosk_printnode_failure_is_visible_and_keeps_attendance(self, mock_submit):
         response = self.client.post(
             "/kiosk/",
@@ -166,11 +169,9 @@ class PrintNodeSettingsTests(TestCase):
         self.assertGreater(len(raw_bytes), 1000)
 
     def test_raw_label_font_candidates_use_configured_system_font(self):
-        from core.printnode import _configured_font_file_candidates
-
         SystemSetting.objects.update_or_create(key="label_font", defaults={"value": "Georgia"})
 
-        self.assertEqual(_configured_font_file_candidates()[0], ("Georgia Bold.ttf", "Georgia.ttf"))
+        self.assertEqual(get_label_layout().font_file_candidates[0], ("Georgia Bold.ttf", "Georgia.ttf"))
 
     def test_pdf_label_uses_times_base_font_for_serif_setting(self):
         SystemSetting.objects.update_or_create(key="label_font", defaults={"value": "Times New Roman"})
@@ -199,6 +200,7 @@ class PrintNodeSettingsTests(TestCase):
         self.assertIn(b"\x1biK\t", decoded)
 
 
+@override_settings(PRINT_SPOOLER_WORKERS=0, PRINTER_MONITOR_INTERVAL_SECONDS=0)
 class ServerPrinterKioskTests(TestCase):
     def setUp(self):
         greeter_group, _ = Group.objects.get_or_create(name=ROLE_GREETER)
@@ -213,7 +215,7 @@ class ServerPrinterKioskTests(TestCase):
             defaults={"value": '{"kiosk1": "192.168.1.50:9100"}'},
         )
 
-    @patch("core.views.submit_server_attendance_print_job", return_value="192.168.1.50:9100")
+    @patch("core.print_spooler.submit_server_attendance_print_job", return_value="192.168.1.50:9100")
     def test_kiosk_print_selected_submits_server_printer_job(self, mock_submit):
         response = self.client.post(
             "/kiosk/",
@@ -231,7 +233,7 @@ class ServerPrinterKioskTests(TestCase):
         mock_submit.assert_called_once_with([attendance.id], kiosk_id="kiosk1", user=self.user)
         self.assertTrue(AuditLog.objects.filter(action=AuditLog.ACTION_SERVER_PRINT_SUCCESS).exists())
 
-    @patch("core.views.submit_server_attendance_print_job", side_effect=ServerPrinterError("Printer offline."))
+    @patch("core.print_spooler.submit_server_attendance_print_job", side_effect=ServerPrinterError("Printer offline."))
     def test_kiosk_server_printer_failure_is_visible_and_keeps_attendance(self, mock_submit):
         response = self.client.post(
             "/kiosk/",
@@ -276,6 +278,9 @@ class ServerPrinterKioskTests(TestCase):
 
 
 class ServerPrinterSettingsTests(TestCase):
+    def setUp(self):
+        clear_printer_status_cache()
+
     def test_get_kiosk_server_printer_reads_json_map(self):
         SystemSetting.objects.update_or_create(
             key="server_printer_map",
@@ -339,8 +344,8 @@ class ServerPrinterSettingsTests(TestCase):
             _send_raw_to_server_printer("192.168.1.50", 9100, b"test")
 
     @patch("core.printnode.socket.create_connection")
-    @patch("core.printnode._fetch_brother_web_status", side_effect=[{"device_status": "READY"}, {"device_status": "PRINTING"}])
-    def test_raw_server_printer_accepts_printing_status_after_send(self, mock_status, mock_connection):
+    @patch("core.printnode._fetch_brother_web_status", return_value={"device_status": "READY"})
+    def test_raw_server_printer_sends_when_brother_status_is_ready(self, mock_status, mock_connection):
         from core.printnode import _send_raw_to_server_printer
 
         mock_connection.return_value.__enter__.return_value = mock_connection.return_value
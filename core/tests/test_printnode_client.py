@@ -0,0 +1,119 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import socket
+import threading
+
+from django.test import SimpleTestCase, override_settings
+
+from core.printnode import PrintNodeError, PrintNodeJobUnconfirmedError, submit_printnode_job, submit_printnode_jobs, verify_printnode_api_key
+from core.printnode_client import PrintNodeClient
+
+
+class FakePrintNodeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connection_count += 1
+
+    def do_GET(self):
+        if self.headers.get("Authorization") != "Basic Z29vZC1rZXk6":
+            self._reply(401, {"code": "Unauthorized", "message": "API key not found"})
+            return
+        self._reply(200, "ok")
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.received.append(payload)
+        if self.server.reset_after_post:
+            # The job arrived, but the connection drops before PrintNode answers.
+            self.close_connection = True
+            return
+        if payload.get("printerId") == 0:
+            self._reply(400, {"message": "printerId is invalid"})
+            return
+        self._reply(201, 1000 + len(self.server.received))
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if self.server.drop_after_reply:
+            # Simulate an idle timeout: close without announcing Connection: close.
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        return
+
+
+class PrintNodeClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakePrintNodeHandler)
+        self.server.connection_count = 0
+        self.server.received = []
+        self.server.drop_after_reply = False
+        self.server.reset_after_post = False
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        settings_override = override_settings(PRINTNODE_API_BASE_URL=base_url, PRINTNODE_READ_TIMEOUT_SECONDS=5)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_batch_submission_reuses_one_connection(self):
+        job_ids = submit_printnode_jobs("good-key", [{"printerId": 1}, {"printerId": 2}])
+        job_ids.append(submit_printnode_job("good-key", {"printerId": 3}))
+
+        self.assertEqual(job_ids, [1001, 1002, 1003])
+        self.assertEqual([payload["printerId"] for payload in self.server.received], [1, 2, 3])
+        self.assertEqual(self.server.connection_count, 1)
+
+    def test_rejected_job_reports_printnode_message(self):
+        with self.assertRaisesMessage(PrintNodeError, "printerId is invalid"):
+            submit_printnode_job("good-key", {"printerId": 0})
+
+    def test_verify_api_key_uses_noop_endpoint(self):
+        self.assertEqual(verify_printnode_api_key("good-key"), (True, "PrintNode API key verified."))
+        self.assertEqual(
+            verify_printnode_api_key("bad-key"),
+            (False, "PrintNode rejected the API key: API key not found"),
+        )
+
+    def test_client_reconnects_when_server_dropped_idle_connection(self):
+        self.server.drop_after_reply = True
+        client = PrintNodeClient(
+            f"http://127.0.0.1:{self.server.server_address[1]}",
+            connect_timeout=5,
+            read_timeout=5,
+        )
+        self.addCleanup(client.close)
+
+        self.assertTrue(client.request("GET", "/noop", api_key="good-key").ok)
+        self.assertTrue(client.request("GET", "/noop", api_key="good-key").ok)
+        self.assertEqual(self.server.connection_count, 2)
+
+    def test_print_job_is_not_resent_when_the_connection_drops_after_sending_it(self):
+        self.assertTrue(verify_printnode_api_key("good-key")[0])
+        self.server.reset_after_post = True
+
+        with self.assertRaisesMessage(PrintNodeJobUnconfirmedError, "Check the printer before reprinting"):
+            submit_printnode_job("good-key", {"printerId": 1})
+
+        self.assertEqual(len(self.server.received), 1)
+
+    def test_unreachable_api_raises_printnode_error(self):
+        probe = socket.socket()
+        probe.bind(("127.0.0.1", 0))
+        closed_port = probe.getsockname()[1]
+        probe.close()
+
+        with override_settings(PRINTNODE_API_BASE_URL=f"http://127.0.0.1:{closed_port}"):
+            with self.assertRaisesMessage(PrintNodeError, "Could not reach PrintNode"):
+                submit_printnode_job("good-key", {"printerId": 1})
@@ -0,0 +1,147 @@
+from contextlib import closing
+from datetime import datetime, timedelta, timezone as dt_timezone
+import gzip
+from io import StringIO
+from pathlib import Path
+import sqlite3
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.backups import list_database_backups
+from core import replication
+from core.replication import Replicator, list_generations, list_segments, list_snapshots, restore_replica
+
+
+START = datetime(2026, 10, 17, 14, 0, tzinfo=dt_timezone.utc)
+
+
+class _StopLoop(BaseException):
+    pass
+
+
+class ReplicationTests(TestCase):
+    def setUp(self):
+        temp_dir = TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        self.database = self.root / "live.sqlite3"
+        self.replica_dir = self.root / "replica"
+        self.writer = sqlite3.connect(self.database, isolation_level=None)
+        self.addCleanup(self.writer.close)
+        self.writer.execute("PRAGMA journal_mode=WAL")
+        self.writer.execute("PRAGMA wal_autocheckpoint=0")
+        self.writer.execute("CREATE TABLE checkin (name TEXT)")
+        self.replicator = Replicator(self.database, self.replica_dir, checkpoint_frames=4).open()
+        self.addCleanup(self.replicator.close)
+        self.replicator.sync(START)
+
+    def _check_in(self, count: int, minute: int) -> datetime:
+        for index in range(count):
+            self.writer.execute("INSERT INTO checkin VALUES (?)", (f"person-{minute}-{index}" + "x" * 2000,))
+        synced_at = START + timedelta(minutes=minute)
+        self.replicator.sync(synced_at)
+        return synced_at
+
+    def _restored_count(self, at=None) -> int:
+        output = self.root / f"restored-{len(list(self.root.iterdir()))}.sqlite3"
+        restore_replica(self.replica_dir, output, at=at)
+        with sqlite3.connect(output) as connection:
+            self.assertEqual(connection.execute("PRAGMA integrity_check").fetchone()[0], "ok")
+            return connection.execute("SELECT COUNT(*) FROM checkin").fetchone()[0]
+
+    def test_committed_frames_ship_across_checkpoints_and_restore_to_any_point(self):
+        moments = [self._check_in(3, minute) for minute in range(1, 11)]
+
+        self.assertEqual(len(list_generations(self.replica_dir)), 1)
+        # The table created before the first sync is already in the snapshot.
+        self.assertEqual(len(list_segments(self.replicator.generation)), 10)
+        self.assertEqual(self._restored_count(START), 0)
+        self.assertEqual(self._restored_count(moments[3]), 12)
+        self.assertEqual(self._restored_count(moments[3] + timedelta(seconds=30)), 12)
+        self.assertEqual(self._restored_count(), 30)
+
+    def test_outside_checkpoint_starts_a_new_generation(self):
+        self._check_in(2, 1)
+        self.writer.execute("INSERT INTO checkin VALUES ('unshipped')")
+        self.writer.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        self._check_in(1, 2)
+
+        self.assertEqual(len(list_generations(self.replica_dir)), 2)
+        self.assertEqual(self._restored_count(), 4)
+
+    def test_segments_and_snapshots_are_written_without_the_write_lock(self):
+        self.writer.execute("PRAGMA busy_timeout=0")
+        real_write_bytes, real_write = replication._write_gzip_bytes, replication._write_gzip
+
+        def write_segment(data, target_path):
+            self.writer.execute("INSERT INTO checkin VALUES ('during-segment')")
+            return real_write_bytes(data, target_path)
+
+        def write_snapshot(source_path, target_path):
+            self.writer.execute("INSERT INTO checkin VALUES ('during-snapshot')")
+            return real_write(source_path, target_path)
+
+        with patch("core.replication._write_gzip_bytes", side_effect=write_segment):
+            self._check_in(1, 1)
+        fresh = Replicator(self.database, self.root / "fresh", checkpoint_frames=4).open()
+        self.addCleanup(fresh.close)
+        with patch("core.replication._write_gzip", side_effect=write_snapshot):
+            fresh.sync(START + timedelta(minutes=2))
+
+        self.assertEqual(self._restored_count(), 1)
+        self.replicator.sync(START + timedelta(minutes=3))
+        self.assertEqual(self._restored_count(), 3)
+        # The row written while the snapshot was compressed ships as the first segment after it.
+        output = self.root / "fresh-snapshot.sqlite3"
+        output.write_bytes(gzip.decompress(list_snapshots(fresh.generation)[0].path.read_bytes()))
+        with closing(sqlite3.connect(output)) as connection:
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM checkin").fetchone()[0], 2)
+        self.assertEqual(len(list_segments(fresh.generation)), 1)
+
+    def test_replica_write_errors_back_off_and_keep_the_generation(self):
+        generation = self.replicator.generation
+        self.writer.execute("INSERT INTO checkin VALUES ('pending')")
+        delays = []
+
+        def record_delay(seconds):
+            delays.append(seconds)
+            if len(delays) == 4:
+                raise _StopLoop()
+
+        with (
+            override_settings(DATABASE_REPLICA_INTERVAL_SECONDS=1),
+            patch("core.replication._write_gzip_bytes", side_effect=OSError("No space left on device")),
+            patch("core.replication.time.sleep", side_effect=record_delay),
+            self.assertLogs("core.replication", "ERROR"),
+            self.assertRaises(_StopLoop),
+        ):
+            replication._replication_loop(self.replicator)
+
+        self.assertEqual(delays, [2, 4, 8, 16])
+        self.assertEqual(self.replicator.generation, generation)
+        self.replicator.sync(START + timedelta(minutes=1))
+        self.assertEqual(self._restored_count(), 1)
+
+    def test_compaction_and_retention_keep_recent_points_restorable(self):
+        moments = [self._check_in(2, minute) for minute in range(1, 6)]
+
+        snapshot = self.replicator.compact(moments[-1] + timedelta(hours=2), interval=timedelta(hours=1))
+        self.replicator.prune(moments[-1] + timedelta(days=8), retention=timedelta(days=7))
+
+        self.assertEqual(list_snapshots(self.replicator.generation)[0].path, snapshot)
+        self.assertEqual(list_segments(self.replicator.generation), [])
+        self.assertEqual(self._restored_count(), 10)
+
+    def test_restore_command_adds_the_rebuilt_database_as_a_backup(self):
+        moments = [self._check_in(2, minute) for minute in range(1, 4)]
+
+        with override_settings(DATABASE_BACKUP_DIR=self.root / "backups"):
+            stdout = StringIO()
+            call_command("restore_replica", replica_dir=str(self.replica_dir), at=moments[1].isoformat(), stdout=stdout)
+            (backup,) = list_database_backups()
+
+        self.assertTrue(backup.name.startswith("welcome-system-replica-"))
+        self.assertIn("Rebuilt the database as of", stdout.getvalue())
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from core.models import Attendance, Person, Service
 
@@ -48,7 +50,7 @@ class ServiceManualActionsTests(TestCase):
         self.assertContains(response, "cats-person-badge")
         self.assertNotContains(response, "Quick Check-In &amp; Print")
 
-    def test_person_initials_and_live_counts_include_badge_data(self):
+    def test_person_initials_and_attendee_tab_include_badge_data(self):
         person = Person.objects.create(
             first_name="Ada",
             middle_initial="M",
@@ -57,13 +59,69 @@ class ServiceManualActionsTests(TestCase):
         )
         Attendance.objects.create(service=self.service, person=person)
 
-        response = self.client.get(f"{self.url}?live_counts=1")
+        response = self.client.get(f"{self.url}?tab=attendees")
 
         self.assertEqual(person.initials, "AL")
         self.assertEqual(response.status_code, 200)
-        attendee = response.json()["attendees"][0]
-        self.assertEqual(attendee["initials"], "AL")
-        self.assertEqual(attendee["photo_url"], "")
+        attendee = response.json()["results"][0]
+        self.assertEqual((attendee["name"], attendee["initials"], attendee["photo_url"]), ("Ada M. Lovelace", "AL", ""))
+
+    def test_attendance_tabs_are_paginated_and_counts_are_aggregates(self):
+        members = Person.objects.bulk_create(
+            Person(first_name=f"Member{index:02d}", last_name="Paged", member_type=Person.MEMBER) for index in range(60)
+        )
+        Person.objects.filter(last_name="Paged").update(created_at=None)
+        visitor = Person.objects.create(first_name="Vera", last_name="Visitor", member_type=Person.VISITOR)
+        Attendance.objects.bulk_create(Attendance(service=self.service, person=person) for person in [*members[:55], visitor])
+
+        counts = self.client.get(f"{self.url}?live_counts=1").json()
+        first_page = self.client.get(f"{self.url}?tab=attendees").json()
+        second_page = self.client.get(f"{self.url}?tab=attendees&page=2").json()
+        missing = self.client.get(f"{self.url}?tab=missing&q=member5").json()
+        first_time = self.client.get(f"{self.url}?tab=first_time").json()
+
+        self.assertEqual(
+            (counts["attendee_count"], counts["missing_member_count"], counts["first_time_visitor_count"]),
+            (56, 5, 1),
+        )
+        self.assertNotIn("attendees", counts)
+        self.assertEqual((len(first_page["results"]), first_page["has_next"], first_page["count"]), (50, True, 56))
+        self.assertEqual((len(second_page["results"]), second_page["has_next"]), (6, False))
+        self.assertEqual([row["name"] for row in missing["results"]], [f"Member{index} Paged" for index in range(55, 60)])
+        self.assertEqual([row["person_id"] for row in first_time["results"]], [visitor.id])
+
+    def test_live_refresh_reloads_every_page_already_shown(self):
+        people = Person.objects.bulk_create(Person(first_name=f"Member{index:02d}", last_name="Paged") for index in range(60))
+        Attendance.objects.bulk_create(Attendance(service=self.service, person=person) for person in people)
+        shown = [
+            row["person_id"]
+            for page in (1, 2)
+            for row in self.client.get(f"{self.url}?tab=attendees&page={page}").json()["results"]
+        ]
+        late = Person.objects.create(first_name="Late", last_name="Arrival")
+        Attendance.objects.create(service=self.service, person=late)
+
+        refreshed = self.client.get(f"{self.url}?tab=attendees&through_page=2").json()
+
+        self.assertEqual((refreshed["page"], refreshed["count"], refreshed["has_next"]), (2, 61, False))
+        self.assertEqual([row["person_id"] for row in refreshed["results"]], [late.id, *shown])
+
+    def test_change_form_render_cost_does_not_grow_with_attendance(self):
+        def render_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(self.url).status_code, 200)
+            return len(queries)
+
+        Attendance.objects.create(service=self.service, person=Person.objects.create(first_name="One", last_name="Person"))
+        render_queries()  # Warm per-process caches such as settings.
+        baseline = render_queries()
+        people = Person.objects.bulk_create(
+            Person(first_name=f"Member{index}", last_name="Crowd", member_type=Person.MEMBER) for index in range(200)
+        )
+        Attendance.objects.bulk_create(Attendance(service=self.service, person=person) for person in people[:150])
+
+        self.assertEqual(render_queries(), baseline)
+        self.assertNotContains(self.client.get(self.url), "Member1 Crowd")
 
     def test_manual_print_person_returns_print_url(self):
         person = Person.objects.create(first_name="Grace", last_name="Hopper", member_type=Person.MEMBER)
@@ -0,0 +1,60 @@
+import json
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import AuditLog, SettingsVersion, SystemSetting
+from core.settings_store import bump_settings_version
+
+
+class BulkSettingsSaveTests(TestCase):
+    def setUp(self):
+        admin_user = User.objects.create_superuser(username="admin", email="admin@example.com", password="password123")
+        self.client.force_login(admin_user)
+        bump_settings_version()
+        self.url = "/admin/core/systemsetting/bulk/"
+
+    def _post_data(self, **changes):
+        form = self.client.get(self.url).context["form"]
+        field_names = {f"setting_{setting.id}": setting.key for setting in SystemSetting.objects.all()}
+        data = {}
+        for field_name in form.fields:
+            value = changes.get(field_names.get(field_name), form[field_name].value())
+            if value is None:
+                continue
+            data[field_name] = json.dumps(value) if isinstance(value, dict) else value
+        return data
+
+    def test_submit_applies_all_changes_in_one_update_and_one_version_bump(self):
+        # A first save normalises stored defaults (such as "0" to "") so only the two edits remain.
+        self.client.post(self.url, self._post_data())
+        AuditLog.objects.all().delete()
+        version = SettingsVersion.objects.get(pk=1).version
+        data = self._post_data(welcome_heading="Welcome home", printnode_api_key="new-secret")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, data)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(SystemSetting.objects.get(key="welcome_heading").value, "Welcome home")
+        self.assertEqual(SettingsVersion.objects.get(pk=1).version, version + 1)
+        setting_updates = [query for query in queries if query["sql"].startswith('UPDATE "core_systemsetting"')]
+        audit_inserts = [query for query in queries if query["sql"].startswith('INSERT INTO "core_auditlog"')]
+        self.assertEqual((len(setting_updates), len(audit_inserts)), (1, 1))
+        logged = {
+            log.metadata["key"]: log.metadata["new_value"]
+            for log in AuditLog.objects.filter(action=AuditLog.ACTION_SETTING_CHANGE)
+        }
+        self.assertEqual(logged, {"welcome_heading": "Welcome home", "printnode_api_key": "********"})
+
+    def test_resubmitting_saved_values_does_not_publish_a_new_version(self):
+        self.client.post(self.url, self._post_data())
+        version = SettingsVersion.objects.get(pk=1).version
+        logged = AuditLog.objects.count()
+
+        self.client.post(self.url, self._post_data())
+
+        self.assertEqual(SettingsVersion.objects.get(pk=1).version, version)
+        self.assertEqual(AuditLog.objects.count(), logged)
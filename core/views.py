@@ -5,24 +5,64 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.paginator import Paginator
 from django.db.models import Count, Max, Min, Q
 import csv
 
 from django.contrib import admin
-from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import content_disposition_header, urlencode
 from django.views.decorators.clickjacking import xframe_options_sameorigin
 
+from .attendance_import import AttendanceImportError, detect_file_format, import_attendance_file
 from .audit import log_event
-from .backups import BackupError, create_database_backup, get_backup_path, list_database_backups, restore_database_backup, save_uploaded_backup
+from .backups import (
+    VERIFY_PENDING,
+    BackupError,
+    cancel_database_backup,
+    get_backup_progress,
+    get_database_backup,
+    iter_backup_chunks,
+    list_database_backups,
+    restore_database_backup,
+    save_uploaded_backup,
+    start_backup_verification,
+    start_database_backup,
+)
 from .fonts import GOOGLE_FONT_HREFS, SYSTEM_FONT_CHOICES
 from .forms import PersonForm
-from .member_import import MemberImportError, import_member_rows, parse_member_csv
+from .member_import import MemberImportError
+from .member_import_jobs import (
+    commit_member_import,
+    is_member_import_job_active,
+    purge_expired_member_imports,
+    stage_member_import,
+    start_member_import_job,
+)
 from .member_queries import members_active_for_service
-from .models import Attendance, AuditLog, Family, Person, Service
+from .models import Attendance, AuditLog, Family, MemberImportJob, Person, PrePrintRun, PrintJob, Service, Tag
 from .permissions import can_access_kiosk, can_access_staff_views, can_manage_configuration, can_print_labels, can_view_confidential_notes
+from .preprint import (
+    SOURCE_ACTIVE_MEMBERS,
+    SOURCE_FAMILIES,
+    SOURCE_TAGS,
+    PrePrintError,
+    create_preprint_run,
+    is_preprint_run_active,
+    preprint_people,
+    start_preprint_run,
+)
+from .print_breaker import PRINTNODE_BREAKER_KEY, find_open_circuit_breaker, server_printer_breaker_key
+from .print_spooler import enqueue_attendance_print_job, print_job_payload
+from .printer_monitor import (
+    configured_raw_printers,
+    ensure_printer_monitor_started,
+    get_cached_printer_status,
+    poll_configured_printers,
+)
 from .printnode import (
     PRINT_MODE_CONNECTED,
     PRINT_MODE_PRINTNODE,
@@ -31,10 +71,10 @@ from .printnode import (
     ServerPrinterError,
     get_kiosk_printer_id,
     get_kiosk_server_printer,
+    get_label_layout,
+    get_printer_profiles,
     is_managed_printer_mode,
     is_printnode_mode,
-    submit_attendance_print_job,
-    submit_server_attendance_print_job,
     submit_server_test_print_job,
     submit_test_print_job,
 )
@@ -61,29 +101,8 @@ def _safe_px_size(value: str, default: int) -> int:
     return min(parsed, 1200)
 
 
-def _safe_percent_scale(value: str, default: int = 100) -> int:
-    try:
-        parsed = int(str(value).strip())
-    except (TypeError, ValueError):
-        return default
-    if parsed < 50:
-        return 50
-    if parsed > 200:
-        return 200
-    return parsed
-
-
-def _safe_inches(value: str, default: float) -> float:
-    try:
-        parsed = float(str(value).strip())
-    except (TypeError, ValueError):
-        return default
-    if parsed <= 0:
-        return default
-    return min(parsed, 10)
-
-
 SYSTEM_FONT_SET = {name for name, _label in SYSTEM_FONT_CHOICES}
+MEMBER_IMPORT_PREVIEW_PAGE_SIZE = 100
 
 
 def _is_yes(value: str, default: bool = False) -> bool:
@@ -113,21 +132,6 @@ def _resolve_font(font_name: str, source: str, enable_google_fonts: bool, fallba
     return f'"{fallback}", Arial, sans-serif', None
 
 
-def _resolve_system_font(font_name: str, fallback: str = "Arial") -> str:
-    font_name = (font_name or "").strip()
-    if font_name in SYSTEM_FONT_SET:
-        return f'"{font_name}", Arial, sans-serif'
-    return f'"{fallback}", Arial, sans-serif'
-
-
-def _label_print_context() -> dict:
-    return {
-        "label_width_in": f"{_safe_inches(get_setting('printnode_label_width_in', '2.440'), 2.440):.3f}",
-        "label_height_in": f"{_safe_inches(get_setting('printnode_label_height_in', '1.1'), 1.1):.3f}",
-        "label_margin_in": f"{_safe_inches(get_setting('printnode_label_margin_in', '0.1'), 0.1):.3f}",
-    }
-
-
 def root_redirect(request):
     return redirect("kiosk")
 
@@ -272,20 +276,20 @@ def database_backup_view(request):
         action = request.POST.get("action")
         try:
             if action == "create_backup":
-                backup = create_database_backup()
-                log_event(
-                    AuditLog.ACTION_DATABASE_BACKUP,
-                    user=request.user,
-                    message="Database backup created.",
-                    metadata={"backup_name": backup.name, "size_bytes": backup.size_bytes},
-                )
-                messages.success(request, f"Backup created: {backup.name}")
+                start_database_backup(user=request.user)
+                messages.success(request, "Backup started. Check-ins can continue while it runs.")
+            elif action == "cancel_backup":
+                if cancel_database_backup():
+                    messages.success(request, "Backup cancellation requested.")
+                else:
+                    messages.error(request, "No backup is running.")
             elif action == "upload_backup":
                 uploaded = request.FILES.get("backup_file")
                 if not uploaded:
                     messages.error(request, "Choose a SQLite backup file to upload.")
                 else:
                     backup = save_uploaded_backup(uploaded)
+                    start_backup_verification()
                     messages.success(request, f"Backup uploaded and validated: {backup.name}")
             elif action == "restore_backup":
                 backup_name = request.POST.get("backup_name", "")
@@ -313,10 +317,16 @@ def database_backup_view(request):
             messages.error(request, str(exc))
         return redirect("database_backup")
 
+    backup_progress = get_backup_progress()
+    backups = list_database_backups()
+    if any(backup.verification_status == VERIFY_PENDING for backup in backups):
+        start_backup_verification()
     context = {
         **admin.site.each_context(request),
         "title": "Database Backup & Restore",
-        "backups": list_database_backups(),
+        "backups": backups,
+        "backup_progress": backup_progress,
+        "auto_refresh": bool(backup_progress and backup_progress.is_running),
     }
     return render(request, "admin/database_backup.html", context)
 
@@ -325,65 +335,119 @@ def database_backup_view(request):
 @user_passes_test(can_manage_configuration)
 def database_backup_download(request, backup_name: str):
     try:
-        backup_path = get_backup_path(backup_name)
+        backup = get_database_backup(backup_name)
     except BackupError as exc:
         raise Http404(str(exc)) from exc
-    return FileResponse(
-        backup_path.open("rb"),
-        as_attachment=True,
-        filename=backup_path.name,
-        content_type="application/vnd.sqlite3",
-    )
+    # Compressed backups are expanded while streaming so the download is a plain SQLite file.
+    response = StreamingHttpResponse(iter_backup_chunks(backup.path), content_type="application/vnd.sqlite3")
+    response["Content-Length"] = str(backup.logical_size_bytes)
+    response["Content-Disposition"] = content_disposition_header(True, backup.download_name)
+    return response
 
 
 @login_required
 @user_passes_test(can_manage_configuration)
 def member_import_view(request):
-    rows = []
-    result = None
-    update_existing = False
     if request.method == "POST":
-        uploaded = request.FILES.get("member_file")
+        action = request.POST.get("action")
         update_existing = request.POST.get("update_existing") == "on"
-        import_now = request.POST.get("action") == "import_members"
+        skip_invalid_rows = request.POST.get("skip_invalid_rows") == "on"
+        if action in {"resume", "import_staged"}:
+            job = get_object_or_404(MemberImportJob, pk=request.POST.get("job_id") or 0)
+            if action == "import_staged":
+                try:
+                    commit_member_import(job, update_existing=update_existing, skip_invalid_rows=skip_invalid_rows)
+                except MemberImportError as exc:
+                    messages.error(request, str(exc))
+                else:
+                    start_member_import_job(job.id)
+                    messages.success(request, f"Member import {job.id} started.")
+            elif job.status in {MemberImportJob.STAGED, MemberImportJob.DONE}:
+                messages.info(request, f"Member import {job.id} is not waiting to be resumed.")
+            elif start_member_import_job(job.id):
+                messages.success(request, f"Resuming member import {job.id} after row {job.rows_processed}.")
+            else:
+                messages.info(request, f"Member import {job.id} is already running.")
+            return redirect(f"{reverse('member_import')}?job={job.id}")
+
+        uploaded = request.FILES.get("member_file")
         if not uploaded:
             messages.error(request, "Choose a CSV file to import.")
+            return redirect("member_import")
+        try:
+            job = stage_member_import(
+                uploaded,
+                update_existing=update_existing,
+                import_when_staged=action == "import_members",
+                skip_invalid_rows=skip_invalid_rows,
+                user=request.user,
+            )
+        except MemberImportError as exc:
+            messages.error(request, str(exc))
+            return redirect("member_import")
+        start_member_import_job(job.id)
+        if action == "import_members":
+            messages.success(request, f"Member import {job.id} started.")
+        else:
+            messages.success(request, f"Checking {job.original_name or 'the CSV'}. The preview fills in below as rows are read.")
+        return redirect(f"{reverse('member_import')}?job={job.id}")
+
+    purge_expired_member_imports()
+    jobs = list(MemberImportJob.objects.select_related("requested_by")[:10])
+    selected_job = MemberImportJob.objects.filter(pk=request.GET.get("job") or 0).first() if request.GET.get("job", "").isdigit() else None
+    for job in [*jobs, *([selected_job] if selected_job else [])]:
+        job.is_active = is_member_import_job_active(job.id)
+        job.is_interrupted = job.status in {MemberImportJob.STAGING, MemberImportJob.RUNNING} and not job.is_active
+    rows_page = None
+    if selected_job:
+        staged_rows = selected_job.staged_rows.select_related("existing_person")
+        if request.GET.get("errors") == "1":
+            staged_rows = staged_rows.filter(is_valid=False)
+        rows_page = Paginator(staged_rows, MEMBER_IMPORT_PREVIEW_PAGE_SIZE).get_page(request.GET.get("page"))
+    context = {
+        **admin.site.each_context(request),
+        "title": "Import Members",
+        "jobs": jobs,
+        "selected_job": selected_job,
+        "rows_page": rows_page,
+        "errors_only": request.GET.get("errors") == "1",
+        "auto_refresh": any(job.is_active for job in jobs) or bool(selected_job and selected_job.is_active),
+    }
+    return render(request, "admin/member_import.html", context)
+
+
+@login_required
+@user_passes_test(can_manage_configuration)
+def attendance_import_view(request):
+    result = None
+    if request.method == "POST":
+        uploaded = request.FILES.get("attendance_file")
+        if not uploaded:
+            messages.error(request, "Choose a CSV or NDJSON file to import.")
         else:
             try:
-                rows = parse_member_csv(uploaded)
-                if import_now:
-                    result = import_member_rows(rows, update_existing=update_existing)
-                    log_event(
-                        AuditLog.ACTION_MEMBER_IMPORT,
-                        user=request.user,
-                        message="Member CSV import completed.",
-                        metadata={
-                            "created": result.created,
-                            "updated": result.updated,
-                            "skipped": result.skipped,
-                            "rows": len(result.rows),
-                            "update_existing": update_existing,
-                        },
-                    )
-                    messages.success(
-                        request,
-                        f"Import complete: {result.created} created, {result.updated} updated, {result.skipped} skipped.",
-                    )
-                elif any(row.errors for row in rows):
-                    messages.error(request, "Preview found errors. Fix the CSV before importing.")
-                else:
-                    messages.success(request, f"Preview ready: {len(rows)} rows validated.")
-            except MemberImportError as exc:
+                result = import_attendance_file(uploaded.file, file_format=detect_file_format(uploaded.name))
+            except AttendanceImportError as exc:
                 messages.error(request, str(exc))
+            else:
+                log_event(
+                    AuditLog.ACTION_ATTENDANCE_IMPORT,
+                    user=request.user,
+                    message="Attendance import completed.",
+                    metadata={**result.as_metadata(), "file": uploaded.name[:255]},
+                )
+                messages.success(
+                    request,
+                    f"Import complete: {result.inserted} check-ins added, {result.already_recorded} already recorded, "
+                    f"{result.skipped} skipped, {result.services_created} services created.",
+                )
 
     context = {
         **admin.site.each_context(request),
-        "title": "Import Members",
-        "rows": rows,
+        "title": "Import Attendance",
         "result": result,
-        "update_existing": update_existing,
     }
-    return render(request, "admin/member_import.html", context)
+    return render(request, "admin/attendance_import.html", context)
 
 
 @login_required
@@ -484,19 +548,21 @@ def _submit_managed_print_or_error(request, attendance_ids, service: Service):
     kiosk_id = _request_kiosk_id(request)
     print_mode = get_setting("print_mode", PRINT_MODE_CONNECTED).strip()
     if print_mode == PRINT_MODE_SERVER:
-        success_action = AuditLog.ACTION_SERVER_PRINT_SUCCESS
         failure_action = AuditLog.ACTION_SERVER_PRINT_FAILURE
-        print_mode_key = "server"
+        print_mode_key = PrintJob.SERVER
         print_mode_label = "Server Printer"
-        submit_job = submit_server_attendance_print_job
     else:
-        success_action = AuditLog.ACTION_PRINTNODE_SUCCESS
         failure_action = AuditLog.ACTION_PRINTNODE_FAILURE
-        print_mode_key = "printnode"
+        print_mode_key = PrintJob.PRINTNODE
         print_mode_label = "PrintNode"
-        submit_job = submit_attendance_print_job
     try:
-        print_job_id = submit_job(attendance_ids, kiosk_id=kiosk_id, user=request.user)
+        job = enqueue_attendance_print_job(
+            print_mode_key,
+            attendance_ids,
+            kiosk_id=kiosk_id,
+            user=request.user,
+            service=service,
+        )
     except (PrintNodeError, ServerPrinterError) as exc:
         log_event(
             failure_action,
@@ -512,26 +578,21 @@ def _submit_managed_print_or_error(request, attendance_ids, service: Service):
             )
         return redirect("kiosk")
 
-    log_event(
-        success_action,
-        user=request.user,
-        service=service,
-        message=f"{print_mode_label} nametag print job submitted.",
-        metadata={"attendance_ids": attendance_ids, "kiosk_id": kiosk_id, "print_job_id": print_job_id},
-    )
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
-        return JsonResponse(
-            {
-                "printed": True,
-                "print_mode": print_mode_key,
-                "print_mode_label": print_mode_label,
-                "print_job_id": print_job_id,
-                "count": len(attendance_ids),
-            }
-        )
+        payload = print_job_payload(job)
+        payload["status_url"] = f"{reverse('kiosk_print_job_status', kwargs={'job_id': job.id})}?{urlencode({'kiosk': job.kiosk_id})}"
+        return JsonResponse(payload, status=502 if job.status == PrintJob.FAILED else 200)
     return redirect("kiosk")
 
 
+@login_required
+@user_passes_test(can_access_kiosk)
+def kiosk_print_job_status(request, job_id: int):
+    # Only the kiosk session that queued a job can follow it, so ids cannot be walked.
+    job = get_object_or_404(PrintJob, pk=job_id, requested_by=request.user, kiosk_id=request.GET.get("kiosk", ""))
+    return JsonResponse(print_job_payload(job))
+
+
 def _printer_status_payload(kiosk_id: str):
     print_mode = get_setting("print_mode", PRINT_MODE_CONNECTED).strip()
     if print_mode == PRINT_MODE_SERVER:
@@ -552,13 +613,19 @@ def _printer_status_payload(kiosk_id: str):
                 "label": "Server Printer: printer not mapped",
                 "detail": str(exc),
             }
+        device = None
         if target["kind"] == "queue":
             detail = f'Kiosk {kiosk_id} is mapped to print queue "{target["queue"]}".'
             printer_address = f'queue:{target["queue"]}'
+        elif target["kind"] == "ipp":
+            detail = f'Kiosk {kiosk_id} is mapped to IPP printer {target["uri"]}.'
+            printer_address = target["uri"]
         else:
             detail = f'Kiosk {kiosk_id} is mapped to {target["host"]}:{target["port"]}.'
             printer_address = f'{target["host"]}:{target["port"]}'
-        return {
+            ensure_printer_monitor_started()
+            device = get_cached_printer_status(target["host"])
+        payload = {
             "enabled": True,
             "status": "ready",
             "label": "Server Printer: ready",
@@ -566,6 +633,14 @@ def _printer_status_payload(kiosk_id: str):
             "printer_address": printer_address,
             "print_mode_label": print_mode_label,
         }
+        if device and device.reachable:
+            payload["device"] = device.as_dict()
+            if not device.is_ready:
+                problem = device.device_status if device.device_status.lower() != "ready" else "media empty"
+                payload["status"] = "printer_not_ready"
+                payload["label"] = f"Server Printer: {problem}"
+                payload["detail"] = f"{detail} The printer reports {problem}."
+        return _with_open_breaker(payload, server_printer_breaker_key(target), "Server Printer")
     if print_mode != PRINT_MODE_PRINTNODE:
         return {
             "enabled": False,
@@ -596,7 +671,7 @@ def _printer_status_payload(kiosk_id: str):
             "label": "PrintNode: printer not mapped",
             "detail": str(exc),
         }
-    return {
+    payload = {
         "enabled": True,
         "status": "ready",
         "label": "PrintNode: ready",
@@ -604,6 +679,17 @@ def _printer_status_payload(kiosk_id: str):
         "printer_id": printer_id,
         "print_mode_label": "PrintNode",
     }
+    return _with_open_breaker(payload, PRINTNODE_BREAKER_KEY, "PrintNode")
+
+
+def _with_open_breaker(payload: dict, breaker_key: str, mode_label: str) -> dict:
+    breaker = find_open_circuit_breaker(breaker_key)
+    if breaker:
+        payload["status"] = "backend_unavailable"
+        payload["label"] = f"{mode_label}: not responding"
+        payload["detail"] = breaker.open_message(f"{mode_label} {payload.get('printer_address', '')}".strip())
+        payload["circuit"] = breaker.as_dict()
+    return payload
 
 
 @login_required
@@ -618,6 +704,89 @@ def kiosk_printer_status(request):
     return JsonResponse(_printer_status_payload(_request_kiosk_id(request)))
 
 
+@login_required
+@user_passes_test(can_manage_configuration)
+def printer_fleet_view(request):
+    if request.method == "POST":
+        polled = poll_configured_printers()
+        messages.success(request, f"Refreshed status for {len(polled)} printer(s).")
+        return redirect("printer_fleet")
+
+    ensure_printer_monitor_started()
+    printers = []
+    for host, printer in sorted(configured_raw_printers().items()):
+        printers.append({**printer, "status": get_cached_printer_status(host, fresh_only=False)})
+    context = {
+        **admin.site.each_context(request),
+        "title": "Printer Fleet",
+        "printers": printers,
+        "print_mode": get_setting("print_mode", PRINT_MODE_CONNECTED).strip(),
+    }
+    return render(request, "admin/printer_fleet.html", context)
+
+
+@login_required
+@user_passes_test(can_manage_configuration)
+def preprint_view(request):
+    if request.method == "POST":
+        if request.POST.get("action") == "resume":
+            run = get_object_or_404(PrePrintRun, pk=request.POST.get("run_id") or 0)
+            if run.status == PrePrintRun.DONE:
+                messages.info(request, f"Pre-print run {run.id} already finished.")
+            elif start_preprint_run(run.id):
+                messages.success(request, f"Resuming pre-print run {run.id} at label {run.printed_count + 1} of {run.total}.")
+            else:
+                messages.info(request, f"Pre-print run {run.id} is already running.")
+            return redirect("preprint")
+
+        source = request.POST.get("source", SOURCE_ACTIVE_MEMBERS)
+        service = Service.objects.filter(pk=request.POST.get("service_id") or 0).first()
+        tag_ids = [int(value) for value in request.POST.getlist("tag_ids") if value.isdigit()]
+        family_ids = [int(value) for value in request.POST.getlist("family_ids") if value.isdigit()]
+        chunk_size = request.POST.get("chunk_size", "")
+        try:
+            people = preprint_people(source, service=service, tag_ids=tag_ids, family_ids=family_ids)
+            selection = {
+                SOURCE_ACTIVE_MEMBERS: f"Active members{f' for {service}' if service else ''}",
+                SOURCE_TAGS: "Tags: " + ", ".join(Tag.objects.filter(id__in=tag_ids).values_list("name", flat=True)),
+                SOURCE_FAMILIES: "Families: " + ", ".join(Family.objects.filter(id__in=family_ids).values_list("name", flat=True)),
+            }[source]
+            run = create_preprint_run(
+                profile_name=request.POST.get("profile_name", ""),
+                people=people,
+                selection=selection,
+                service=service,
+                user=request.user,
+                chunk_size=int(chunk_size) if chunk_size.isdigit() else 25,
+            )
+        except PrePrintError as exc:
+            messages.error(request, str(exc))
+        else:
+            start_preprint_run(run.id)
+            messages.success(request, f"Pre-print run {run.id} started for {run.total} labels.")
+        return redirect("preprint")
+
+    try:
+        profile_names = sorted(get_printer_profiles(PrePrintError))
+    except PrePrintError as exc:
+        messages.error(request, str(exc))
+        profile_names = []
+    runs = list(PrePrintRun.objects.select_related("service", "requested_by")[:20])
+    for run in runs:
+        run.is_active = is_preprint_run_active(run.id)
+    context = {
+        **admin.site.each_context(request),
+        "title": "Pre-print Labels",
+        "runs": runs,
+        "profile_names": profile_names,
+        "services": Service.objects.order_by("-date", "-id")[:20],
+        "tags": Tag.objects.all(),
+        "families": Family.objects.order_by("name"),
+        "auto_refresh": any(run.is_active for run in runs),
+    }
+    return render(request, "admin/preprint.html", context)
+
+
 @login_required
 @user_passes_test(can_access_kiosk)
 def kiosk_test_print(request):
@@ -967,12 +1136,8 @@ def print_tag(request, attendance_id: int):
         message="Single nametag print requested.",
         metadata={"mode": "single"},
     )
-    hide_last_name = get_setting("hide_last_name", "No").strip().lower() in {"yes", "true", "1"}
-    label_font_family = _resolve_system_font(get_setting("label_font", "Arial"), fallback="Arial")
     auto_print = request.GET.get("auto") == "1"
     iframe_mode = request.GET.get("iframe") == "1"
-    first_scale = _safe_percent_scale(get_setting("label_first_name_scale", "100"), 100)
-    last_scale = _safe_percent_scale(get_setting("label_last_name_scale", "100"), 100)
     next_raw = request.GET.get("next", "")
     next_ids = [value for value in next_raw.split(",") if value.isdigit()]
     next_url = ""
@@ -995,16 +1160,10 @@ def print_tag(request, attendance_id: int):
         "kiosk/print.html",
         {
             "attendance": attendance,
-            "first_name_color": get_setting("first_name_color", "#000000"),
-            "last_name_color": get_setting("last_name_color", "#000000"),
-            "hide_last_name": hide_last_name,
-            "label_font_family": label_font_family,
             "auto_print": auto_print,
             "next_url": next_url,
             "iframe_mode": iframe_mode,
-            "label_first_name_scale_factor": f"{first_scale / 100:.2f}",
-            "label_last_name_scale_factor": f"{last_scale / 100:.2f}",
-            **_label_print_context(),
+            **get_label_layout().html_context(),
         },
     )
 
@@ -1018,12 +1177,8 @@ def print_batch(request):
     attendances = list(Attendance.objects.filter(id__in=ids).select_related("person", "service"))
     attendance_by_id = {att.id: att for att in attendances}
     ordered = [attendance_by_id[att_id] for att_id in ids if att_id in attendance_by_id]
-    hide_last_name = get_setting("hide_last_name", "No").strip().lower() in {"yes", "true", "1"}
-    label_font_family = _resolve_system_font(get_setting("label_font", "Arial"), fallback="Arial")
     auto_print = request.GET.get("auto") == "1"
     iframe_mode = request.GET.get("iframe") == "1"
-    first_scale = _safe_percent_scale(get_setting("label_first_name_scale", "100"), 100)
-    last_scale = _safe_percent_scale(get_setting("label_last_name_scale", "100"), 100)
     ua = request.META.get("HTTP_USER_AGENT", "")
     serial = request.GET.get("serial") == "1"
     if not serial and "Chrome/109" in ua and "Windows NT 6.1" in ua:
@@ -1057,15 +1212,9 @@ def print_batch(request):
         "kiosk/print_batch.html",
         {
             "attendances": ordered,
-            "first_name_color": get_setting("first_name_color", "#000000"),
-            "last_name_color": get_setting("last_name_color", "#000000"),
-            "hide_last_name": hide_last_name,
-            "label_font_family": label_font_family,
             "auto_print": auto_print,
             "iframe_mode": iframe_mode,
-            "label_first_name_scale_factor": f"{first_scale / 100:.2f}",
-            "label_last_name_scale_factor": f"{last_scale / 100:.2f}",
-            **_label_print_context(),
+            **get_label_layout().html_context(),
         },
     )
 